@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import ledger
+import regras
+import storage
+
+# --- CUBOS DE PRODUTIVIDADE ---
+# Agregados por dia mantidos como índice do TaskStore (reconstruir/aplicar, como o
+# ledger): cada tarefa contribui com uma linha em cada cubo e, quando muda no diário,
+# a contribuição antiga sai e a nova entra. A página de Produtividade só lê estes
+# quadros pequenos, nunca a tabela de tarefas inteira.
+#   producao    (dia, atividade, turno) -> executadas, unidades, minutos, rejeitadas
+#   conferente  (dia, conferente)       -> aprovadas, rejeitadas, latencia_min, com_latencia
+#   sku         (dia, sku)              -> tarefas, unidades
+# As rejeições contam o estado atual: uma tarefa rejeitada e refeita passa a contar
+# como executada.
+CUBOS = {
+    "producao": (["dia", "atividade", "turno"], ["executadas", "unidades", "minutos", "rejeitadas"]),
+    "conferente": (["dia", "conferente"], ["aprovadas", "rejeitadas", "latencia_min", "com_latencia"]),
+    "sku": (["dia", "sku"], ["tarefas", "unidades"]),
+}
+FORA_DA_PRODUCAO = set(regras.KPIS) | {"AJUSTE MANUAL"}
+CAMPOS_UNIDADES = list(regras.CAMPOS_REPACK)
+
+
+def turno_da_hora(hora):
+    if 6 <= hora < 14: return 'A'
+    elif 14 <= hora < 22: return 'B'
+    else: return 'C'
+
+
+def turnos(datas):
+    h = datas.dt.hour
+    return pd.Series(np.select([(h >= 6) & (h < 14), (h >= 14) & (h < 22)], ['A', 'B'], 'C'), index=datas.index).where(datas.notna(), "-")
+
+
+def _num(df, col):
+    return pd.to_numeric(df[col], errors='coerce').fillna(0.0) if col in df.columns else pd.Series(0.0, index=df.index)
+
+
+def _data(df, col):
+    return storage.para_datetime(df[col]) if col in df.columns else pd.Series(pd.NaT, index=df.index, dtype='datetime64[s]')
+
+
+def contribuicoes(df):
+    # Linhas (chave + medidas) de cada tarefa em cada cubo; o reconstruir soma tudo
+    # por grupo e o aplicar soma/subtrai as de uma tarefa só.
+    vazio = {nome: pd.DataFrame(columns=k + m) for nome, (k, m) in CUBOS.items()}
+    if df.empty or 'status' not in df.columns: return vazio
+    df = df[~df['atividade'].isin(FORA_DA_PRODUCAO)]
+    if df.empty: return vazio
+
+    dias = ledger.datas_execucao(df).dt.normalize()
+    executada = (df['status'] == ledger.STATUS_LANCADO).astype(float)
+    rejeitada = (df['status'] == 'Rejeitada').astype(float)
+    qtd, repack = _num(df, 'qtd_produzida'), sum(_num(df, c) for c in CAMPOS_UNIDADES)
+    # REPACK conta os itens das quatro embalagens (a conclusão grava qtd_produzida=1
+    # para ele); as outras contam qtd_produzida e as de execução única, 1 por tarefa.
+    unidades = repack.where(repack > 0, qtd.where(qtd > 0, 1.0)) * executada
+    inicio = _data(df, 'inicio_execucao').fillna(_data(df, 'data_criacao'))
+    latencia = (_data(df, 'data_aprovacao') - _data(df, 'fim_execucao')).dt.total_seconds() / 60
+    com_latencia = (latencia.notna() & (latencia >= 0)).astype(float) * executada
+    conferente = df['conf_clean'] if 'conf_clean' in df.columns else storage.clean_id_series(df['conferente_id'])
+    sku = df['sku_produto'].astype(str).str.strip() if 'sku_produto' in df.columns else pd.Series("-", index=df.index)
+    com_sku = ~sku.isin(["", "-", "nan", "None"]) & (executada > 0)
+
+    return {
+        "producao": pd.DataFrame({
+            'dia': dias, 'atividade': df['atividade'].astype(str), 'turno': turnos(inicio),
+            'executadas': executada, 'unidades': unidades, 'minutos': _num(df, 'tempo_total_min') * executada, 'rejeitadas': rejeitada,
+        })[(executada + rejeitada > 0) & dias.notna()],
+        "conferente": pd.DataFrame({
+            'dia': dias, 'conferente': conferente, 'aprovadas': executada, 'rejeitadas': rejeitada,
+            'latencia_min': latencia.where(com_latencia > 0, 0.0), 'com_latencia': com_latencia,
+        })[(executada + rejeitada > 0) & dias.notna()],
+        "sku": pd.DataFrame({'dia': dias, 'sku': sku, 'tarefas': executada, 'unidades': unidades})[com_sku & dias.notna()],
+    }
+
+
+class CubosProdutividade:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cubos = {nome: {} for nome in CUBOS}
+
+    def reconstruir(self, df):
+        with self._lock:
+            self.cubos = {nome: {} for nome in CUBOS}
+            for nome, linhas in contribuicoes(df).items():
+                chaves, medidas = CUBOS[nome]
+                if linhas.empty: continue
+                agg = linhas.groupby(chaves)[medidas].sum()
+                self.cubos[nome] = {k: list(v) for k, v in zip(agg.index, agg.to_numpy().tolist())}
+
+    def _somar(self, linha, sinal):
+        if not linha: return
+        for nome, linhas in contribuicoes(pd.DataFrame([linha])).items():
+            chaves, medidas = CUBOS[nome]
+            cubo = self.cubos[nome]
+            for r in linhas.to_dict('records'):
+                k = tuple(r[c] for c in chaves)
+                atual = cubo.setdefault(k, [0.0] * len(medidas))
+                for i, m in enumerate(medidas): atual[i] += sinal * float(r[m])
+                if not any(abs(v) > 1e-9 for v in atual): del cubo[k]
+
+    def aplicar(self, antiga, nova):
+        with self._lock:
+            self._somar(antiga, -1)
+            self._somar(nova, +1)
+
+    def quadro(self, nome, inicio=None, fim=None):
+        chaves, medidas = CUBOS[nome]
+        with self._lock: itens = list(self.cubos[nome].items())
+        df = pd.DataFrame([list(k) + v for k, v in itens], columns=chaves + medidas)
+        if df.empty: return df
+        df['dia'] = pd.to_datetime(df['dia'])
+        if inicio is not None: df = df[df['dia'] >= pd.Timestamp(inicio)]
+        if fim is not None: df = df[df['dia'] <= pd.Timestamp(fim)]
+        return df.reset_index(drop=True)
+
+
+_cubos = None
+_cubos_lock = threading.Lock()
+
+
+def get_cubos():
+    global _cubos
+    with _cubos_lock:
+        if _cubos is None:
+            _cubos = CubosProdutividade()
+            storage.get_task_store().registrar_indice(_cubos)
+    storage.get_task_store().sincronizar()
+    return _cubos
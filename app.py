@@ -1,18 +1,26 @@
 import streamlit as st
 import pandas as pd
 import os
-from datetime import datetime, timedelta
+from datetime import timedelta
 import time
 import uuid
-import random
-from github import Github 
-import json
+import sharepoint
+import storage
+import ledger
+import media
+import sku_index
+import sincronizacao
+import regras
+import fechamento
+import analitica
+import prazos
+import atribuicao
+from storage import clean_id
 
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="ProTrack Logística", layout="wide", page_icon="🚛")
 
-import requests
 
 # --- ESTILOS CSS ---
 st.markdown("""
@@ -44,73 +52,17 @@ h1, h2, h3 { color: #0054a6; }
 """, unsafe_allow_html=True)
 
 # --- CONFIGURAÇÕES GLOBAIS ---
-ATIVIDADES_POR_CARRO = ["DESCARREGAMENTO DE VAN"]
-ATIVIDADES_SEM_QUANTIDADE = ["AMARRAÇÃO", "MÁQUINA LIMPEZA", "5S"]
-
-TODOS_KPIS = ['EFC', 'EFD', 'TMA', 'RESSUPRIMENTO'] 
-KPI_OPERADOR = ['EFC', 'EFD', 'TMA', 'RESSUPRIMENTO']
-
-ATIVIDADES_SEM_SKU = [
-    "SELO VERMELHO (TOPO/MOLHADO)", "SELO VERMELHO (BASE/VAZAMENTO)", "AMARRAÇÃO", "REFUGO",
-    "BLITZ (EMPURRADA)", "BLITZ (CARREG)", "BLITZ (RETORNO)", "REPACK", "DEVOLUÇÃO", "TRANSBORDO",
-    "MÁQUINA LIMPEZA", "5S", "DESCARREGAMENTO DE VAN", "EFC", "EFD", "TMA", "RESSUPRIMENTO",
-    "CARREGAMENTO FROTA FIXA", "CARREGAMENTO CARRETA", "CARREGAMENTO FRETEIRO",
-    "DESCARREGAR MARKETING PLACE", "DESCARREGAR FRETEIRO", "ESTOCAR PRODUTOS PUXADA",
-    "ABASTECIMENTO PICKING", "ESTOCAR PRODUTOS SELO VERMELHO", "RETIRAR PRODUTOS SELO VERMELHO",
-    "ABASTECIMENTO REPACK", "ESTOCAR PRODUTOS MARIA MOLE", "BLITZ DE CARREGAMENTO", "MOVIMENTAÇÃO DE REPOSIÇÃO"
-]
+# Taxas, unidades, SKU obrigatório e limites de pagamento vivem em regras.py.
+TODOS_KPIS = regras.KPIS
+KPI_OPERADOR = regras.KPIS
 
 SUPERVISORES_PERMITIDOS = ['99849441', '99813623', '99797465', '99835447', '99842757',  '99853510', '99822302']
 CONFERENTES_BLOQUEADOS = ['05480968', '5480968', '05471598', '5471598'] 
-LIMITE_RV_OPERADOR = 380.00  
-
-NOVAS_REGRAS = [
-    {"atividade": "SELO VERMELHO (TOPO/MOLHADO)", "valor": 1.25},
-    {"atividade": "SELO VERMELHO (BASE/VAZAMENTO)", "valor": 1.50},
-    {"atividade": "AMARRAÇÃO", "valor": 3.00},
-    {"atividade": "REFUGO", "valor": 0.90},
-    {"atividade": "BLITZ (EMPURRADA)", "valor": 1.50},
-    {"atividade": "BLITZ (CARREG)", "valor": 1.50},
-    {"atividade": "BLITZ (RETORNO)", "valor": 1.50},
-    {"atividade": "REPACK", "valor": 0.00},
-    {"atividade": "DEVOLUÇÃO", "valor": 1.25},
-    {"atividade": "TRANSBORDO", "valor": 1.50},
-    {"atividade": "TRIAGEM AVARIAS ARMAZÉM D", "valor": 1.25},
-    {"atividade": "PRÉ PICKING MKT PLACE (DESTILADOS)", "valor": 2.00},
-    {"atividade": "PRÉ PICKING MKT PLACE (REDBULL)", "valor": 1.50},
-    {"atividade": "CÂMARA FRIA", "valor": 3.00},
-    {"atividade": "MÁQUINA LIMPEZA", "valor": 5.00},
-    {"atividade": "5S", "valor": 14.50},
-    {"atividade": "DESCARREGAMENTO DE VAN", "valor": 2.00},
-    {"atividade": "EFC", "valor": 3.85},
-    {"atividade": "EFD", "valor": 3.85},
-    {"atividade": "TMA", "valor": 7.70},
-    {"atividade": "RESSUPRIMENTO", "valor": 3.85},
-    {"atividade": "ABASTECIMENTO PICKING", "valor": 0.00},
-    {"atividade": "ABASTECIMENTO REPACK", "valor": 0.00},
-    {"atividade": "ARMAZENAR REDBULL GAIOLA", "valor": 0.00},
-    {"atividade": "CARREGAMENTO CARRETA", "valor": 0.00},
-    {"atividade": "CARREGAMENTO FRETEIRO", "valor": 0.00},
-    {"atividade": "CARREGAMENTO FROTA FIXA", "valor": 0.00},
-    {"atividade": "DESCARREGAR MARKETING PLACE", "valor": 0.00},
-    {"atividade": "DESCARREGAR FRETEIRO", "valor": 0.00},
-    {"atividade": "ESTOCAR PRODUTOS MARIA MOLE", "valor": 0.00},
-    {"atividade": "ESTOCAR PRODUTOS PUXADA", "valor": 0.00},
-    {"atividade": "ESTOCAR PRODUTOS SELO VERMELHO", "valor": 0.00},
-    {"atividade": "GUARDAR CHOPP", "valor": 0.00},
-    {"atividade": "GUARDAR PRODUTOS MARKETING PLACE", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM A", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM B", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM C", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM D", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM M", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO ARMAZÉM R", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO DE REPOSIÇÃO", "valor": 0.00},
-    {"atividade": "MOVIMENTAÇÃO POR RISCO DE QUEBRA", "valor": 0.00},
-    {"atividade": "ORGANIZAR FEFO CHOPP", "valor": 0.00},
-    {"atividade": "ORGANIZAR FEFO PA", "valor": 0.00},
-    {"atividade": "RETIRAR PRODUTOS SELO VERMELHO", "valor": 0.00}
-]
+NOMES_BLOQUEADOS = ['WEUDES', 'JULIANO']
+SUPERVISORES_IDS = {clean_id(x) for x in SUPERVISORES_PERMITIDOS}
+CONFERENTES_BLOQUEADOS_IDS = {clean_id(x) for x in CONFERENTES_BLOQUEADOS}
+
+ITENS_POR_PAGINA = 10
 
 IMGS_PATH = "images"
 os.makedirs(IMGS_PATH, exist_ok=True)
@@ -120,139 +72,41 @@ def format_currency(value):
     except: return "R$ 0,00"
 
 def get_time_br():
-    return datetime.utcnow() - timedelta(hours=3)
-
-def get_turno_atual():
-    hora = get_time_br().hour
-    if 6 <= hora < 14: return 'A'
-    elif 14 <= hora < 22: return 'B'
-    else: return 'C'
-
-def clean_id(x):
-    if pd.isna(x): return ""
-    s = str(x).strip().replace('.0', '')
-    return s.lstrip('0') if s != '0' else '0'
-
-def get_access_token():
-    url = f"https://login.microsoftonline.com/{st.secrets['TENANT_ID']}/oauth2/v2.0/token"
-
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": st.secrets["CLIENT_ID"],
-        "client_secret": st.secrets["CLIENT_SECRET"],
-        "scope": "https://graph.microsoft.com/.default"
-    }
-
-    response = requests.post(url, data=data)
-    if response.status_code != 200:
-        st.error(f"Erro ao autenticar: {response.text}")
-        return None
-
-    return response.json().get("access_token")
-
-
-def download_file_from_sharepoint(filename):
-    token = get_access_token()
-    if not token:
-        return False
-
-    headers = {"Authorization": f"Bearer {token}"}
-
-    site = st.secrets["SHAREPOINT_SITE"]
-    folder = st.secrets["SHAREPOINT_FOLDER"]
-
-    drives = requests.get(
-        f"https://graph.microsoft.com/v1.0/sites/{site}/drives",
-        headers=headers
-    ).json()
-
-if "value" not in drives or not drives["value"]:
-    st.error("Drive SharePoint não encontrado")
-    return False
-
-drive_id = drives["value"][0]["id"]
-
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{folder}/{filename}:/content"
-    r = requests.get(url, headers=headers)
-
-    if r.status_code == 200:
-        with open(filename, "wb") as f:
-            f.write(r.content)
-        return True
-
-    return False
-
-
-def upload_file_to_sharepoint(filename):
-    token = get_access_token()
-    if not token:
-        return
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/octet-stream"
-    }
-
-    site = st.secrets["SHAREPOINT_SITE"]
-    folder = st.secrets["SHAREPOINT_FOLDER"]
-
-    drives = requests.get(
-        f"https://graph.microsoft.com/v1.0/sites/{site}/drives",
-        headers=headers
-    ).json()
-
-    drive_id = drives["value"][0]["id"]
-
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{folder}/{filename}:/content"
+    return storage.agora_br()
 
-    with open(filename, "rb") as f:
-        requests.put(url, headers=headers, data=f)
+def turno_da_hora(hora):
+    return analitica.turno_da_hora(hora)
 
+def get_turno_atual():
+    return turno_da_hora(get_time_br().hour)
 
 def get_data(filename):
-    file_xlsx = f"{filename}.xlsx"
-
-    if download_file_from_sharepoint(file_xlsx):
-        try:
-            return pd.read_excel(file_xlsx, engine="openpyxl")
-        except:
-            return pd.DataFrame()
-
-    return pd.DataFrame()
-
-
-def save_data(df, filename):
-    file_xlsx = f"{filename}.xlsx"
-
-    df.to_excel(file_xlsx, index=False, engine="openpyxl")
-    upload_file_to_sharepoint(file_xlsx)
+    try:
+        if filename == "tasks": return storage.get_task_store().ler()
+        return storage.get_table(filename)
+    except sharepoint.GraphError as e:
+        st.error(str(e))
+        return pd.DataFrame()
     
 # --- FUNÇÕES DE IMAGEM PARA O GITHUB ---
-def get_github_repo():
-    if "GITHUB_TOKEN" in st.secrets and "GITHUB_REPO" in st.secrets:
-        g = Github(st.secrets["GITHUB_TOKEN"])
-        return g.get_repo(st.secrets["GITHUB_REPO"])
-    return None
-
-def upload_media_to_github(file_path):
-    try:
-        repo = get_github_repo()
-        if repo:
-            with open(file_path, "rb") as f: content = f.read()
-            try:
-                contents = repo.get_contents(file_path)
-                repo.update_file(contents.path, f"Atualizou Imagem {file_path}", content, contents.sha)
-            except Exception:
-                repo.create_file(file_path, f"Upload Imagem {file_path}", content)
-    except Exception as e:
-        st.error(f"Erro ao salvar imagem no GitHub: {e}")
-
 def get_media_url(local_path):
-    if not local_path or pd.isna(local_path): return ""
-    repo_name = st.secrets.get("GITHUB_REPO", "")
-    if repo_name:
-        return f"https://raw.githubusercontent.com/{repo_name}/main/{local_path}"
-    return local_path
+    return media.get_media_url(local_path)
+
+def exibir_evidencia(container, local_path, width, caption):
+    # Mostra a miniatura (do disco ou da cache local) e deixa o ficheiro completo atrás de um link.
+    img_url = get_media_url(local_path)
+    if not img_url: return False
+    if media.extensao(img_url) in media.EXT_VIDEO:
+        fonte = media.carregar(local_path)
+        if fonte is None: return False
+        container.video(fonte)
+        return True
+    fonte = media.carregar(local_path, thumb=True)
+    if fonte is None: return False
+    try: container.image(fonte, width=width, caption=caption)
+    except: container.error("Erro ao carregar imagem")
+    if img_url.startswith("http"): container.markdown(f"[🔍 Ver original]({img_url})")
+    return True
 
 def generate_media_name(usuario, atividade, sku, sufixo=""):
     nome_safe = str(usuario).strip().replace(" ", "_").upper()
@@ -267,78 +121,50 @@ def generate_media_name(usuario, atividade, sku, sufixo=""):
 
 # --- GESTÃO DE TAREFAS E SALDOS ---
 def add_task_safe(task_dict):
-    df = get_data("tasks")
-    if df.empty:
-        df = pd.DataFrame([task_dict])
-    else:
-        new_row = pd.DataFrame([task_dict])
-        for col in df.columns: df[col] = df[col].astype(object)
-        df = pd.concat([df, new_row], ignore_index=True)
-    save_data(df, "tasks")
+    add_tasks_bulk([task_dict])
+
+def add_tasks_bulk(task_dicts):
+    if task_dicts: storage.get_task_store().insert(task_dicts)
 
 def update_task_safe(task_id, updates):
-    df = get_data("tasks")
-    if df.empty: return
-    idx = df[df['id_task'].astype(str) == str(task_id)].index
-    if not idx.empty:
-        for col, val in updates.items():
-            if col in df.columns:
-                df[col] = df[col].astype(object)
-                df.at[idx[0], col] = val
-        save_data(df, "tasks")
-
-def update_rv_safe(user_id, amount):
-    df = get_data("users")
-    if df.empty: return False
-    uid_str = clean_id(user_id)
-    
-    df['id_temp'] = df['id_login'].apply(clean_id)
-    idx = df[df['id_temp'] == uid_str].index
-    
-    if not idx.empty:
-        df['rv_acumulada'] = df['rv_acumulada'].astype(object)
-        atual = float(df.at[idx[0], 'rv_acumulada'])
-        df.at[idx[0], 'rv_acumulada'] = atual + float(amount)
-        df = df.drop(columns=['id_temp'])
-        save_data(df, "users")
-        return True
-    return False
+    storage.get_task_store().update(task_id, updates)
 
-def verificar_limite_diario_atividade(colaborador_id, atividade_nome):
-    tasks = get_data("tasks")
-    if tasks.empty: return False
-    hoje_str = get_time_br().strftime("%d/%m")
-    feitas = tasks[
-        (tasks['colaborador_id'].apply(clean_id) == clean_id(colaborador_id)) &
-        (tasks['atividade'] == atividade_nome) &
-        (tasks['data_criacao'].astype(str).str.contains(hoje_str, na=False)) &
-        (tasks['status'] != 'Rejeitada')
-    ]
-    return not feitas.empty
+def aprovar_tarefa_safe(task_id, updates, status_esperado):
+    uow = storage.UnidadeTrabalho()
+    uow.atualizar_tarefa(task_id, updates, status_esperado)
+    try:
+        return uow.commit()
+    except sharepoint.GraphError as e:
+        st.error(str(e))
+        return False
+
+def get_ledger():
+    return ledger.get_ledger(TODOS_KPIS)
+
+def get_regras():
+    return regras.get_regras()
+
+def feitas_hoje(colaborador_id, atividade):
+    if not get_regras().limite_diario(atividade): return 0
+    return storage.get_task_store().feitas_no_dia(colaborador_id, [atividade], get_time_br().date(), ignorar=('Rejeitada',))
 
 def buscar_sku_interface_v2():
-    df_sku = get_data("sku")
-    if df_sku.empty:
+    indice = sku_index.get_indice()
+    if not indice.itens:
         st.warning("Base de SKUs vazia no Sharepoint.")
         return "-"
-    df_sku['display'] = df_sku.iloc[:, 1].astype(str) + " | Cód: " + df_sku.iloc[:, 0].astype(str)
-    opcoes = df_sku['display'].tolist()
-    
-    st.write("Pesquise o Material:")
-    escolha = st.selectbox("Selecione o Produto (Escreva para buscar)", [""] + opcoes)
-    
-    codigo_travado = ""
-    nome_produto = "-"
-    if escolha:
-        try:
-            parts = escolha.split(" | Cód: ")
-            nome_produto = parts[0]
-            codigo_travado = parts[1]
-        except:
-            codigo_travado = "Erro"
-            
+
+    consulta = st.text_input("Pesquise o Material (nome ou código)")
+    achados = indice.buscar(consulta)
+    if consulta and not achados: st.caption("Nenhum SKU encontrado.")
+    elif len(achados) == sku_index.MAX_RESULTADOS: st.caption(f"Mostrando os {sku_index.MAX_RESULTADOS} primeiros. Refine a busca.")
+
+    opcoes = {f"{nome} | Cód: {codigo}": (codigo, nome) for codigo, nome in achados}
+    escolha = st.selectbox("Selecione o Produto", [""] + list(opcoes))
+
+    codigo_travado, nome_produto = opcoes.get(escolha, ("", "-"))
     st.text_input("Código do SKU (Travado)", value=codigo_travado, disabled=True)
-    if codigo_travado and codigo_travado != "Erro":
+    if codigo_travado:
         return f"{codigo_travado} - {nome_produto}"
     return "-"
 
@@ -352,22 +178,16 @@ def restore_session():
     qp = st.query_params
     if 'uid' in qp:
         uid = qp['uid']
-        users = get_data("users")
-        if users.empty: return False
-        
-        uid_str = clean_id(uid)
-        users['id_temp'] = users['id_login'].apply(clean_id)
-        user = users[users['id_temp'] == uid_str]
+        user = storage.get_user(uid)
         
-        if not user.empty:
-            st.session_state['user_id'] = str(user.iloc[0]['id_login']).replace('.0', '')
-            st.session_state['user_name'] = user.iloc[0]['nome']
-            tipo = str(user.iloc[0]['tipo']).upper()
+        if user:
+            st.session_state['user_id'] = str(user['id_login']).replace('.0', '')
+            st.session_state['user_name'] = user['nome']
+            tipo = str(user['tipo']).upper()
             
             meu_id_clean = clean_id(st.session_state['user_id'])
-            sups_clean = [clean_id(x) for x in SUPERVISORES_PERMITIDOS]
             
-            if meu_id_clean in sups_clean: st.session_state['role'] = 'Supervisor'
+            if meu_id_clean in SUPERVISORES_IDS: st.session_state['role'] = 'Supervisor'
             elif 'OPERADOR' in tipo: st.session_state['role'] = 'Operador'
             elif 'CONFERENTE' in tipo: st.session_state['role'] = 'Conferente'
             else: st.session_state['role'] = 'Colaborador'
@@ -386,22 +206,20 @@ def login_screen():
         sinc_clicado = c_btn2.button("🔄 Sinc", help="Força a leitura do Sharepoint", use_container_width=True)
         
         if sinc_clicado:
+            sincronizacao.sincronizar_tudo()
+            storage.invalidar()
             st.success("Sincronizado com SharePoint!")
             time.sleep(0.5)
             st.rerun()
             
         if entrar_clicado:
-            users = get_data("users")
-            if users.empty:
+            if get_data("users").empty:
                 st.error("Erro ao ler do SharePoint")
                 return
 
-            users['id_temp'] = users['id_login'].apply(clean_id)
-            lid_str = clean_id(lid)
-            
-            user = users[users['id_temp'] == lid_str]
-            if not user.empty:
-                id_original = str(user.iloc[0]['id_login']).replace('.0', '')
+            user = storage.get_user(lid)
+            if user:
+                id_original = str(user['id_login']).replace('.0', '')
                 st.query_params["uid"] = id_original
                 time.sleep(0.1)
                 st.rerun()
@@ -410,13 +228,193 @@ def login_screen():
 
 def interface_regras():
     st.title("📜 Regras & Valores das Atividades")
-    rules = get_data("rules")
-    if not rules.empty:
-        df_show = rules.copy()[['atividade', 'valor']]
-        df_show.columns = ['Atividade', 'Valor Unitário']
-        df_show['Valor Unitário'] = df_show['Valor Unitário'].apply(format_currency)
-        st.dataframe(df_show.sort_values('Atividade'), use_container_width=True, hide_index=True)
-    else: st.warning("Tabela de regras vazia.")
+    motor = get_regras()
+    df_show = pd.DataFrame([(a, r['valor'], r['tipo']) for a, r in motor.atividades.items()], columns=['Atividade', 'Valor Unitário', 'Unidade'])
+    df_show['Valor Unitário'] = df_show['Valor Unitário'].apply(format_currency)
+    st.dataframe(df_show.sort_values('Atividade'), use_container_width=True, hide_index=True)
+
+def interface_diagnostico():
+    st.title("🩺 Diagnóstico")
+    b = storage.get_backends()
+    st.caption(f"Armazenamento primário: **{b['primario'].nome}** | Espelhos: {', '.join(e.nome for e in b['espelhos']) or '-'}")
+    st.subheader("SharePoint (Graph)")
+    st.json(sharepoint.get_metricas())
+    st.subheader("Cache de Tabelas")
+    st.json(storage.metricas)
+    st.metric("Registos no diário de tarefas (por compactar)", len(storage.get_task_store().journal.ler()))
+    st.subheader("Fila de Upload de Evidências")
+    fila = media.resumo_fila()
+    st.json(fila)
+    if fila['com_erro'] and st.button(f"Reenviar {fila['com_erro']} evidência(s) com erro"):
+        st.success(f"{media.reenfileirar_erros()} evidência(s) de volta à fila.")
+    st.subheader("Cache Local de Evidências")
+    st.json(media.cache_media.resumo())
+    st.json(media.resumo_cache_disco())
+
+    st.subheader("Sincronização com o SharePoint")
+    st.json(sincronizacao.metricas)
+    st.dataframe(sincronizacao.estado(), use_container_width=True, hide_index=True)
+    conflitos = sincronizacao.conflitos_abertos()
+    if conflitos.empty: st.info("Nenhum conflito de sincronização.")
+    else:
+        st.warning(f"{len(conflitos)} linha(s) alteradas no app e no Excel ao mesmo tempo. Ficou a versão do app; confira a do Excel abaixo.")
+        st.dataframe(conflitos, use_container_width=True, hide_index=True)
+        if st.button("Marcar conflitos como resolvidos"):
+            sincronizacao.resolver_conflitos(conflitos['id'])
+            st.rerun()
+
+def interface_fechamento():
+    st.title("🧮 Fechamento de RV")
+    ini_padrao, fim_padrao = fechamento.periodo_anterior()
+    c1, c2 = st.columns(2)
+    inicio = c1.date_input("Início", ini_padrao, format="DD/MM/YYYY")
+    fim = c2.date_input("Fim", fim_padrao, format="DD/MM/YYYY")
+
+    folha = fechamento.calcular(storage.get_task_store().ler(), get_data("users"), inicio, fim, get_regras(), ledger.transporte(fechamento.historico()))
+    if folha.empty: st.info("Nenhum lançamento no período.")
+    else:
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Colaboradores", len(folha))
+        c2.metric("Total a Pagar", format_currency(folha['a_pagar'].sum()))
+        c3.metric("Retido pelo Teto", format_currency(folha['retido'].sum()))
+        c4.metric("Débito a Transportar", format_currency(folha['a_transportar'].sum()))
+        vis = folha[['nome', 'tipo', 'tarefas', 'saldo_anterior', 'producao', 'kpis', 'ajustes', 'bruto', 'a_pagar']].copy()
+        for c in ['saldo_anterior', 'producao', 'kpis', 'ajustes', 'bruto', 'a_pagar']: vis[c] = vis[c].apply(format_currency)
+        st.dataframe(vis, use_container_width=True, hide_index=True)
+
+        if st.button("🔒 FECHAR PERÍODO", type="primary"):
+            try:
+                fechada, _ = fechamento.fechar(inicio, fim, st.session_state['user_id'], get_regras())
+                st.session_state['folha_rv'] = fechada.to_csv(sep=";", index=False, decimal=",", date_format="%Y-%m-%d").encode("utf-8-sig")
+                st.success("Período fechado. Os saldos passam a contar a partir do dia seguinte.")
+            except fechamento.PeriodoInvalido as e: st.error(str(e))
+        if 'folha_rv' in st.session_state:
+            st.download_button("⬇️ Baixar Folha (CSV)", st.session_state['folha_rv'], file_name=f"folha_rv_{inicio:%Y%m%d}_{fim:%Y%m%d}.csv", mime="text/csv")
+
+    st.subheader("Fechamentos Anteriores")
+    hist = fechamento.historico()
+    if hist.empty: st.info("Nenhum período fechado ainda.")
+    else:
+        resumo = hist.groupby(['id_fechamento', 'inicio', 'fim', 'fechado_em', 'responsavel'], as_index=False).agg(
+            colaboradores=('colaborador_id', 'size'), total=('a_pagar', 'sum')).sort_values('fim', ascending=False)
+        resumo['total'] = resumo['total'].apply(format_currency)
+        st.dataframe(resumo.drop(columns=['id_fechamento']), use_container_width=True, hide_index=True)
+
+def interface_prazos(users):
+    st.title("⏰ Prazos & SLA")
+    c1, c2 = st.columns(2)
+    horizonte = c1.number_input("A vencer nas próximas (horas)", min_value=1, value=prazos.HORIZONTE_H, step=1)
+    espera_max = c2.number_input("Espera máxima por aprovação (horas)", min_value=1, value=prazos.ESPERA_MAX_H, step=1)
+
+    indice = prazos.get_indice()
+    agora = pd.Timestamp(get_time_br())
+    nomes = users.drop_duplicates('id_clean').set_index('id_clean')['nome'] if 'id_clean' in users.columns else pd.Series(dtype=object)
+    nome = lambda c: "SISTEMA" if c == "SISTEMA" else nomes.get(c, f"ID {c}")
+
+    vencendo = indice.vencendo(agora + timedelta(hours=horizonte))
+    vencidas = vencendo[vencendo['instante'] < agora]
+    esperando = indice.aguardando_desde(agora - timedelta(hours=espera_max))
+    totais = indice.totais()
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Por Fazer com Prazo", totais['execucao'])
+    m2.metric("Vencidas", len(vencidas))
+    m3.metric(f"Vencem em {horizonte}h", len(vencendo) - len(vencidas))
+    m4.metric(f"Aprovação > {espera_max}h", len(esperando))
+
+    st.subheader("Vencidas e a Vencer")
+    if vencendo.empty: st.success("Nenhuma tarefa vencida ou a vencer.")
+    else:
+        vis = pd.DataFrame({
+            'Prazo': vencendo['instante'].apply(storage.formatar_data),
+            'Situação': (vencendo['instante'] < agora).map({True: "🔴 Vencida", False: "🟡 A vencer"}),
+            'Colaborador': vencendo['colaborador'].map(nome), 'Atividade': vencendo['atividade'],
+            'Status': vencendo['status'], 'Conferente': vencendo['conferente'].map(nome),
+        })
+        st.dataframe(vis, use_container_width=True, hide_index=True)
+
+    st.subheader("Backlog de Aprovação por Conferente")
+    if esperando.empty: st.success("Nenhuma aprovação atrasada.")
+    else:
+        esperando['horas'] = (agora - esperando['instante']).dt.total_seconds() / 3600
+        por_conf = esperando.groupby('conferente').agg(atrasadas=('id_task', 'size'), espera_max_h=('horas', 'max'), espera_media_h=('horas', 'mean'))
+        por_conf.index = por_conf.index.map(nome)
+        st.dataframe(por_conf.sort_values('atrasadas', ascending=False).style.format({'espera_max_h': '{:.1f}', 'espera_media_h': '{:.1f}'}), use_container_width=True)
+        with st.expander("Ver tarefas"):
+            st.dataframe(pd.DataFrame({
+                'À espera desde': esperando['instante'].apply(storage.formatar_data), 'Horas': esperando['horas'].round(1),
+                'Conferente': esperando['conferente'].map(nome), 'Colaborador': esperando['colaborador'].map(nome),
+                'Atividade': esperando['atividade'], 'Status': esperando['status'],
+            }), use_container_width=True, hide_index=True)
+
+def interface_produtividade(users):
+    st.title("📈 Produtividade")
+    hoje = get_time_br().date()
+    c1, c2 = st.columns(2)
+    inicio = c1.date_input("De", hoje - timedelta(days=30), format="DD/MM/YYYY")
+    fim = c2.date_input("Até", hoje, format="DD/MM/YYYY")
+
+    cubos = analitica.get_cubos()
+    prod = cubos.quadro("producao", inicio, fim)
+    if prod.empty:
+        st.info("Sem tarefas executadas no período.")
+        return
+
+    c1, c2, c3, c4 = st.columns(4)
+    horas = prod['minutos'].sum() / 60
+    decididas = prod['executadas'].sum() + prod['rejeitadas'].sum()
+    c1.metric("Tarefas Executadas", int(prod['executadas'].sum()))
+    c2.metric("Unidades", f"{prod['unidades'].sum():,.0f}".replace(",", "."))
+    c3.metric("Unidades / Hora", f"{prod['unidades'].sum() / horas:.1f}" if horas else "-")
+    c4.metric("Taxa de Rejeição", f"{prod['rejeitadas'].sum() / decididas:.1%}" if decididas else "-")
+
+    st.subheader("Unidades por Dia")
+    st.line_chart(prod.pivot_table(index='dia', columns='turno', values='unidades', aggfunc='sum').fillna(0))
+
+    st.subheader("Unidades por Hora (Atividade x Turno)")
+    por_atv = prod.groupby(['atividade', 'turno'])[['unidades', 'minutos']].sum()
+    uph = (por_atv['unidades'] / (por_atv['minutos'] / 60)).replace([float('inf')], float('nan')).unstack('turno')
+    st.bar_chart(uph.dropna(how='all'))
+
+    st.subheader("Rejeição por Atividade")
+    rej = prod.groupby('atividade')[['executadas', 'rejeitadas']].sum()
+    rej['taxa'] = rej['rejeitadas'] / (rej['executadas'] + rej['rejeitadas'])
+    st.dataframe(rej.sort_values('taxa', ascending=False).style.format({'taxa': '{:.1%}', 'executadas': '{:.0f}', 'rejeitadas': '{:.0f}'}), use_container_width=True)
+
+    st.subheader("Conferentes")
+    conf = cubos.quadro("conferente", inicio, fim).groupby('conferente')[['aprovadas', 'rejeitadas', 'latencia_min', 'com_latencia']].sum()
+    conf['taxa_rejeicao'] = conf['rejeitadas'] / (conf['aprovadas'] + conf['rejeitadas'])
+    conf['latencia_media_min'] = conf['latencia_min'] / conf['com_latencia'].where(conf['com_latencia'] > 0)
+    nomes = users.drop_duplicates('id_clean').set_index('id_clean')['nome'] if 'id_clean' in users.columns else pd.Series(dtype=object)
+    conf.index = [nomes.get(c, "SISTEMA" if c == "SISTEMA" else f"ID {c}") for c in conf.index]
+    st.dataframe(conf[['aprovadas', 'rejeitadas', 'taxa_rejeicao', 'latencia_media_min']].sort_values('aprovadas', ascending=False).style.format(
+        {'aprovadas': '{:.0f}', 'rejeitadas': '{:.0f}', 'taxa_rejeicao': '{:.1%}', 'latencia_media_min': '{:.0f}'}, na_rep="-"), use_container_width=True)
+
+    st.subheader("Volume por SKU (Top 20)")
+    sku = cubos.quadro("sku", inicio, fim)
+    if sku.empty: st.info("Sem SKUs no período.")
+    else: st.bar_chart(sku.groupby('sku')['unidades'].sum().nlargest(20))
+
+def interface_duplicados(users):
+    st.title("🧾 Evidências Duplicadas")
+    st.caption("Mesma foto/vídeo (byte a byte) usada em mais de uma tarefa.")
+    if st.button("Indexar evidências antigas"):
+        st.success(f"{media.indexar_existentes(IMGS_PATH)} ficheiro(s) indexado(s).")
+
+    dup = media.relatorio_duplicados()
+    if dup.empty:
+        st.info("Nenhuma evidência reutilizada.")
+        return
+
+    nomes = users.drop_duplicates('id_clean').set_index('id_clean')['nome'] if not users.empty else pd.Series(dtype=object)
+    dup['colaborador'] = storage.clean_id_series(dup['colaborador']).map(nomes).fillna(dup['colaborador'])
+    por_colab = dup[dup['colaborador'] != ''].groupby('colaborador').agg(
+        evidencias_reutilizadas=('hash', 'nunique'), usos=('alias', 'size')).sort_values('usos', ascending=False)
+    if not por_colab.empty:
+        st.subheader("Por colaborador")
+        st.dataframe(por_colab, use_container_width=True)
+    st.subheader("Detalhe")
+    st.dataframe(dup[['hash', 'usos', 'colaborador', 'task_id', 'alias', 'criado_em']], use_container_width=True, hide_index=True)
 
 def get_conferentes_disponiveis(users, criador_id=None):
     if users.empty or 'tipo' not in users.columns: return pd.DataFrame()
@@ -431,24 +429,77 @@ def get_conferentes_disponiveis(users, criador_id=None):
 
     if criador_id:
         criador_id_str = clean_id(criador_id)
-        confs['id_clean'] = confs['id_login'].apply(clean_id)
         confs_diferentes = confs[confs['id_clean'] != criador_id_str]
         if not confs_diferentes.empty: confs = confs_diferentes
 
     return confs
 
+def montar_fila_tarefas(tasks, users):
+    # Junta numa só passada os nomes do colaborador e do conferente, o tipo e o
+    # bloqueio, para o render só percorrer registos simples.
+    fila = tasks.copy()
+    if users.empty or 'id_clean' not in users.columns: u = pd.DataFrame(columns=['nome', 'tipo'])
+    else: u = users.drop_duplicates('id_clean').set_index('id_clean')
+
+    fila['nome_colaborador'] = fila['colab_clean'].map(u['nome']).fillna('Desconhecido')
+    fila['tipo_colaborador'] = fila['colab_clean'].map(u['tipo']).fillna('').astype(str).str.upper()
+    fila['is_operador'] = fila['tipo_colaborador'].str.contains('OPERADOR', regex=False)
+
+    nome_conf = fila['conf_clean'].map(u['nome'])
+    is_sistema = fila['conf_clean'] == 'SISTEMA'
+    fila['conferente_bloqueado'] = ~is_sistema & (
+        fila['conf_clean'].isin(CONFERENTES_BLOQUEADOS_IDS) |
+        nome_conf.fillna('').astype(str).str.upper().str.contains('|'.join(NOMES_BLOQUEADOS))
+    )
+    fila['nome_conferente'] = nome_conf.fillna("ID " + fila['conferente_id'].astype(str)).astype(str)
+    fila.loc[is_sistema, 'nome_conferente'] = "SISTEMA"
+    return fila
+
+def filtrar_fila(fila, chave):
+    dt = fila['data_criacao']
+    dias = dt.dt.strftime("%d/%m").fillna("-")
+    turnos = dt.dt.hour.map(lambda h: turno_da_hora(int(h)), na_action='ignore').fillna("-")
+
+    with st.expander("🔎 Filtros"):
+        c1, c2, c3, c4 = st.columns(4)
+        f_conf = c1.multiselect("Conferente", sorted(fila['nome_conferente'].unique()), key=f"{chave}_f_conf")
+        f_atv = c2.multiselect("Atividade", sorted(fila['atividade'].astype(str).unique()), key=f"{chave}_f_atv")
+        f_dia = c3.multiselect("Data", sorted(dias.unique(), key=lambda d: d[3:] + d[:2]), key=f"{chave}_f_dia")
+        f_turno = c4.multiselect("Turno", ['A', 'B', 'C'], key=f"{chave}_f_turno")
+
+    mask = pd.Series(True, index=fila.index)
+    if f_conf: mask &= fila['nome_conferente'].isin(f_conf)
+    if f_atv: mask &= fila['atividade'].isin(f_atv)
+    if f_dia: mask &= dias.isin(f_dia)
+    if f_turno: mask &= turnos.isin(f_turno)
+    return fila[mask]
+
+def paginar(fila, chave):
+    # Só a página visível vira widgets (e só ela busca imagens/vídeos de evidência).
+    total = len(fila)
+    paginas = max(1, -(-total // ITENS_POR_PAGINA))
+    k_pag = f"{chave}_pagina"
+    if st.session_state.get(k_pag, 1) > paginas: st.session_state[k_pag] = 1
+
+    c1, c2 = st.columns([1, 3])
+    pagina = c1.number_input("Página", min_value=1, max_value=paginas, step=1, key=k_pag) if paginas > 1 else 1
+    c2.caption(f"{total} tarefa(s) | página {pagina} de {paginas}")
+    inicio = (pagina - 1) * ITENS_POR_PAGINA
+    return fila.iloc[inicio:inicio + ITENS_POR_PAGINA]
+
 # --- MÓDULOS DE CRIAÇÃO E APROVAÇÃO ---
-def render_menu_criar_tarefa(users, rules):
+def render_menu_criar_tarefa(users):
     st.title("📋 Nova Atividade")
+    motor = get_regras()
 
     ops = users[~users['tipo'].str.lower().str.contains('conferente|supervisor', na=False, regex=True)]['nome'].tolist()
-    atvs = [a for a in rules['atividade'].tolist() if a not in TODOS_KPIS] if not rules.empty else []
+    atvs = motor.lista()
     
     colab = st.selectbox("Colaborador", ops)
     atv = st.selectbox("Atividade", atvs)
     
     sku_resultado = "-"
-    if atv and atv not in ATIVIDADES_SEM_SKU:
+    if atv and motor.exige_sku(atv):
         st.markdown("---")
         sku_resultado = buscar_sku_interface_v2()
         st.markdown("---")
@@ -472,41 +523,29 @@ def render_menu_criar_tarefa(users, rules):
                 if not foto_upload:
                     st.error("⚠️ A foto de evidência inicial é OBRIGATÓRIA para criar a tarefa.")
                 else:
-                    cid = users[users['nome'] == colab].iloc[0]['id_login']
-                    val = 0.0
-                    if not rules.empty:
-                        val_lookup = rules.loc[rules['atividade'] == atv, 'valor']
-                        if not val_lookup.empty: val = val_lookup.values[0]
-
-                    if atv == "5S" and verificar_limite_diario_atividade(cid, "5S"): val = 0.0
+                    cname_df = users[users['nome'] == colab]
+                    cid = cname_df.iloc[0]['id_login']
+                    papel = 'Operador' if 'OPERADOR' in str(cname_df.iloc[0]['tipo']).upper() else 'Colaborador'
+                    val = motor.preco({'atividade': atv}, papel, feitas_hoje(cid, atv))
 
                     path_evidencia = ""
                     task_id_new = str(uuid.uuid4())
                     
                     if foto_upload:
-                        ext = foto_upload.name.split('.')[-1].lower()
                         base_name = generate_media_name(colab, atv, sku_resultado, "INICIAL")
-                        path_evidencia = f"{IMGS_PATH}/{base_name}.{ext}"
-                        with open(path_evidencia, "wb") as f: f.write(foto_upload.getbuffer())
-                        upload_media_to_github(path_evidencia)
+                        path_evidencia = media.salvar_evidencia(foto_upload, base_name, IMGS_PATH, cid, task_id_new)
 
-                    cname_df = users[users['nome'] == colab]
-                    is_operador = 'OPERADOR' in str(cname_df.iloc[0]['tipo']).upper() if not cname_df.empty else False
-                    val_para_banco = 0.0 if is_operador else float(val)
-                    prazo_calculado = (get_time_br() + timedelta(hours=prazo_horas)).strftime("%Y-%m-%d %H:%M:%S")
+                    prazo_calculado = get_time_br() + timedelta(hours=prazo_horas)
 
+                    # Conferente do turno com a menor fila em relação à vazão recente.
                     confs_disponiveis = get_conferentes_disponiveis(users, st.session_state.get('user_id'))
-                    
-                    if not confs_disponiveis.empty:
-                        sorteado_id = str(random.choice(confs_disponiveis['id_login'].tolist()))
-                    else:
-                        sorteado_id = "SISTEMA"
+                    sorteado_id = atribuicao.escolher_conferente(confs_disponiveis['id_login'].tolist() if not confs_disponiveis.empty else [])
 
                     task = {
                         'id_task': task_id_new, 'colaborador_id': str(cid), 'conferente_id': sorteado_id,
                         'atividade': atv, 'area': area, 'descricao': obs, 
                         'sku_produto': sku_resultado, 'prioridade': prio, 'status': 'Pendente',
-                        'valor': val_para_banco, 'data_criacao': get_time_br().strftime("%d/%m %H:%M"),
+                        'valor': val, 'data_criacao': get_time_br(),
                         'inicio_execucao': None, 'fim_execucao': None, 
                         'tempo_total_min': 0, 'obs_rejeicao': '',
                         'qtd_lata': 0, 'qtd_pet': 0, 'qtd_oneway': 0, 'qtd_longneck': 0, 
@@ -525,40 +564,31 @@ def render_menu_aprovar_tarefas(users, tasks):
             nome_usuario = str(st.session_state.get('user_name', '')).upper()
             meu_id = clean_id(st.session_state['user_id'])
             
-            if meu_id in [clean_id(x) for x in CONFERENTES_BLOQUEADOS] or 'WEUDES' in nome_usuario or 'JULIANO' in nome_usuario:
+            if meu_id in CONFERENTES_BLOQUEADOS_IDS or any(n in nome_usuario for n in NOMES_BLOQUEADOS):
                 st.error("🔒 O seu acesso para aprovação está suspenso/bloqueado.")
                 return
                 
-            pends['conf_clean'] = pends['conferente_id'].apply(clean_id)
             pends = pends[pends['conf_clean'] == meu_id]
         
         if pends.empty: 
             st.info("Nenhuma tarefa pendente no momento.")
             return
         
-        users['colab_clean'] = users['id_login'].apply(clean_id)
-        users['conf_clean'] = users['id_login'].apply(clean_id)
-        
-        for i, row in pends.iterrows():
+        fila = filtrar_fila(montar_fila_tarefas(pends, users), "aprovar")
+        if fila.empty:
+            st.info("Nenhuma tarefa corresponde aos filtros.")
+            return
+        fila = paginar(fila, "aprovar")
+        for i, row in zip(fila.index, fila.to_dict('records')):
             k_approve = f"ok_{row['id_task']}_{i}"
             k_reject_btn = f"rej_btn_{row['id_task']}_{i}"
             k_reason = f"reason_{row['id_task']}_{i}"
             
-            cname_df = users[users['colab_clean'] == clean_id(row['colaborador_id'])]
-            nome_colab_tarefa = cname_df.iloc[0]['nome'] if not cname_df.empty else 'Desconhecido'
-            tipo_usuario = str(cname_df.iloc[0]['tipo']).upper() if not cname_df.empty else ""
+            nome_colab_tarefa = row['nome_colaborador']
+            nome_conferente = row['nome_conferente']
+            if row['conferente_bloqueado']: nome_conferente = f"⚠️ {nome_conferente} (BLOQUEADO)"
             
-            conf_id_str = clean_id(row['conferente_id'])
-            if conf_id_str == 'SISTEMA': nome_conferente = "SISTEMA"
-            else:
-                c_df = users[users['conf_clean'] == conf_id_str]
-                nome_conferente = c_df.iloc[0]['nome'] if not c_df.empty else f"ID {row['conferente_id']}"
-                
-                if conf_id_str in [clean_id(x) for x in CONFERENTES_BLOQUEADOS] or 'WEUDES' in nome_conferente.upper() or 'JULIANO' in nome_conferente.upper():
-                    nome_conferente = f"⚠️ {nome_conferente} (BLOQUEADO)"
-            
-            is_operador = 'OPERADOR' in tipo_usuario
-            valor_a_pagar = 0.0 if is_operador else float(row['valor'])
+            valor_a_pagar = get_regras().a_pagar(row, 'Operador' if row['is_operador'] else 'Colaborador')
             
             with st.container():
                 st.markdown(f"**{nome_colab_tarefa}** - {row['atividade']}")
@@ -570,33 +600,30 @@ def render_menu_aprovar_tarefas(users, tasks):
                 else:
                     st.caption(f"📦 Material: {sku_info} | 🔍 Responsável: **{nome_conferente}**")
                 
-                st.write(f"📅 **Criada em:** {row['data_criacao']} | ✅ **Finalizada em:** {row.get('fim_execucao', '-')}")
+                st.write(f"📅 **Criada em:** {storage.formatar_data(row['data_criacao'])} | ✅ **Finalizada em:** {storage.formatar_data(row.get('fim_execucao'))}")
 
                 c1, c2 = st.columns(2)
                 c1.write(f"⏱️ {row['tempo_total_min']} min")
                 
                 if row['atividade'] == 'REPACK': c1.info(f"🥫L:{row['qtd_lata']} 🍾P:{row['qtd_pet']} 🧊OW:{row['qtd_oneway']} 🍺LN:{row['qtd_longneck']}")
-                elif row['atividade'] in ATIVIDADES_SEM_QUANTIDADE: c1.info("Tarefa de Execução Única")
+                elif get_regras().tipo(row['atividade']) == regras.FIXO: c1.info("Tarefa de Execução Única")
                 else: c1.info(f"Qtd: {row['qtd_produzida']}")
                 
                 c1.metric("A Pagar", format_currency(valor_a_pagar))
                 
-                img_url = get_media_url(row['evidencia_img'])
-                if img_url:
-                    ext = img_url.split('.')[-1].lower()
-                    if ext in ['mp4', 'avi', 'mov', 'mkv']: c2.video(img_url)
-                    else:
-                        try: c2.image(img_url, width=200, caption="Evidência")
-                        except: c2.error("Erro ao carregar imagem")
-                else: c2.warning("Ficheiro não encontrado.")
+                if not exibir_evidencia(c2, row['evidencia_img'], 200, "Evidência"): c2.warning("Ficheiro não encontrado.")
                 
+                em_envio = media.em_envio(row['evidencia_img'])
+                if em_envio: c2.caption("⏳ Evidência ainda a ser enviada; aprovação liberada quando o envio terminar.")
+                elif media.envio_falhou(row['evidencia_img']): c2.warning("⚠️ O envio da evidência falhou e ela só existe neste servidor. Reenvie pelo Diagnóstico.")
+
                 b1, b2 = st.columns(2)
-                if b1.button("✅ Aprovar", key=k_approve):
-                    if update_rv_safe(row['colaborador_id'], valor_a_pagar):
-                        update_task_safe(row['id_task'], {'status': 'Executada', 'valor': valor_a_pagar})
+                if b1.button("✅ Aprovar", key=k_approve, disabled=em_envio):
+                    if aprovar_tarefa_safe(row['id_task'], {'status': 'Executada', 'valor': valor_a_pagar, 'data_aprovacao': get_time_br()}, 'Aguardando Aprovação'):
                         st.success("Pago!")
                         time.sleep(0.5)
                         st.rerun()
+                    else: st.warning("Tarefa já processada.")
                 with b2:
                     with st.expander("❌ Rejeitar"):
                         motivo = st.text_input("Motivo:", key=k_reason)
@@ -608,16 +635,15 @@ def render_menu_aprovar_tarefas(users, tasks):
 
 def interface_supervisor():
     st.sidebar.header(f"👮 {st.session_state.get('user_name', 'Sup')}")
-    menu = st.sidebar.radio("Menu", ["Criar Tarefa", "Aprovar Tarefas", "Validar KPIs", "Ajustes Financeiros", "Ranking", "Regras & Valores", "Sair"])
+    menu = st.sidebar.radio("Menu", ["Criar Tarefa", "Aprovar Tarefas", "Validar KPIs", "Ajustes Financeiros", "Fechamento", "Ranking", "Produtividade", "Prazos & SLA", "Evidências Duplicadas", "Regras & Valores", "Diagnóstico", "Sair"])
     
     if menu == "Sair": do_logout()
     elif menu == "Regras & Valores": interface_regras()
     
     users = get_data("users")
-    rules = get_data("rules")
     tasks = get_data("tasks")
 
-    if menu == "Criar Tarefa": render_menu_criar_tarefa(users, rules)
+    if menu == "Criar Tarefa": render_menu_criar_tarefa(users)
     elif menu == "Aprovar Tarefas": render_menu_aprovar_tarefas(users, tasks)
     elif menu == "Validar KPIs":
         st.title("🛡️ Validar Metas (KPIs)")
@@ -626,12 +652,12 @@ def interface_supervisor():
             pendentes = tasks[(tasks['status'] == 'Aguardando Validação') & (tasks['atividade'].isin(TODOS_KPIS))]
             if pendentes.empty: st.info("Tudo validado!")
             else:
-                users['colab_clean'] = users['id_login'].apply(clean_id)
-                for i, row in pendentes.iterrows():
+                fila = montar_fila_tarefas(pendentes, users)
+                fila.loc[fila['nome_colaborador'] == 'Desconhecido', 'nome_colaborador'] = fila['colaborador_id'].astype(str)
+                for i, row in zip(fila.index, fila.to_dict('records')):
                     k_ok = f"btn_ok_{row['id_task']}_{i}"
                     k_nok = f"btn_nok_{row['id_task']}_{i}"
-                    cname = users[users['colab_clean'] == clean_id(row['colaborador_id'])]['nome'].values
-                    nome_colab = cname[0] if len(cname) > 0 else row['colaborador_id']
+                    nome_colab = row['nome_colaborador']
                     
                     with st.container():
                         col1, col2, col3 = st.columns([3, 1, 1])
@@ -640,19 +666,16 @@ def interface_supervisor():
                         
                         col1.markdown(f"**{nome_colab}** | {row['atividade']} | Declarado: **{status_user}** ({format_currency(val)})")
                         if col2.button("✅ Confirmar", key=k_ok):
-                            if update_rv_safe(row['colaborador_id'], val):
-                                update_task_safe(row['id_task'], {'status': 'Executada'})
+                            if aprovar_tarefa_safe(row['id_task'], {'status': 'Executada', 'data_aprovacao': get_time_br()}, 'Aguardando Validação'):
                                 st.rerun()
                         if col3.button("✏️ Alterar", key=k_nok):
                             novo_status = 'Não Atingido' if val > 0 else 'Executada'
                             novo_valor = 0.0
                             obs = "Supervisor alterou para NOK"
                             if val == 0: 
-                                try: novo_valor = float(rules.loc[rules['atividade'] == row['atividade'], 'valor'].values[0])
-                                except: novo_valor = 0.0
+                                novo_valor = get_regras().valor(row['atividade'])
                                 obs = "Supervisor alterou para OK"
-                            if update_rv_safe(row['colaborador_id'], novo_valor):
-                                update_task_safe(row['id_task'], {'status': novo_status, 'valor': novo_valor, 'obs_rejeicao': obs})
+                            if aprovar_tarefa_safe(row['id_task'], {'status': novo_status, 'valor': novo_valor, 'obs_rejeicao': obs, 'data_aprovacao': get_time_br()}, 'Aguardando Validação'):
                                 st.rerun()
                         st.divider()
 
@@ -669,30 +692,38 @@ def interface_supervisor():
                 if valor > 0 and motivo:
                     cid = users[users['nome'] == colab].iloc[0]['id_login']
                     valor_final = valor if tipo == "Crédito (+)" else -valor
-                    if update_rv_safe(cid, valor_final):
-                        task = {
-                            'id_task': str(uuid.uuid4()), 'colaborador_id': str(cid),
-                            'conferente_id': st.session_state['user_id'], 'atividade': "AJUSTE MANUAL",
-                            'area': "ADM", 'descricao': f"{tipo}: {motivo}", 'sku_produto': "-",
-                            'prioridade': 'Alta', 'status': 'Executada', 'valor': float(valor_final),
-                            'data_criacao': get_time_br().strftime("%d/%m %H:%M"),
-                            'inicio_execucao': "-", 'fim_execucao': "-", 'tempo_total_min': 0, 'obs_rejeicao': "", 
-                            'qtd_lata': 0, 'qtd_pet': 0, 'qtd_oneway': 0, 'qtd_longneck': 0, 
-                            'qtd_produzida': 0, 'evidencia_img': "", 'prazo': '2099-12-31 23:59:59'
-                        }
-                        add_task_safe(task)
-                        st.success(f"Sucesso! Ajuste de {format_currency(valor_final)} efetuado.")
-                        time.sleep(1)
-                        st.rerun()
-                    else: st.error("Erro ao atualizar saldo.")
+                    # O ajuste é um lançamento 'Executada' no ledger, como qualquer outra tarefa paga.
+                    task = {
+                        'id_task': str(uuid.uuid4()), 'colaborador_id': str(cid),
+                        'conferente_id': st.session_state['user_id'], 'atividade': "AJUSTE MANUAL",
+                        'area': "ADM", 'descricao': f"{tipo}: {motivo}", 'sku_produto': "-",
+                        'prioridade': 'Alta', 'status': 'Executada', 'valor': float(valor_final),
+                        'data_criacao': get_time_br(),
+                        'inicio_execucao': None, 'fim_execucao': None, 'tempo_total_min': 0, 'obs_rejeicao': "", 
+                        'qtd_lata': 0, 'qtd_pet': 0, 'qtd_oneway': 0, 'qtd_longneck': 0, 
+                        'qtd_produzida': 0, 'evidencia_img': "", 'prazo': storage.SEM_PRAZO
+                    }
+                    add_task_safe(task)
+                    st.success(f"Sucesso! Ajuste de {format_currency(valor_final)} efetuado.")
+                    time.sleep(1)
+                    st.rerun()
                 else: st.warning("Insira o valor e o motivo.")
 
     elif menu == "Ranking":
         st.title("🏆 Ranking Geral")
-        df_rank = users[['nome', 'rv_acumulada']].copy().sort_values('rv_acumulada', ascending=False).reset_index(drop=True)
+        saldos = get_ledger().saldos()
+        df_rank = users[['nome']].copy()
+        df_rank['rv_acumulada'] = users['id_clean'].map(saldos).fillna(0.0)
+        df_rank = df_rank.sort_values('rv_acumulada', ascending=False).reset_index(drop=True)
         df_rank['rv_acumulada'] = df_rank['rv_acumulada'].apply(format_currency)
         st.table(df_rank)
 
+    elif menu == "Fechamento": interface_fechamento()
+    elif menu == "Produtividade": interface_produtividade(users)
+    elif menu == "Prazos & SLA": interface_prazos(users)
+    elif menu == "Evidências Duplicadas": interface_duplicados(users)
+    elif menu == "Diagnóstico": interface_diagnostico()
+
 def interface_operador():
     if 'role' not in st.session_state or 'user_id' not in st.session_state: do_logout()
     st.sidebar.header(f"👷 {st.session_state['user_name']}")
@@ -706,20 +737,9 @@ def interface_operador():
     elif menu == "Regras & Valores": interface_regras()
     elif menu == "🚀 KPIs Diários" and st.session_state.get('role') == 'Operador':
         st.title("🚀 Metas do Dia")
-        rules = get_data("rules")
-        
-        def get_val(name):
-            try: return float(rules[rules['atividade']==name]['valor'].values[0])
-            except: return 0.0
-            
-        v_efc, v_efd, v_tma, v_res = get_val('EFC'), get_val('EFD'), get_val('TMA'), get_val('RESSUPRIMENTO')
-        hoje = get_time_br().strftime("%d/%m")
-        tasks = get_data("tasks")
-        
-        ja_fez = False
-        if not tasks.empty:
-            tasks['colab_clean'] = tasks['colaborador_id'].apply(clean_id)
-            ja_fez = not tasks[(tasks['colab_clean']==clean_id(uid)) & (tasks['data_criacao'].str.contains(hoje)) & (tasks['atividade'].isin(KPI_OPERADOR))].empty
+        motor = get_regras()
+        v_efc, v_efd, v_tma, v_res = motor.valor('EFC'), motor.valor('EFD'), motor.valor('TMA'), motor.valor('RESSUPRIMENTO')
+        ja_fez = storage.get_task_store().feitas_no_dia(uid, KPI_OPERADOR, get_time_br().date()) > 0
         
         if ja_fez: st.info("✅ KPIs de hoje já enviados e aguardam validação.")
         else:
@@ -732,18 +752,20 @@ def interface_operador():
                 
                 if st.form_submit_button("ENVIAR"):
                     lista = [("EFC", c_efc, v_efc), ("EFD", c_efd, v_efd), ("TMA", c_tma, v_tma), ("RESSUPRIMENTO", c_res, v_res)]
+                    novas = []
                     for nome, check, val in lista:
                         vf = val if check else 0.0
                         task = {
                             'id_task': str(uuid.uuid4()), 'colaborador_id': uid, 'conferente_id': 'SISTEMA',
                             'atividade': nome, 'area': 'OPERAÇÃO', 'descricao': 'Auto-Avaliação',
                             'sku_produto': '-', 'prioridade': 'Alta', 'status': 'Aguardando Validação',
-                            'valor': float(vf), 'data_criacao': get_time_br().strftime("%d/%m %H:%M"),
-                            'inicio_execucao': "-", 'fim_execucao': "-", 'tempo_total_min': 0, 'obs_rejeicao': "", 
+                            'valor': float(vf), 'data_criacao': get_time_br(),
+                            'inicio_execucao': None, 'fim_execucao': None, 'tempo_total_min': 0, 'obs_rejeicao': "", 
                             'qtd_lata': 0, 'qtd_pet': 0, 'qtd_oneway': 0, 'qtd_longneck': 0, 
-                            'qtd_produzida': 0, 'evidencia_img': "", 'prazo': '2099-12-31 23:59:59'
+                            'qtd_produzida': 0, 'evidencia_img': "", 'prazo': storage.SEM_PRAZO
                         }
-                        add_task_safe(task)
+                        novas.append(task)
+                    add_tasks_bulk(novas)
                     st.success("Enviado com sucesso!")
                     time.sleep(1)
                     st.rerun()
@@ -752,43 +774,34 @@ def interface_operador():
     elif menu == "Auto-Cadastro": interface_colaborador_auto(uid)
     elif menu == "Dashboard":
         st.title("📊 O Seu Desempenho")
-        users = get_data("users")
-        users['colab_clean'] = users['id_login'].apply(clean_id)
-        meu_saldo = users[users['colab_clean'] == clean_id(uid)]['rv_acumulada'].values
-        saldo_real = float(meu_saldo[0]) if len(meu_saldo) > 0 else 0.0
-        saldo_exibido = min(saldo_real, LIMITE_RV_OPERADOR)
-        
-        tasks = get_data("tasks")
-        total_tarefas = 0
-        soma_kpis = 0.0
-
-        if not tasks.empty:
-            tasks['colab_clean'] = tasks['colaborador_id'].apply(clean_id)
-            minhas = tasks[(tasks['colab_clean'] == clean_id(uid)) & (tasks['status'] == 'Executada')]
-            total_tarefas = len(minhas)
-            kpi_tasks = minhas[minhas['atividade'].isin(KPI_OPERADOR)]
-            if not kpi_tasks.empty: soma_kpis = kpi_tasks['valor'].sum()
+        conta = get_ledger().conta(uid)
+        saldo_real = conta['saldo']
+        teto = get_regras().teto_rv
+        saldo_exibido = min(saldo_real, teto)
+        total_tarefas = conta['executadas']
+        soma_kpis = conta['kpis']
+        tasks = storage.get_task_store().ler_por_colaborador(uid)
 
         c1, c2, c3 = st.columns(3)
-        c1.metric("💰 Saldo Total (RV)", format_currency(saldo_exibido))
+        c1.metric("💰 Saldo do Período (RV)", format_currency(saldo_exibido))
         c2.metric("📦 Tarefas Executadas", total_tarefas)
         
         if st.session_state.get('role') == 'Operador': c3.metric("🎯 Ganho com KPIs", format_currency(soma_kpis))
         else: c3.metric("⭐ Status", "Ativo") 
 
-        if saldo_real > LIMITE_RV_OPERADOR:
-            st.warning(f"🔒 Teto de RV atingido! O seu acumulado real é {format_currency(saldo_real)}, mas o pagamento é limitado a {format_currency(LIMITE_RV_OPERADOR)}.")
+        if saldo_real > teto:
+            st.warning(f"🔒 Teto de RV atingido! O seu acumulado real é {format_currency(saldo_real)}, mas o pagamento é limitado a {format_currency(teto)}.")
 
         st.subheader("Histórico Recente")
         if not tasks.empty:
-            hist = tasks[(tasks['colaborador_id'].apply(clean_id) == clean_id(uid))].sort_values('data_criacao', ascending=False).head(10)
+            hist = tasks.sort_values('data_criacao', ascending=False).head(10)
             st.dataframe(hist[['data_criacao', 'atividade', 'status', 'valor']], use_container_width=True)
 
 def interface_conferente():
     nome_usuario = str(st.session_state.get('user_name', '')).upper()
     meu_id = clean_id(st.session_state['user_id'])
     
-    if meu_id in [clean_id(x) for x in CONFERENTES_BLOQUEADOS] or 'WEUDES' in nome_usuario or 'JULIANO' in nome_usuario:
+    if meu_id in CONFERENTES_BLOQUEADOS_IDS or any(n in nome_usuario for n in NOMES_BLOQUEADOS):
         st.sidebar.error("Acesso de Aprovação Suspenso")
         st.title("🔒 Bloqueio de Sistema")
         st.error("O seu perfil foi restrito para criar ou aprovar tarefas.")
@@ -798,27 +811,23 @@ def interface_conferente():
     st.sidebar.header(f"👤 {st.session_state.get('user_name', 'Conf')}")
     menu = st.sidebar.radio("Menu", ["Criar Tarefa", "Aprovar Tarefas", "Regras & Valores", "Sair"])
     users = get_data("users")
-    tasks = get_data("tasks")
-    rules = get_data("rules")
 
     if menu == "Sair": do_logout()
     elif menu == "Regras & Valores": interface_regras()
-    elif menu == "Criar Tarefa": render_menu_criar_tarefa(users, rules)
-    elif menu == "Aprovar Tarefas": render_menu_aprovar_tarefas(users, tasks)
+    elif menu == "Criar Tarefa": render_menu_criar_tarefa(users)
+    # O conferente só vê as próprias tarefas: lidas pelo índice, sem filtrar a tabela inteira.
+    elif menu == "Aprovar Tarefas": render_menu_aprovar_tarefas(users, storage.get_task_store().ler_por_conferente(meu_id))
 
 # --- FUNÇÕES REUTILIZÁVEIS ---
 def interface_colaborador_tarefas(uid):
-    tasks = get_data("tasks")
-    users = get_data("users")
+    tasks = storage.get_task_store().ler_por_colaborador(uid)
     st.title("🗂️ Tarefas")
     
     if tasks.empty:
         st.info("Nenhuma tarefa encontrada.")
         return
 
-    tasks['colab_clean'] = tasks['colaborador_id'].apply(clean_id)
-    mask_pend = (tasks['colab_clean'] == clean_id(uid)) & \
-                (tasks['status'].isin(['Pendente', 'Em Execução', 'Rejeitada'])) & \
+    mask_pend = (tasks['status'].isin(['Pendente', 'Em Execução', 'Rejeitada'])) & \
                 (~tasks['atividade'].isin(TODOS_KPIS))
     todo = tasks[mask_pend].copy()
     
@@ -826,47 +835,36 @@ def interface_colaborador_tarefas(uid):
         st.info("Nenhuma tarefa pendente.")
         return
         
-    todo['prazo_dt'] = pd.to_datetime(todo['prazo'], errors='coerce').fillna(pd.Timestamp('2099-12-31 23:59:59'))
-    todo = todo.sort_values(by='prazo_dt', ascending=True)
-    
-    users['conf_clean'] = users['id_login'].apply(clean_id)
+    todo['prazo_dt'] = todo['prazo'].fillna(storage.SEM_PRAZO)
+    todo = filtrar_fila(montar_fila_tarefas(todo.sort_values(by='prazo_dt', ascending=True), get_data("users")), "tarefas")
+    if todo.empty:
+        st.info("Nenhuma tarefa corresponde aos filtros.")
+        return
+    todo = paginar(todo, "tarefas")
     
-    for i, row in todo.iterrows():
+    for row in todo.to_dict('records'):
         k_init = f"init_{row['id_task']}"
         k_end = f"end_{row['id_task']}"
         
         prazo_exibicao = ""
-        try:
-            dt_p = pd.to_datetime(row['prazo'])
-            if dt_p.year < 2090: prazo_exibicao = f" | ⏳ Prazo: {dt_p.strftime('%d/%m %H:%M')}"
-        except: pass
+        if row['prazo_dt'] < storage.SEM_PRAZO: prazo_exibicao = f" | ⏳ Prazo: {row['prazo_dt'].strftime('%d/%m %H:%M')}"
             
-        conf_id_str = clean_id(row['conferente_id'])
-        if conf_id_str == 'SISTEMA': nome_passou = "SISTEMA"
-        else:
-            c_df = users[users['conf_clean'] == conf_id_str]
-            nome_passou = c_df.iloc[0]['nome'] if not c_df.empty else f"ID {conf_id_str}"
+        nome_passou = row['nome_conferente']
         
         with st.expander(f"{row['atividade']} ({row['status']}){prazo_exibicao}", expanded=True):
             st.markdown(f"👤 **Aprovador Responsável:** `{nome_passou}`")
-            st.write(f"📅 **Data/Hora Criação:** {row['data_criacao']}")
+            st.write(f"📅 **Data/Hora Criação:** {storage.formatar_data(row['data_criacao'])}")
             st.write(f"📍 **Local:** {row['area']}")
             st.write(f"📦 **Material:** {row['sku_produto']}")
             st.write(f"📝 **Obs:** {row['descricao']}")
             
-            img_url = get_media_url(row.get('evidencia_img', ''))
-            if img_url:
-                 ext = img_url.split('.')[-1].lower()
-                 if ext in ['mp4', 'avi', 'mov', 'mkv']: st.video(img_url)
-                 else: st.image(img_url, width=100, caption="Ref. Inicial")
+            exibir_evidencia(st, row.get('evidencia_img', ''), 100, "Ref. Inicial")
 
             if row['status'] == 'Rejeitada': st.error(f"Motivo: {row['obs_rejeicao']}")
-            fmt_completo = "%d/%m/%Y %H:%M:%S"
 
             if row['status'] != 'Em Execução':
                 if st.button("▶️ INICIAR", key=k_init):
-                    now_str = get_time_br().strftime(fmt_completo)
-                    update_task_safe(row['id_task'], {'status': 'Em Execução', 'inicio_execucao': now_str})
+                    update_task_safe(row['id_task'], {'status': 'Em Execução', 'inicio_execucao': get_time_br()})
                     st.rerun()
             else:
                 if st.button("⏹️ FINALIZAR", key=k_end):
@@ -878,45 +876,38 @@ def interface_colaborador_tarefas(uid):
                 st.write("📝 Detalhes da Execução")
                 
                 tempo_final = 1
-                try:
-                    if row['inicio_execucao'] and row['inicio_execucao'] != "-":
-                        start_time = pd.to_datetime(row['inicio_execucao'], format="%d/%m/%Y %H:%M:%S")
-                        end_time = pd.to_datetime(get_time_br())
-                        diff_min = (end_time - start_time).total_seconds() / 60
-                        tempo_final = int(round(diff_min))
-                except Exception as e: tempo_final = 1
+                if pd.notna(row['inicio_execucao']):
+                    tempo_final = int(round((get_time_br() - row['inicio_execucao']).total_seconds() / 60))
                 
                 if tempo_final < 1: tempo_final = 1
                 st.info(f"⏱️ Tempo calculado: **{tempo_final} min** (Automático)")
 
                 with st.form(f"form_fim_{row['id_task']}"):
+                    motor = get_regras()
+                    tipo = motor.tipo(row['atividade'])
                     qtd = 1.0
-                    val_calc = float(row['valor'])
                     lata, pet, ow, ln = 0,0,0,0
                     
-                    if row['atividade'] == 'REPACK':
+                    if tipo == regras.REPACK:
                         c1,c2,c3,c4 = st.columns(4)
                         lata = c1.number_input("Lata", 0)
                         pet = c2.number_input("PET", 0)
                         ow = c3.number_input("OW", 0)
                         ln = c4.number_input("LN", 0)
-                        val_calc = (lata*0.10)+(pet*0.15)+(ow*0.20)+(ln*0.20)
-                    elif row['atividade'] in ATIVIDADES_SEM_QUANTIDADE: 
+                    elif tipo == regras.FIXO: 
                         st.info("Atividade com valor fixo por execução.")
-                        val_calc = float(row['valor'])
-                        qtd = 1.0
-                    elif row['atividade'] in ATIVIDADES_POR_CARRO:
+                    elif tipo == regras.CARRO:
                         qtd = st.number_input("Qtd Carros", 1.0)
-                        val_calc = float(row['valor']) * qtd
                     else:
                         qtd = st.number_input("Qtd Paletes/Unid", 1.0)
-                        val_calc = float(row['valor']) * qtd
+
+                    papel = st.session_state.get('role')
+                    val_calc = motor.preco(dict(row, qtd_produzida=qtd, qtd_lata=lata, qtd_pet=pet, qtd_oneway=ow, qtd_longneck=ln), papel)
                     
-                    if st.session_state.get('role') == 'Operador':
-                        val_calc = 0.0
+                    if not motor.remunera(row['atividade'], papel):
                         st.info("💡 Como Operador, a sua remuneração variável contabiliza exclusivamente os KPIs. Esta tarefa soma R$ 0,00 ao seu saldo.")
-                    elif row['atividade'] == '5S' and val_calc == 0.0:
-                        st.info("💡 Limite de 1 pagamento diário para 5S já atingido. Somente a produtividade será registrada (R$ 0,00).")
+                    elif motor.limite_diario(row['atividade']) and val_calc == 0.0:
+                        st.info(f"💡 Limite de {motor.limite_diario(row['atividade'])} pagamento(s) diário(s) para {row['atividade']} já atingido. Somente a produtividade será registrada (R$ 0,00).")
 
                     st.write(f"**Valor Final:** {format_currency(val_calc)}")
                     st.markdown("**📸 Foto Obrigatória para concluir**")
@@ -925,16 +916,13 @@ def interface_colaborador_tarefas(uid):
                     if st.form_submit_button("CONCLUIR"):
                         if not foto: st.error("⚠️ Precisa anexar uma foto para finalizar!")
                         else:
-                            ext = foto.name.split('.')[-1].lower()
                             base_name = generate_media_name(st.session_state['user_name'], row['atividade'], row['sku_produto'], "FINAL")
-                            pth = f"{IMGS_PATH}/{base_name}.{ext}"
-                            with open(pth, "wb") as f: f.write(foto.getbuffer())
-                            upload_media_to_github(pth)
+                            pth = media.salvar_evidencia(foto, base_name, IMGS_PATH, row['colaborador_id'], row['id_task'])
                             
                             update_task_safe(row['id_task'], {
                                 'status': 'Aguardando Aprovação', 'qtd_produzida': qtd, 'valor': val_calc,
                                 'evidencia_img': pth, 'qtd_lata': lata, 'qtd_pet': pet, 'qtd_oneway': ow, 'qtd_longneck': ln,
-                                'fim_execucao': get_time_br().strftime(fmt_completo), 'tempo_total_min': tempo_final 
+                                'fim_execucao': get_time_br(), 'tempo_total_min': tempo_final 
                             })
                             if 'f_id' in st.session_state: del st.session_state['f_id']
                             st.success("Tarefa entregue!")
@@ -943,7 +931,7 @@ def interface_colaborador_tarefas(uid):
 
 def interface_colaborador_auto(uid):
     st.title("🙋 Auto-Cadastro")
-    rules = get_data("rules")
+    motor = get_regras()
     users = get_data("users")
     
     confs_df = get_conferentes_disponiveis(users, st.session_state.get('user_id'))
@@ -955,13 +943,16 @@ def interface_colaborador_auto(uid):
         st.warning("Nenhum conferente disponível para o turno atual. Contate o administrador.")
         colab_sel = None
     else:
-        colab_sel = st.selectbox("Quem aprova?", confs)
+        # Sugere o conferente com a fila mais leve; o colaborador pode trocar.
+        sugerido = atribuicao.escolher_conferente(confs_df['id_login'].tolist(), sortear=False)
+        ids_confs = confs_df['id_login'].astype(str).tolist()
+        colab_sel = st.selectbox("Quem aprova?", confs, index=ids_confs.index(sugerido) if sugerido in ids_confs else 0)
     
-    atvs = [a for a in rules['atividade'].tolist() if a not in TODOS_KPIS] if not rules.empty else []
+    atvs = motor.lista()
     atv = st.selectbox("Atividade", atvs)
 
     sku_resultado = "-"
-    if atv and atv not in ATIVIDADES_SEM_SKU:
+    if atv and motor.exige_sku(atv):
         st.markdown("---")
         sku_resultado = buscar_sku_interface_v2()
         st.markdown("---")
@@ -986,30 +977,22 @@ def interface_colaborador_auto(uid):
                         st.error("Aprovador inválido")
                         return
 
-                    val = 0.0
-                    val_lookup = rules.loc[rules['atividade'] == atv, 'valor']
-                    if not val_lookup.empty: val = val_lookup.values[0]
-                    
-                    if atv == "5S" and verificar_limite_diario_atividade(uid, "5S"): val = 0.0
-                    if st.session_state.get('role') == 'Operador': val = 0.0
+                    val = motor.preco({'atividade': atv}, st.session_state.get('role'), feitas_hoje(uid, atv))
 
                     path_init = ""
                     task_id = str(uuid.uuid4())
                     
                     if foto_init:
-                        ext = foto_init.name.split('.')[-1].lower()
                         base_name = generate_media_name(st.session_state['user_name'], atv, sku_resultado, "AUTO_INICIAL")
-                        path_init = f"{IMGS_PATH}/{base_name}.{ext}"
-                        with open(path_init, "wb") as f: f.write(foto_init.getbuffer())
-                        upload_media_to_github(path_init)
+                        path_init = media.salvar_evidencia(foto_init, base_name, IMGS_PATH, uid, task_id)
                         
-                    prazo_calculado = (get_time_br() + timedelta(hours=prazo_horas)).strftime("%Y-%m-%d %H:%M:%S")
+                    prazo_calculado = get_time_br() + timedelta(hours=prazo_horas)
 
                     task = {
                         'id_task': task_id, 'colaborador_id': str(uid), 'conferente_id': str(conf_id),
                         'atividade': atv, 'area': loc, 'descricao': obs,
                         'sku_produto': sku_resultado, 'prioridade': 'Média', 'status': 'Pendente',
-                        'valor': float(val), 'data_criacao': get_time_br().strftime("%d/%m %H:%M"),
+                        'valor': float(val), 'data_criacao': get_time_br(),
                         'inicio_execucao': None, 'fim_execucao': None, 'tempo_total_min': 0, 'obs_rejeicao': '',
                         'qtd_lata': 0, 'qtd_pet': 0, 'qtd_oneway': 0, 'qtd_longneck': 0,
                         'qtd_produzida': 0, 'evidencia_img': path_init, 'prazo': prazo_calculado
@@ -1020,6 +1003,10 @@ def interface_colaborador_auto(uid):
                 st.error("Preencha a Atividade e a Área e certifique-se de que há um aprovador selecionado.")
 
 # --- ROTEAMENTO E PERSISTÊNCIA ---
+storage.iniciar_compactador()
+media.iniciar_workers()
+sincronizacao.iniciar()
+
 if 'user_id' not in st.session_state:
     if not restore_session(): login_screen()
     else: st.rerun()
@@ -0,0 +1,96 @@
+import random
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import pandas as pd
+
+import storage
+
+# --- ATRIBUIÇÃO DE CONFERENTES POR CARGA ---
+# Índice do TaskStore com, por conferente, as tarefas em aberto (ainda por fazer ou
+# à espera da aprovação dele) e o instante das aprovações. Na criação de uma tarefa
+# escolhe-se, entre os conferentes do turno, o de menor fila relativa à vazão
+# recente: abertas / aprovações por dia nos últimos JANELA_DIAS. Empates são
+# sorteados; sem candidatos fica "SISTEMA", como antes.
+ABERTAS = ('Pendente', 'Em Execução', 'Aguardando Aprovação')
+STATUS_APROVADA = 'Executada'
+JANELA_DIAS = 7
+VAZAO_MINIMA = 1.0  # aprovações/dia assumidas para quem ainda não tem histórico
+SEM_CONFERENTE = "SISTEMA"
+
+
+class IndiceCarga:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.abertas = defaultdict(set)
+        self.aprovacoes = defaultdict(dict)
+        self._chaves = {}
+
+    def _guardar(self, t, conf, status, aprovacao):
+        if status in ABERTAS:
+            self.abertas[conf].add(t)
+            self._chaves[t] = ("abertas", conf)
+        elif status == STATUS_APROVADA and pd.notna(aprovacao):
+            self.aprovacoes[conf][t] = aprovacao
+            self._chaves[t] = ("aprovacoes", conf)
+
+    def _remover(self, t):
+        chave = self._chaves.pop(t, None)
+        if not chave: return
+        destino, conf = chave
+        if destino == "abertas": self.abertas[conf].discard(t)
+        else: self.aprovacoes[conf].pop(t, None)
+
+    def reconstruir(self, df):
+        with self._lock:
+            self.abertas, self.aprovacoes, self._chaves = defaultdict(set), defaultdict(dict), {}
+            if df.empty or 'status' not in df.columns: return
+            vivas = df[df['status'].isin(ABERTAS + (STATUS_APROVADA,))]
+            aprovacao = storage.para_datetime(vivas['data_aprovacao']) if 'data_aprovacao' in vivas.columns else pd.Series(pd.NaT, index=vivas.index)
+            for t, c, s, a in zip(vivas['id_task'].astype(str), vivas['conf_clean'], vivas['status'], aprovacao):
+                self._guardar(t, c, s, a)
+
+    def aplicar(self, antiga, nova):
+        t = str((nova or antiga)['id_task'])
+        with self._lock:
+            self._remover(t)
+            if nova: self._guardar(t, nova.get('conf_clean'), nova.get('status'), storage.para_timestamp(nova.get('data_aprovacao')))
+
+    def carga(self, conf, desde):
+        with self._lock:
+            abertas = len(self.abertas.get(conf, ()))
+            recentes = sum(1 for a in self.aprovacoes.get(conf, {}).values() if a >= desde)
+        return abertas, max(recentes / JANELA_DIAS, VAZAO_MINIMA)
+
+    def escolher(self, candidatos, agora=None, sortear=True):
+        # `candidatos`: ids de login já filtrados por turno (get_conferentes_disponiveis).
+        # sortear=False devolve sempre o primeiro empatado (sugestão estável na tela).
+        ids = list(dict.fromkeys(str(c) for c in candidatos))
+        if not ids: return SEM_CONFERENTE
+        desde = pd.Timestamp(agora or storage.agora_br()) - timedelta(days=JANELA_DIAS)
+        pontos = {}
+        for c in ids:
+            abertas, vazao = self.carga(storage.clean_id(c), desde)
+            pontos[c] = (abertas / vazao, abertas)
+        melhor = min(pontos.values())
+        empatados = [c for c in ids if pontos[c] == melhor]
+        return random.choice(empatados) if sortear else empatados[0]
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def get_indice():
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceCarga()
+            storage.get_task_store().registrar_indice(_indice)
+    storage.get_task_store().sincronizar()
+    return _indice
+
+
+def escolher_conferente(candidatos, sortear=True):
+    return get_indice().escolher(candidatos, sortear=sortear)
@@ -0,0 +1,148 @@
+import io
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+
+import sharepoint
+
+# --- BACKENDS DE ARMAZENAMENTO DAS TABELAS ---
+# O storage só conhece esta interface:
+#   carregar(tabela, versao_atual) -> (df, versao). df=None quando nada mudou desde
+#       `versao_atual` (versao devolvida igual) ou quando a tabela não existe (versao=None);
+#       falhas de acesso levantam exceção.
+#   gravar(tabela, df, if_match)   -> nova versao; ConflitoVersao se `if_match` já não é a atual.
+# A "versão" é opaca: eTag no SharePoint, contador no SQLite, mtime+tamanho no CSV.
+ConflitoVersao = sharepoint.ConflitoVersao  # o OCC do storage trata igual qualquer backend
+
+# Colunas-chave indexadas no SQLite (consultas e sincronização por linha).
+CHAVES = {"tasks": "id_task", "users": "id_login"}
+
+
+class ErroArmazenamento(Exception):
+    pass
+
+
+def ler_xlsx(content):
+    try: return pd.read_excel(io.BytesIO(content), engine="openpyxl")
+    except Exception: return pd.DataFrame()
+
+
+class SharePointBackend:
+    nome = "sharepoint"
+
+    def carregar(self, tabela, versao_atual=None):
+        client = sharepoint.get_client()
+        status, meta = client.get_item(f"{tabela}.xlsx", versao_atual)
+        if status == 304: return None, versao_atual
+        if status == 404: return None, None
+        if status != 200: raise sharepoint.GraphError(f"Erro ao ler {tabela}.xlsx: {status}")
+        content = client.download_url(meta["@microsoft.graph.downloadUrl"])
+        if content is None: raise sharepoint.GraphError(f"Erro ao baixar {tabela}.xlsx")
+        return ler_xlsx(content), meta.get("eTag")
+
+    def gravar(self, tabela, df, if_match=None):
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False, engine="openpyxl")
+        buffer.seek(0)
+        return sharepoint.get_client().upload(f"{tabela}.xlsx", buffer, if_match=if_match).get("eTag")
+
+
+def _valor_sql(v):
+    if v is None or (not isinstance(v, (list, dict)) and pd.isna(v)): return None
+    if isinstance(v, date): return str(v)
+    return v.item() if hasattr(v, "item") else v
+
+
+def _q(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+class SQLiteBackend:
+    # Armazenamento primário local: leituras sem rede e escritas transacionais.
+    nome = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pronto = False
+
+    @contextmanager
+    def _conn(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._pronto:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS _versoes (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL)")
+                conn.commit()
+                self._pronto = True
+            yield conn
+        finally:
+            conn.close()
+
+    def carregar(self, tabela, versao_atual=None):
+        with self._conn() as conn:
+            row = conn.execute("SELECT versao FROM _versoes WHERE tabela = ?", (tabela,)).fetchone()
+            if row is None: return None, None
+            versao = str(row[0])
+            if versao == versao_atual: return None, versao
+            return pd.read_sql_query(f"SELECT * FROM {_q(tabela)}", conn), versao
+
+    def gravar(self, tabela, df, if_match=None):
+        dados = df.copy()
+        for col in dados.columns:
+            if pd.api.types.is_datetime64_any_dtype(dados[col]): dados[col] = dados[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+            elif dados[col].dtype == object: dados[col] = dados[col].map(_valor_sql)
+        dados = dados.astype(object).where(dados.notna(), None)
+
+        colunas = ", ".join(_q(c) for c in dados.columns)
+        with self._lock, self._conn() as conn:
+            # Tudo numa transação: a tabela e a versão mudam juntas ou não mudam.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT versao FROM _versoes WHERE tabela = ?", (tabela,)).fetchone()
+                atual = row[0] if row else 0
+                if if_match and if_match != str(atual):
+                    raise ConflitoVersao(f"{tabela} foi alterado por outro processo")
+                conn.execute(f"DROP TABLE IF EXISTS {_q(tabela)}")
+                conn.execute(f"CREATE TABLE {_q(tabela)} ({colunas})")
+                if len(dados.columns):
+                    marcas = ", ".join("?" * len(dados.columns))
+                    conn.executemany(f"INSERT INTO {_q(tabela)} VALUES ({marcas})", dados.itertuples(index=False, name=None))
+                chave = CHAVES.get(tabela)
+                if chave in dados.columns:
+                    conn.execute(f"CREATE INDEX {_q('ix_' + tabela + '_' + chave)} ON {_q(tabela)} ({_q(chave)})")
+                conn.execute(
+                    "INSERT INTO _versoes (tabela, versao) VALUES (?, ?) ON CONFLICT(tabela) DO UPDATE SET versao = excluded.versao",
+                    (tabela, atual + 1),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return str(atual + 1)
+
+
+class CsvBackend:
+    # Os CSVs de data/ (sep ';', com BOM) do repositório: só leitura, servem de semente.
+    nome = "csv"
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def carregar(self, tabela, versao_atual=None):
+        caminho = os.path.join(self.pasta, f"{tabela}.csv")
+        if not os.path.exists(caminho): return None, None
+        info = os.stat(caminho)
+        versao = f"{info.st_mtime_ns}-{info.st_size}"
+        if versao == versao_atual: return None, versao
+        # Algumas linhas vieram com ';' a mais (ex.: "AJUDANTE;0.0;;-"): corta no nº de colunas do cabeçalho.
+        with open(caminho, encoding="utf-8-sig") as f: n = len(f.readline().split(";"))
+        return pd.read_csv(caminho, sep=";", encoding="utf-8-sig", engine="python", on_bad_lines=lambda linha: linha[:n]), versao
+
+    def gravar(self, tabela, df, if_match=None):
+        raise ErroArmazenamento(f"{self.nome}: {tabela} é somente leitura")
@@ -0,0 +1,152 @@
+import argparse
+import os
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+
+import ledger
+import regras
+import storage
+
+# --- FECHAMENTO DE PERÍODO (FOLHA DE RV) ---
+# Calcula de uma vez a RV a pagar de cada colaborador num intervalo de datas: um só
+# groupby sobre as tarefas 'Executada' (produção, KPIs e AJUSTE MANUAL) aprovadas no
+# intervalo (ledger.datas_lancamento), com o teto de RV da tabela de regras aplicado
+# por período. O resultado fica gravado na tabela `fechamentos` (uma linha por
+# colaborador) e num CSV para a folha; o ledger passa a contar só o que veio depois
+# do último dia fechado. Um bruto negativo (débitos maiores que a produção) não é
+# descontado na folha: fica em `a_transportar` e abre o período seguinte como
+# `saldo_anterior`.
+#   python fechamento.py --inicio 2026-09-01 --fim 2026-09-30 --simular
+#   python fechamento.py --inicio 2026-09-01 --fim 2026-09-30 --responsavel 123
+TABELA = "fechamentos"
+ATIVIDADE_AJUSTE = "AJUSTE MANUAL"
+PASTA_EXPORT = os.path.join(storage.DADOS_LOCAIS, "fechamentos")
+COLUNAS = [
+    'id_linha', 'id_fechamento', 'inicio', 'fim', 'fechado_em', 'responsavel',
+    'colaborador_id', 'nome', 'tipo', 'tarefas', 'producao', 'kpis', 'ajustes',
+    'saldo_anterior', 'bruto', 'teto', 'a_pagar', 'retido', 'a_transportar',
+]
+MEDIDAS = ['producao', 'kpis', 'ajustes', 'saldo_anterior']
+
+
+class PeriodoInvalido(Exception):
+    pass
+
+
+def _data(v):
+    return pd.Timestamp(v).date()
+
+
+def periodo_anterior(hoje=None):
+    # Por omissão o mês civil anterior.
+    hoje = hoje or storage.agora_br().date()
+    fim = hoje.replace(day=1) - timedelta(days=1)
+    return fim.replace(day=1), fim
+
+
+def calcular(tasks, users, inicio, fim, motor=None, anterior=None):
+    # `anterior`: {colaborador_id: saldo negativo do último fechamento} (ledger.transporte).
+    motor = motor or regras.get_regras()
+    inicio, fim = _data(inicio), _data(fim)
+    vazio = pd.DataFrame(columns=[c for c in COLUNAS if c not in ('id_linha', 'id_fechamento', 'fechado_em', 'responsavel')])
+
+    folha = pd.DataFrame(columns=['colaborador_id', 'tarefas', 'producao', 'kpis', 'ajustes'])
+    if not tasks.empty and 'status' in tasks.columns:
+        ex = tasks[tasks['status'] == ledger.STATUS_LANCADO]
+        dias = ledger.datas_lancamento(ex).dt.normalize()
+        ex = ex[(dias >= pd.Timestamp(inicio)) & (dias <= pd.Timestamp(fim))]
+        if not ex.empty:
+            valores = pd.to_numeric(ex['valor'], errors='coerce').fillna(0.0)
+            is_kpi = ex['atividade'].isin(regras.KPIS)
+            is_ajuste = ex['atividade'] == ATIVIDADE_AJUSTE
+            folha = pd.DataFrame({
+                'colaborador_id': storage.clean_id_series(ex['colaborador_id']),
+                'producao': valores.where(~is_kpi & ~is_ajuste, 0.0),
+                'kpis': valores.where(is_kpi, 0.0),
+                'ajustes': valores.where(is_ajuste, 0.0),
+            }).groupby('colaborador_id').agg(
+                tarefas=('producao', 'size'), producao=('producao', 'sum'), kpis=('kpis', 'sum'), ajustes=('ajustes', 'sum'),
+            ).reset_index()
+
+    # Quem ficou devendo no período anterior entra na folha mesmo sem lançamentos.
+    transporte = pd.DataFrame(list((anterior or {}).items()), columns=['colaborador_id', 'saldo_anterior'])
+    folha = folha.merge(transporte, on='colaborador_id', how='outer')
+    if folha.empty: return vazio
+    folha[MEDIDAS + ['tarefas']] = folha[MEDIDAS + ['tarefas']].astype(float).fillna(0.0)
+    folha['tarefas'] = folha['tarefas'].astype(int)
+
+    folha['bruto'] = folha[MEDIDAS].sum(axis=1)
+    folha['teto'] = motor.teto_rv
+    folha['a_pagar'] = folha['bruto'].clip(lower=0.0, upper=motor.teto_rv)
+    folha['retido'] = (folha['bruto'] - motor.teto_rv).clip(lower=0.0)
+    folha['a_transportar'] = folha['bruto'].clip(upper=0.0)
+    folha['inicio'], folha['fim'] = pd.Timestamp(inicio), pd.Timestamp(fim)
+
+    if not users.empty and 'id_login' in users.columns:
+        cad = users.assign(colaborador_id=storage.clean_id_series(users['id_login'])).drop_duplicates('colaborador_id')
+        folha = folha.merge(cad[['colaborador_id'] + [c for c in ('nome', 'tipo') if c in cad.columns]], on='colaborador_id', how='left')
+    for c in ('nome', 'tipo'):
+        if c not in folha.columns: folha[c] = None
+    folha['nome'] = folha['nome'].fillna(folha['colaborador_id'])
+    return folha.sort_values('nome')[[c for c in vazio.columns]].reset_index(drop=True)
+
+
+def historico():
+    df = storage.get_table(TABELA)
+    return df if not df.empty else pd.DataFrame(columns=COLUNAS)
+
+
+def exportar(folha, caminho=None):
+    os.makedirs(PASTA_EXPORT, exist_ok=True)
+    inicio, fim = _data(folha['inicio'].iloc[0]), _data(folha['fim'].iloc[0])
+    caminho = caminho or os.path.join(PASTA_EXPORT, f"folha_rv_{inicio:%Y%m%d}_{fim:%Y%m%d}.csv")
+    folha.to_csv(caminho, sep=";", encoding="utf-8-sig", index=False, decimal=",", date_format="%Y-%m-%d")
+    return caminho
+
+
+def fechar(inicio, fim, responsavel, motor=None):
+    # Grava o snapshot com If-Match: dois fechamentos ao mesmo tempo não se sobrepõem.
+    # A folha é calculada dentro do aplicar porque o saldo a transportar vem da
+    # versão da tabela que a escrita vai substituir.
+    inicio, fim = _data(inicio), _data(fim)
+    if fim < inicio: raise PeriodoInvalido("O fim do período é anterior ao início.")
+    tasks, users = storage.get_task_store().ler(), storage.get_table("users")
+    gravada = {}
+
+    def aplicar(df):
+        if not df.empty and 'fim' in df.columns:
+            ultimo = pd.to_datetime(df['fim'], errors='coerce').max()
+            if pd.notna(ultimo) and inicio <= ultimo.date():
+                raise PeriodoInvalido(f"Já existe fechamento até {ultimo:%d/%m/%Y}; o período tem de começar depois.")
+        folha = calcular(tasks, users, inicio, fim, motor, ledger.transporte(df))
+        id_fechamento = str(uuid.uuid4())
+        folha.insert(0, 'id_fechamento', id_fechamento)
+        folha.insert(0, 'id_linha', id_fechamento + "-" + folha['colaborador_id'].astype(str))
+        folha['fechado_em'] = storage.agora_br()
+        folha['responsavel'] = str(responsavel)
+        gravada['folha'] = folha = folha[COLUNAS]
+        return pd.concat([df, folha], ignore_index=True) if not df.empty else folha
+
+    storage.mutate_table(TABELA, aplicar)
+    folha = gravada['folha']
+    return folha, (exportar(folha) if not folha.empty else None)
+
+
+if __name__ == "__main__":
+    ini_padrao, fim_padrao = periodo_anterior()
+    p = argparse.ArgumentParser(description="Fecha a RV de um período e gera a folha.")
+    p.add_argument("--inicio", type=date.fromisoformat, default=ini_padrao, help="AAAA-MM-DD (padrão: 1º dia do mês anterior)")
+    p.add_argument("--fim", type=date.fromisoformat, default=fim_padrao, help="AAAA-MM-DD (padrão: último dia do mês anterior)")
+    p.add_argument("--responsavel", default="SISTEMA")
+    p.add_argument("--simular", action="store_true", help="só calcula e mostra, sem gravar")
+    args = p.parse_args()
+    if args.simular:
+        folha = calcular(storage.get_task_store().ler(), storage.get_table("users"), args.inicio, args.fim, anterior=ledger.transporte(historico()))
+        caminho = None
+    else:
+        folha, caminho = fechar(args.inicio, args.fim, args.responsavel)
+    print(folha.to_string(index=False))
+    print(f"{len(folha)} colaborador(es), total a pagar R$ {folha['a_pagar'].sum():.2f}")
+    if caminho: print(f"Folha exportada em {caminho}")
@@ -0,0 +1,158 @@
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+import storage
+from storage import clean_id
+
+# --- RAZÃO (LEDGER) DE RV POR COLABORADOR ---
+# O saldo de RV deixa de ser um total mutável no users.xlsx: cada tarefa
+# 'Executada' (aprovações, KPIs validados e AJUSTE MANUAL) é um lançamento de
+# `valor`. Os agregados por colaborador são mantidos incrementalmente a partir
+# dos eventos do diário de tarefas, então as leituras são O(1).
+# Depois de um fechamento (fechamento.py) o saldo só conta lançamentos posteriores
+# ao último período fechado: o que veio antes já está no snapshot da folha. Cada
+# lançamento é datado pela aprovação (datas_lancamento). Um saldo negativo no
+# último fechamento (transporte) abre o saldo do período seguinte.
+STATUS_LANCADO = 'Executada'
+
+
+def _vazio():
+    return {"saldo": 0.0, "executadas": 0, "kpis": 0.0}
+
+
+def _coluna_data(df, col):
+    return storage.para_datetime(df[col]) if col in df.columns else pd.Series(pd.NaT, index=df.index, dtype='datetime64[s]')
+
+
+def datas_execucao(df):
+    # Dia em que o trabalho foi feito: fim da execução quando existe, senão a criação.
+    return _coluna_data(df, 'fim_execucao').fillna(_coluna_data(df, 'data_criacao'))
+
+
+def datas_lancamento(df):
+    # Competência do lançamento: a aprovação (ou validação do KPI), que é quando o
+    # valor passa a ser devido. Uma tarefa feita num período já fechado e aprovada
+    # depois entra no período aberto, em vez de cair atrás do corte e nunca ser paga.
+    # Sem data de aprovação (AJUSTE MANUAL, dados antigos) vale o dia da execução.
+    return _coluna_data(df, 'data_aprovacao').fillna(datas_execucao(df))
+
+
+def dias_das_tarefas(df):
+    return datas_lancamento(df).dt.date
+
+
+def _lancamento(linha, kpis):
+    if not linha or linha.get('status') != STATUS_LANCADO: return None
+    try: valor = float(linha.get('valor') or 0.0)
+    except (TypeError, ValueError): valor = 0.0
+    dia = dias_das_tarefas(pd.DataFrame([linha])).iloc[0]
+    return clean_id(linha.get('colaborador_id')), valor, linha.get('atividade') in kpis, None if pd.isna(dia) else dia
+
+
+class Ledger:
+    def __init__(self, kpis):
+        self.kpis = set(kpis)
+        self._lock = threading.Lock()
+        self.contas = defaultdict(_vazio)
+        self._lancamentos = {}
+        self.corte = None  # último dia já fechado (inclusive)
+        self.transporte = {}  # {uid: saldo negativo vindo do último fechamento}
+
+    def _aberto(self, dia):
+        return self.corte is None or dia is None or dia > self.corte
+
+    def _somar(self, lanc, sinal):
+        uid, valor, is_kpi, dia = lanc
+        if not self._aberto(dia): return
+        conta = self.contas[uid]
+        conta["saldo"] += sinal * valor
+        conta["executadas"] += sinal
+        if is_kpi: conta["kpis"] += sinal * valor
+
+    def reconstruir(self, df):
+        with self._lock:
+            self.contas = defaultdict(_vazio)
+            self._lancamentos = {}
+            if df.empty or 'status' not in df.columns: return
+
+            ex = df[df['status'] == STATUS_LANCADO]
+            uids = ex['colaborador_id'].apply(clean_id)
+            valores = pd.to_numeric(ex['valor'], errors='coerce').fillna(0.0)
+            is_kpi = ex['atividade'].isin(self.kpis)
+            datas = datas_lancamento(ex)
+            dias = datas.dt.date
+            aberto = datas.isna() | (datas.dt.normalize() > pd.Timestamp(self.corte)) if self.corte else pd.Series(True, index=ex.index)
+
+            agg = pd.DataFrame({'uid': uids, 'valor': valores, 'kpi': valores.where(is_kpi, 0.0)})[aberto].groupby('uid').agg(
+                saldo=('valor', 'sum'), executadas=('valor', 'size'), kpis=('kpi', 'sum'))
+            for uid, r in agg.iterrows():
+                conta = self.contas[uid]
+                conta["saldo"], conta["executadas"], conta["kpis"] = float(r['saldo']), int(r['executadas']), float(r['kpis'])
+
+            for t, u, v, k, d in zip(ex['id_task'].astype(str), uids, valores, is_kpi, dias):
+                self._lancamentos[t] = (u, float(v), bool(k), None if pd.isna(d) else d)
+
+    def aplicar(self, antiga, nova):
+        with self._lock:
+            task_id = str((nova or antiga)['id_task'])
+            anterior = self._lancamentos.pop(task_id, None)
+            if anterior: self._somar(anterior, -1)
+            novo = _lancamento(nova, self.kpis)
+            if novo:
+                self._somar(novo, +1)
+                self._lancamentos[task_id] = novo
+
+    def conta(self, user_id):
+        with self._lock:
+            uid = clean_id(user_id)
+            c = self.contas.get(uid)
+            anterior = self.transporte.get(uid, 0.0)
+            if not c: return {"saldo": anterior, "executadas": 0, "kpis": 0.0}
+            return {"saldo": c["saldo"] + anterior, "executadas": c["executadas"], "kpis": c["kpis"]}
+
+    def saldos(self):
+        with self._lock:
+            saldos = dict(self.transporte)
+            for uid, c in self.contas.items(): saldos[uid] = saldos.get(uid, 0.0) + c["saldo"]
+            return saldos
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def ultimo_corte(fechamentos=None):
+    fechamentos = storage.get_table("fechamentos") if fechamentos is None else fechamentos
+    if fechamentos.empty or 'fim' not in fechamentos.columns: return None
+    fim = pd.to_datetime(fechamentos['fim'], errors='coerce').max()
+    return None if pd.isna(fim) else fim.date()
+
+
+def transporte(fechamentos):
+    # Saldo negativo de cada colaborador no último fechamento (coluna a_transportar).
+    corte = ultimo_corte(fechamentos)
+    if corte is None or 'a_transportar' not in fechamentos.columns: return {}
+    ultimo = fechamentos[pd.to_datetime(fechamentos['fim'], errors='coerce').dt.date == corte]
+    valores = pd.to_numeric(ultimo['a_transportar'], errors='coerce').fillna(0.0)
+    return {clean_id(u): float(v) for u, v in zip(ultimo['colaborador_id'], valores) if v < 0}
+
+
+def get_ledger(kpis):
+    global _ledger
+    store = storage.get_task_store()
+    fechamentos = storage.get_table("fechamentos")
+    corte = ultimo_corte(fechamentos)
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = Ledger(kpis)
+            _ledger.corte, _ledger.transporte = corte, transporte(fechamentos)
+            store.registrar_indice(_ledger)
+        elif corte != _ledger.corte:
+            # Período novo fechado: refaz os saldos a partir do snapshot atual de tarefas.
+            with store._lock:
+                _ledger.corte, _ledger.transporte = corte, transporte(fechamentos)
+                _ledger.reconstruir(store.sincronizar())
+    store.sincronizar()
+    return _ledger
@@ -0,0 +1,476 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+import streamlit as st
+from github import Github, GithubException
+from PIL import Image, ImageOps
+
+import sharepoint
+from storage import DADOS_LOCAIS, clean_id
+
+# --- FILA DE UPLOAD DE EVIDÊNCIAS ---
+# O ficheiro é gravado em disco e a tarefa registada na hora; o envio fica numa
+# fila persistente (SQLite local) tratada por threads em segundo plano, com novas
+# tentativas e backoff exponencial. Fotos vão para o GitHub; vídeos e ficheiros
+# grandes (a API de conteúdos do GitHub não os aceita) vão para o SharePoint em
+# sessões de upload retomáveis, enviados em partes.
+FILA_DB = os.path.join(DADOS_LOCAIS, "media_fila.db")
+WORKERS = 3
+BACKOFF_BASE_S = 5
+BACKOFF_MAX_S = 600
+MAX_TENTATIVAS = 20
+
+EXT_VIDEO = ['mp4', 'avi', 'mov', 'mkv']
+EXT_IMAGEM = ['png', 'jpg', 'jpeg', 'webp', 'bmp']
+LADO_MAX_PX = 1600
+QUALIDADE_JPEG = 82
+LADO_THUMB_PX = 320
+PASTA_CAS = "cas"
+CHUNK_BYTES = 1024 * 1024
+LIMITE_GITHUB_BYTES = 50 * 1024 * 1024
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+PASTA_CACHE_DISCO = os.path.join(DADOS_LOCAIS, "cache_media")
+CACHE_DISCO_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+metricas = {"enviados": 0, "falhas": 0, "latencia_ultima_s": 0.0, "latencia_media_s": 0.0, "duplicados_evitados": 0}
+
+_lock = threading.Lock()
+_workers = []
+_repo = None
+_tabela_criada = False
+
+
+@contextmanager
+def _conn():
+    global _tabela_criada
+    os.makedirs(DADOS_LOCAIS, exist_ok=True)
+    conn = sqlite3.connect(FILA_DB, timeout=30)
+    try:
+        if not _tabela_criada:
+            _criar_tabela(conn)
+            _tabela_criada = True
+        with conn: yield conn
+    finally:
+        conn.close()
+
+
+def _criar_tabela(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fila (
+            caminho TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            proxima_em REAL NOT NULL,
+            criado_em REAL NOT NULL,
+            concluido_em REAL,
+            erro TEXT
+        )""")
+    colunas = {r[1] for r in conn.execute("PRAGMA table_info(fila)")}
+    if "destino" not in colunas: conn.execute("ALTER TABLE fila ADD COLUMN destino TEXT NOT NULL DEFAULT 'github'")
+    if "sessao_url" not in colunas: conn.execute("ALTER TABLE fila ADD COLUMN sessao_url TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS aliases (
+            alias TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            blob TEXT NOT NULL,
+            colaborador TEXT,
+            task_id TEXT,
+            criado_em REAL NOT NULL
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_aliases_hash ON aliases (hash)")
+
+
+def get_github_repo():
+    global _repo
+    if _repo is None and "GITHUB_TOKEN" in st.secrets and "GITHUB_REPO" in st.secrets:
+        _repo = Github(st.secrets["GITHUB_TOKEN"]).get_repo(st.secrets["GITHUB_REPO"])
+    return _repo
+
+
+def upload_media_to_github(file_path):
+    repo = get_github_repo()
+    if not repo: return
+    with open(file_path, "rb") as f: content = f.read()
+    # Ficheiros novos são o caso normal: tenta criar primeiro e só consulta o sha
+    # se o GitHub responder que o caminho já existe.
+    try:
+        repo.create_file(file_path, f"Upload Imagem {file_path}", content)
+    except GithubException as e:
+        if e.status != 422: raise
+        contents = repo.get_contents(file_path)
+        repo.update_file(contents.path, f"Atualizou Imagem {file_path}", content, contents.sha)
+
+
+def upload_media_to_sharepoint(file_path, sessao_url=None):
+    def guardar_sessao(url):
+        with _lock, _conn() as conn: conn.execute("UPDATE fila SET sessao_url = ? WHERE caminho = ?", (url, file_path))
+    sharepoint.get_client().upload_em_partes(file_path, file_path, sessao_url, guardar_sessao)
+
+
+def destino_para(file_path):
+    if extensao(file_path) in EXT_VIDEO: return 'sharepoint'
+    if os.path.exists(file_path) and os.path.getsize(file_path) > LIMITE_GITHUB_BYTES: return 'sharepoint'
+    return 'github'
+
+
+def origem(blob):
+    # Onde um blob já enviado está guardado: o destino registado na fila. Sem registo
+    # (outra instância, ou evidências antigas commitadas em images/ antes da fila), os
+    # blobs CAS seguem a regra de envio e o resto está no GitHub.
+    with _conn() as conn:
+        row = conn.execute("SELECT destino FROM fila WHERE caminho = ?", (blob,)).fetchone()
+    if row: return row[0]
+    return destino_para(blob) if f"/{PASTA_CAS}/" in str(blob) else 'github'
+
+
+def enfileirar(file_path):
+    agora = time.time()
+    with _lock, _conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO fila (caminho, status, tentativas, proxima_em, criado_em, destino) VALUES (?, 'pendente', 0, ?, ?, ?)",
+            (file_path, agora, agora, destino_para(file_path)))
+
+
+def _proximo():
+    with _lock, _conn() as conn:
+        row = conn.execute(
+            "SELECT caminho, tentativas, criado_em, destino, sessao_url FROM fila WHERE status = 'pendente' AND proxima_em <= ? ORDER BY proxima_em LIMIT 1",
+            (time.time(),)).fetchone()
+        if row: conn.execute("UPDATE fila SET status = 'enviando' WHERE caminho = ?", (row[0],))
+        return row
+
+
+def _concluir(caminho, criado_em):
+    agora = time.time()
+    with _lock, _conn() as conn:
+        conn.execute("UPDATE fila SET status = 'enviado', concluido_em = ?, erro = NULL WHERE caminho = ?", (agora, caminho))
+    latencia = agora - criado_em
+    metricas["enviados"] += 1
+    metricas["latencia_ultima_s"] = round(latencia, 2)
+    metricas["latencia_media_s"] = round(metricas["latencia_media_s"] + (latencia - metricas["latencia_media_s"]) / metricas["enviados"], 2)
+
+
+def _reagendar(caminho, tentativas, erro):
+    metricas["falhas"] += 1
+    espera = min(BACKOFF_BASE_S * (2 ** tentativas), BACKOFF_MAX_S)
+    status = 'erro' if tentativas + 1 >= MAX_TENTATIVAS else 'pendente'
+    with _lock, _conn() as conn:
+        conn.execute(
+            "UPDATE fila SET status = ?, tentativas = ?, proxima_em = ?, erro = ? WHERE caminho = ?",
+            (status, tentativas + 1, time.time() + espera, str(erro)[:500], caminho))
+
+
+def _loop_worker():
+    while True:
+        item = _proximo()
+        if not item:
+            time.sleep(1)
+            continue
+        caminho, tentativas, criado_em, destino, sessao_url = item
+        try:
+            if destino == 'sharepoint': upload_media_to_sharepoint(caminho, sessao_url)
+            else: upload_media_to_github(caminho)
+            _concluir(caminho, criado_em)
+        except Exception as e:
+            _reagendar(caminho, tentativas, e)
+
+
+def iniciar_workers(n=WORKERS):
+    with _lock:
+        if any(w.is_alive() for w in _workers): return
+        # Envios interrompidos por um reinício do servidor voltam para a fila.
+        with _conn() as conn: conn.execute("UPDATE fila SET status = 'pendente' WHERE status = 'enviando'")
+        _workers.clear()
+        for i in range(n):
+            w = threading.Thread(target=_loop_worker, daemon=True, name=f"upload-media-{i}")
+            w.start()
+            _workers.append(w)
+
+
+def status(file_path):
+    with _conn() as conn:
+        row = conn.execute("SELECT status FROM fila WHERE caminho = ?", (file_path,)).fetchone()
+    return row[0] if row else None
+
+
+def em_envio(local_path):
+    if not local_path or pd.isna(local_path): return False
+    blob = resolver(local_path)
+    return origem(blob) == 'sharepoint' and status(blob) in ('pendente', 'enviando')
+
+
+def envio_falhou(local_path):
+    # Esgotou as tentativas: não bloqueia a aprovação, mas fica só na cópia local
+    # até alguém reenfileirar pelo Diagnóstico.
+    if not local_path or pd.isna(local_path): return False
+    return status(resolver(local_path)) == 'erro'
+
+
+def reenfileirar_erros():
+    with _lock, _conn() as conn:
+        return conn.execute(
+            "UPDATE fila SET status = 'pendente', tentativas = 0, proxima_em = ? WHERE status = 'erro'", (time.time(),)).rowcount
+
+
+def resumo_fila():
+    with _conn() as conn:
+        contagens = dict(conn.execute("SELECT status, COUNT(*) FROM fila GROUP BY status").fetchall())
+        mais_antigo = conn.execute("SELECT MIN(criado_em) FROM fila WHERE status IN ('pendente', 'enviando')").fetchone()[0]
+    return dict(metricas,
+                profundidade=contagens.get('pendente', 0) + contagens.get('enviando', 0),
+                com_erro=contagens.get('erro', 0),
+                espera_mais_antiga_s=round(time.time() - mais_antigo, 1) if mais_antigo else 0.0)
+
+
+# --- INGESTÃO: REDIMENSIONAMENTO E MINIATURAS ---
+# Fotos de telemóvel chegam com 3-12 MB; nos cartões são exibidas a 100-200 px.
+# Reencoda para JPEG com lado máximo LADO_MAX_PX e grava uma miniatura ao lado.
+def extensao(nome):
+    return str(nome).split('.')[-1].lower()
+
+
+def thumb_path(file_path):
+    return os.path.splitext(file_path)[0] + "_thumb.jpg"
+
+
+def _reencodar_imagem(upload, destino_base):
+    img = ImageOps.exif_transpose(Image.open(upload))
+    if img.mode != "RGB": img = img.convert("RGB")
+    img.thumbnail((LADO_MAX_PX, LADO_MAX_PX))
+    caminho = f"{destino_base}.jpg"
+    img.save(caminho, "JPEG", quality=QUALIDADE_JPEG, optimize=True)
+    img.thumbnail((LADO_THUMB_PX, LADO_THUMB_PX))
+    img.save(thumb_path(caminho), "JPEG", quality=75, optimize=True)
+    return caminho
+
+
+def _gravar_blob(upload, destino_base):
+    ext = extensao(upload.name)
+    if ext in EXT_IMAGEM:
+        try:
+            caminho = _reencodar_imagem(upload, destino_base)
+            enfileirar(thumb_path(caminho))
+            return caminho
+        except Exception: upload.seek(0)  # imagem que o Pillow não abre: guarda o original
+
+    # Grava em blocos para não duplicar em memória vídeos de centenas de MB.
+    caminho = f"{destino_base}.{ext}"
+    upload.seek(0)
+    with open(caminho, "wb") as f:
+        for bloco in iter(lambda: upload.read(CHUNK_BYTES), b""): f.write(bloco)
+    return caminho
+
+
+# --- ARMAZENAMENTO POR CONTEÚDO (DEDUPLICAÇÃO) ---
+# O ficheiro fica em images/cas/<sha256>.<ext> e é esse caminho que vai para o
+# `evidencia_img` da tarefa, resolúvel em qualquer instância a partir do GitHub ou do
+# SharePoint. O nome gerado por generate_media_name fica só como alias legível na
+# tabela local (auditoria e relatório de duplicados). Reenviar a mesma foto não
+# grava nem envia nada de novo.
+def _hash_upload(upload):
+    h = hashlib.sha256()
+    upload.seek(0)
+    for bloco in iter(lambda: upload.read(CHUNK_BYTES), b""): h.update(bloco)
+    upload.seek(0)
+    return h.hexdigest()
+
+
+def _hash_ficheiro(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(CHUNK_BYTES), b""): h.update(bloco)
+    return h.hexdigest()
+
+
+def _registrar_alias(alias, h, blob, colaborador="", task_id=""):
+    with _lock, _conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO aliases (alias, hash, blob, colaborador, task_id, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+            (alias, h, blob, clean_id(colaborador) if colaborador else "", str(task_id), time.time()))
+
+
+def salvar_evidencia(upload, base_name, pasta, colaborador="", task_id=""):
+    h = _hash_upload(upload)
+    with _conn() as conn:
+        row = conn.execute("SELECT blob FROM aliases WHERE hash = ? LIMIT 1", (h,)).fetchone()
+
+    if row:
+        blob = row[0]
+        metricas["duplicados_evitados"] += 1
+    else:
+        os.makedirs(f"{pasta}/{PASTA_CAS}", exist_ok=True)
+        blob = _gravar_blob(upload, f"{pasta}/{PASTA_CAS}/{h}")
+        enfileirar(blob)
+
+    _registrar_alias(f"{pasta}/{base_name}.{extensao(blob)}", h, blob, colaborador, task_id)
+    return blob
+
+
+def resolver(local_path):
+    # Tarefas antigas guardaram o alias; as novas já trazem o caminho do blob.
+    if f"/{PASTA_CAS}/" in str(local_path): return local_path
+    with _conn() as conn:
+        row = conn.execute("SELECT blob FROM aliases WHERE alias = ?", (local_path,)).fetchone()
+    return row[0] if row else local_path
+
+
+def indexar_existentes(pasta):
+    # Regista as evidências gravadas antes da deduplicação (o alias é o próprio ficheiro).
+    with _conn() as conn:
+        conhecidos = {r[0] for r in conn.execute("SELECT alias FROM aliases")}
+    novos = 0
+    for nome in sorted(os.listdir(pasta)):
+        caminho = f"{pasta}/{nome}"
+        if caminho in conhecidos or not os.path.isfile(caminho) or caminho.endswith("_thumb.jpg"): continue
+        _registrar_alias(caminho, _hash_ficheiro(caminho), caminho)
+        novos += 1
+    return novos
+
+
+def relatorio_duplicados():
+    with _conn() as conn:
+        df = pd.read_sql_query("""
+            SELECT a.hash, a.alias, a.colaborador, a.task_id, a.criado_em
+            FROM aliases a JOIN (SELECT hash FROM aliases GROUP BY hash HAVING COUNT(*) > 1) d ON a.hash = d.hash
+            ORDER BY a.hash, a.criado_em""", conn)
+    if df.empty: return df
+    df['usos'] = df.groupby('hash')['alias'].transform('size')
+    df['colaboradores'] = df.groupby('hash')['colaborador'].transform('nunique')
+    df['criado_em'] = pd.to_datetime(df['criado_em'], unit='s')
+    return df
+
+
+def get_media_url(local_path):
+    if not local_path or pd.isna(local_path): return ""
+    local_path = resolver(local_path)
+    # Enquanto o upload não termina o raw.githubusercontent.com dá 404: serve a cópia local.
+    if status(local_path) in ('pendente', 'enviando', 'erro') and os.path.exists(local_path):
+        return local_path
+    # Vídeos ficam no SharePoint (sem URL pública): servidos a partir da cópia local.
+    if origem(local_path) == 'sharepoint' and os.path.exists(local_path):
+        return local_path
+    repo_name = st.secrets.get("GITHUB_REPO", "")
+    if repo_name:
+        return f"https://raw.githubusercontent.com/{repo_name}/main/{local_path}"
+    return local_path
+
+
+# --- CACHE LOCAL DE EVIDÊNCIAS (LEITURA) ---
+# Os cartões renderizam a partir da cópia em disco (images/) quando existe. Senão,
+# fotos e miniaturas do GitHub são baixadas uma vez para uma LRU em memória limitada
+# por bytes; o que foi enviado para o SharePoint (vídeos e ficheiros grandes da fila)
+# é baixado por partes para dados_locais/cache_media, podado pelos mais antigos, e o
+# st.video recebe o caminho do ficheiro. Vídeos antigos em images/ vêm do GitHub.
+class CacheMedia:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.metricas = {"disco": 0, "hits": 0, "downloads": 0, "despejos": 0, "hits_disco": 0, "downloads_disco": 0, "despejos_disco": 0}
+
+    def get(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.metricas["hits"] += 1
+                return self._itens[chave]
+        return None
+
+    def put(self, chave, conteudo):
+        if len(conteudo) > self.max_bytes: return
+        with self._lock:
+            if chave in self._itens: self.total -= len(self._itens.pop(chave))
+            self._itens[chave] = conteudo
+            self.total += len(conteudo)
+            while self.total > self.max_bytes:
+                _, antigo = self._itens.popitem(last=False)
+                self.total -= len(antigo)
+                self.metricas["despejos"] += 1
+
+    def resumo(self):
+        return dict(self.metricas, itens=len(self._itens), bytes=self.total, max_bytes=self.max_bytes)
+
+
+cache_media = CacheMedia(CACHE_MAX_BYTES)
+_http = requests.Session()
+
+
+def _baixar(blob):
+    repo_name = st.secrets.get("GITHUB_REPO", "")
+    if not repo_name: return None
+    r = _http.get(f"https://raw.githubusercontent.com/{repo_name}/main/{blob}", timeout=30)
+    return r.content if r.status_code == 200 else None
+
+
+def _podar_cache_disco():
+    ficheiros = []
+    for raiz, _, nomes in os.walk(PASTA_CACHE_DISCO):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            try: info = os.stat(caminho)
+            except OSError: continue
+            ficheiros.append((info.st_mtime, info.st_size, caminho))
+    total = sum(f[1] for f in ficheiros)
+    for _, tamanho, caminho in sorted(ficheiros):
+        if total <= CACHE_DISCO_MAX_BYTES: break
+        try: os.remove(caminho)
+        except OSError: continue
+        total -= tamanho
+        cache_media.metricas["despejos_disco"] += 1
+
+
+def _baixar_para_disco(blob):
+    caminho = os.path.join(PASTA_CACHE_DISCO, blob)
+    if os.path.exists(caminho):
+        os.utime(caminho)  # a poda despeja pelo mtime: marca como usado
+        cache_media.metricas["hits_disco"] += 1
+        return caminho
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    if not sharepoint.get_client().download_para(blob, caminho): return None
+    cache_media.metricas["downloads_disco"] += 1
+    _podar_cache_disco()
+    return caminho
+
+
+def resumo_cache_disco():
+    total = itens = 0
+    for raiz, _, nomes in os.walk(PASTA_CACHE_DISCO):
+        for nome in nomes:
+            try: total += os.path.getsize(os.path.join(raiz, nome))
+            except OSError: continue
+            itens += 1
+    return {"itens": itens, "bytes": total, "max_bytes": CACHE_DISCO_MAX_BYTES}
+
+
+def carregar(local_path, thumb=False):
+    # Devolve um caminho local (st.image/st.video leem do disco) ou, para fotos do
+    # GitHub, os bytes da LRU em memória.
+    if not local_path or pd.isna(local_path): return None
+    blob = resolver(local_path)
+    if thumb:
+        t = thumb_path(blob)
+        if os.path.exists(t) or status(t): blob = t
+
+    if os.path.exists(blob):
+        cache_media.metricas["disco"] += 1
+        return blob
+    if origem(blob) == 'sharepoint':
+        try: return _baixar_para_disco(blob)
+        except Exception: return None
+
+    conteudo = cache_media.get(blob)
+    if conteudo is None:
+        try: conteudo = _baixar(blob)
+        except Exception: conteudo = None
+        if conteudo is None: return None
+        cache_media.metricas["downloads"] += 1
+        cache_media.put(blob, conteudo)
+    return conteudo
@@ -0,0 +1,80 @@
+import argparse
+
+import pandas as pd
+
+import backends
+import sharepoint
+import storage
+
+# --- MIGRAÇÃO ÚNICA DAS DATAS DAS TAREFAS ---
+# Regrava data_criacao / inicio_execucao / fim_execucao / prazo como células de data
+# (esquema de storage.COLUNAS_DATA). Sem --aplicar só mostra o que seria convertido.
+#   python migrar_datas.py                       -> relatório do tasks.xlsx no SharePoint
+#   python migrar_datas.py --aplicar             -> grava o tasks.xlsx convertido
+#   python migrar_datas.py --csv data/tasks.csv  -> o mesmo para um CSV local (sep ';')
+
+
+def relatorio(bruto, tipado):
+    for col in storage.COLUNAS_DATA:
+        if col not in bruto.columns:
+            print(f"{col}: ausente")
+            continue
+        texto = bruto[col].astype(str).str.strip()
+        vazio = bruto[col].isna() | texto.isin(["", "-", "None", "nan", "NaT"])
+        falhas = tipado[col].isna() & ~vazio
+        print(f"{col}: {int((~vazio).sum())} preenchidas, {int(falhas.sum())} sem conversão")
+        for v in texto[falhas].unique()[:5]: print(f"    ? {v}")
+    if 'data_criacao' in bruto.columns:
+        # Sem ano e sem outra data da tarefa para ancorar: o ano foi inferido pela data de hoje.
+        ambiguas = bruto['data_criacao'].astype(str).str.strip().str.match(storage.SEM_ANO) & storage.referencia_criacao(bruto).isna()
+        print(f"data_criacao: {int(ambiguas.sum())} sem ano nem data de referência (ano inferido, confira)")
+        ids = bruto['id_task'] if 'id_task' in bruto.columns else bruto.index.to_series()
+        for i in bruto.index[ambiguas][:10]: print(f"    ~ {ids[i]}: {bruto.at[i, 'data_criacao']} -> {tipado.at[i, 'data_criacao']}")
+
+
+def regravar_espelho(espelho):
+    # Tipa a versão que está no espelho e grava com If-Match, como o mutate_table: se a
+    # sincronização ou alguém gravou entretanto, relê e tipa de novo em vez de sobrescrever.
+    for tentativa in range(storage.OCC_TENTATIVAS):
+        df, etag = espelho.carregar("tasks")
+        if df is None: return False
+        tipado = storage.tipar_datas(df.drop(columns=storage.COLUNAS_DERIVADAS, errors="ignore"))
+        try:
+            espelho.gravar("tasks", tipado, if_match=etag)
+            return True
+        except backends.ConflitoVersao:
+            storage._backoff(tentativa)
+    raise backends.ConflitoVersao(f"{espelho.nome}/tasks: desisti após {storage.OCC_TENTATIVAS} conflitos de versão")
+
+
+def migrar_sharepoint(aplicar):
+    # Primeiro dobra o diário no snapshot, para não ficar nada em texto fora do xlsx.
+    storage.get_task_store().compactar()
+    bruto = backends.ler_xlsx(sharepoint.get_client().download("tasks.xlsx"))
+    relatorio(bruto, storage.tipar_datas(bruto.copy()))
+    if aplicar:
+        # A carga já tipa as colunas (storage._preparar). O merge da sincronização
+        # considera iguais a data em texto e a tipada, então o xlsx é regravado aqui.
+        storage.mutate_table("tasks", lambda df: df)
+        for espelho in storage.get_backends()["espelhos"]: regravar_espelho(espelho)
+        print("tasks.xlsx regravado.")
+
+
+def migrar_csv(caminho, aplicar):
+    bruto = pd.read_csv(caminho, sep=";", encoding="utf-8-sig", dtype=str)
+    tipado = storage.tipar_datas(bruto.copy())
+    relatorio(bruto, tipado)
+    if aplicar:
+        for col in storage.COLUNAS_DATA:
+            if col in tipado.columns: tipado[col] = tipado[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+        tipado.to_csv(caminho, sep=";", encoding="utf-8-sig", index=False)
+        print(f"{caminho} regravado.")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Converte as datas das tarefas para o esquema tipado.")
+    p.add_argument("--csv", help="CSV local a migrar em vez do tasks.xlsx do SharePoint")
+    p.add_argument("--aplicar", action="store_true", help="grava o resultado (por omissão só relata)")
+    args = p.parse_args()
+    if args.csv: migrar_csv(args.csv, args.aplicar)
+    else: migrar_sharepoint(args.aplicar)
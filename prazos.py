@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+import pandas as pd
+
+import storage
+
+# --- ÍNDICE DE PRAZOS (SLA) ---
+# Duas listas ordenadas (instante, id_task), mantidas como índice do TaskStore:
+#   execucao   tarefas por fazer (Pendente / Em Execução / Rejeitada) pelo `prazo`
+#   aprovacao  tarefas à espera do conferente pelo início da espera (fim_execucao)
+# Cada evento do diário tira a entrada antiga da tarefa e insere a nova (bisect), e
+# as consultas "vence até X" / "à espera desde antes de Y" são um corte da lista.
+ABERTAS = ('Pendente', 'Em Execução', 'Rejeitada')
+EM_APROVACAO = ('Aguardando Aprovação', 'Aguardando Validação')
+HORIZONTE_H = 4
+ESPERA_MAX_H = 8
+
+
+def _entrada(id_task, status, prazo, espera):
+    if status in ABERTAS and pd.notna(prazo) and prazo < storage.SEM_PRAZO: return "execucao", (prazo, id_task)
+    if status in EM_APROVACAO and pd.notna(espera): return "aprovacao", (espera, id_task)
+    return None
+
+
+class IndicePrazos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.listas = {"execucao": [], "aprovacao": []}
+        self._entradas = {}
+        self._info = {}
+
+    def reconstruir(self, df):
+        with self._lock:
+            self.listas = {"execucao": [], "aprovacao": []}
+            self._entradas, self._info = {}, {}
+            if df.empty or 'status' not in df.columns: return
+            vivas = df[df['status'].isin(ABERTAS + EM_APROVACAO)]
+            prazo = storage.para_datetime(vivas['prazo']) if 'prazo' in vivas.columns else pd.Series(pd.NaT, index=vivas.index)
+            espera = storage.para_datetime(vivas['fim_execucao']).fillna(storage.para_datetime(vivas['data_criacao']))
+            for t, s, p, e, c, f, a in zip(vivas['id_task'].astype(str), vivas['status'], prazo, espera,
+                                           vivas['colab_clean'], vivas['conf_clean'], vivas['atividade']):
+                ent = _entrada(t, s, p, e)
+                if not ent: continue
+                self.listas[ent[0]].append(ent[1])
+                self._entradas[t] = ent
+                self._info[t] = {"colaborador": c, "conferente": f, "atividade": a, "status": s}
+            for lista in self.listas.values(): lista.sort()
+
+    def aplicar(self, antiga, nova):
+        t = str((nova or antiga)['id_task'])
+        with self._lock:
+            ent = self._entradas.pop(t, None)
+            self._info.pop(t, None)
+            if ent:
+                lista = self.listas[ent[0]]
+                i = bisect.bisect_left(lista, ent[1])
+                if i < len(lista) and lista[i] == ent[1]: del lista[i]
+            if not nova: return
+            espera = storage.para_timestamp(nova.get('fim_execucao'))
+            if pd.isna(espera): espera = storage.para_timestamp(nova.get('data_criacao'))
+            ent = _entrada(t, nova.get('status'), storage.para_timestamp(nova.get('prazo')), espera)
+            if not ent: return
+            bisect.insort(self.listas[ent[0]], ent[1])
+            self._entradas[t] = ent
+            self._info[t] = {"colaborador": nova.get('colab_clean'), "conferente": nova.get('conf_clean'),
+                             "atividade": nova.get('atividade'), "status": nova.get('status')}
+
+    def _ate(self, nome, limite):
+        with self._lock:
+            lista = self.listas[nome]
+            fatia = lista[:bisect.bisect_right(lista, (pd.Timestamp(limite), "\uffff"))]
+            return pd.DataFrame([dict(self._info[t], id_task=t, instante=i) for i, t in fatia],
+                                columns=['id_task', 'instante', 'colaborador', 'conferente', 'atividade', 'status'])
+
+    def vencendo(self, ate):
+        # Tarefas por fazer com prazo até `ate` (as já vencidas incluídas), mais antigas primeiro.
+        return self._ate("execucao", ate)
+
+    def aguardando_desde(self, antes_de):
+        # Tarefas à espera de aprovação desde antes de `antes_de`.
+        return self._ate("aprovacao", antes_de)
+
+    def totais(self):
+        with self._lock: return {nome: len(lista) for nome, lista in self.listas.items()}
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def get_indice():
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndicePrazos()
+            storage.get_task_store().registrar_indice(_indice)
+    storage.get_task_store().sincronizar()
+    return _indice
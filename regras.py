@@ -0,0 +1,188 @@
+import threading
+
+import pandas as pd
+
+import storage
+
+# --- MOTOR DE REGRAS DE PAGAMENTO ---
+# A tabela `rules` é compilada uma vez por versão num dicionário por atividade;
+# preço, unidade, exigência de SKU e limites saem daí sem consultar o DataFrame.
+# Colunas opcionais da tabela (vazias = padrões abaixo):
+#   unidade        PALETE | CARRO | FIXO | KPI | REPACK | PARAMETRO
+#   exige_sku      S / N
+#   limite_diario  nº de pagamentos por colaborador por dia
+# Linhas com unidade PARAMETRO guardam valores globais (ex.: "LIMITE RV" 380), então
+# mudar uma taxa ou o teto é só editar o rules.xlsx, sem novo deploy.
+PALETE, CARRO, FIXO, KPI, REPACK, PARAMETRO = "PALETE", "CARRO", "FIXO", "KPI", "REPACK", "PARAMETRO"
+
+KPIS = ['EFC', 'EFD', 'TMA', 'RESSUPRIMENTO']
+PADRAO_POR_CARRO = ["DESCARREGAMENTO DE VAN"]
+PADRAO_SEM_QUANTIDADE = ["AMARRAÇÃO", "MÁQUINA LIMPEZA", "5S"]
+PADRAO_REPACK = ["REPACK"]
+PADRAO_LIMITE_DIARIO = {"5S": 1}
+PADRAO_SEM_SKU = [
+    "SELO VERMELHO (TOPO/MOLHADO)", "SELO VERMELHO (BASE/VAZAMENTO)", "AMARRAÇÃO", "REFUGO",
+    "BLITZ (EMPURRADA)", "BLITZ (CARREG)", "BLITZ (RETORNO)", "REPACK", "DEVOLUÇÃO", "TRANSBORDO",
+    "MÁQUINA LIMPEZA", "5S", "DESCARREGAMENTO DE VAN", "EFC", "EFD", "TMA", "RESSUPRIMENTO",
+    "CARREGAMENTO FROTA FIXA", "CARREGAMENTO CARRETA", "CARREGAMENTO FRETEIRO",
+    "DESCARREGAR MARKETING PLACE", "DESCARREGAR FRETEIRO", "ESTOCAR PRODUTOS PUXADA",
+    "ABASTECIMENTO PICKING", "ESTOCAR PRODUTOS SELO VERMELHO", "RETIRAR PRODUTOS SELO VERMELHO",
+    "ABASTECIMENTO REPACK", "ESTOCAR PRODUTOS MARIA MOLE", "BLITZ DE CARREGAMENTO", "MOVIMENTAÇÃO DE REPOSIÇÃO"
+]
+# Parâmetros globais (linhas PARAMETRO da tabela sobrepõem).
+PADRAO_PARAMETROS = {
+    "LIMITE RV": 380.00,
+    "REPACK LATA": 0.10, "REPACK PET": 0.15, "REPACK ONEWAY": 0.20, "REPACK LONGNECK": 0.20,
+}
+CAMPOS_REPACK = {"qtd_lata": "REPACK LATA", "qtd_pet": "REPACK PET", "qtd_oneway": "REPACK ONEWAY", "qtd_longneck": "REPACK LONGNECK"}
+# Papéis cuja RV vem só dos KPIs: as demais atividades valem R$ 0,00 para eles.
+PAPEIS_SO_KPI = {'Operador'}
+
+# Tabela de partida quando o rules ainda não existe em lado nenhum.
+REGRAS_PADRAO = [
+    {"atividade": "SELO VERMELHO (TOPO/MOLHADO)", "valor": 1.25},
+    {"atividade": "SELO VERMELHO (BASE/VAZAMENTO)", "valor": 1.50},
+    {"atividade": "AMARRAÇÃO", "valor": 3.00},
+    {"atividade": "REFUGO", "valor": 0.90},
+    {"atividade": "BLITZ (EMPURRADA)", "valor": 1.50},
+    {"atividade": "BLITZ (CARREG)", "valor": 1.50},
+    {"atividade": "BLITZ (RETORNO)", "valor": 1.50},
+    {"atividade": "REPACK", "valor": 0.00},
+    {"atividade": "DEVOLUÇÃO", "valor": 1.25},
+    {"atividade": "TRANSBORDO", "valor": 1.50},
+    {"atividade": "TRIAGEM AVARIAS ARMAZÉM D", "valor": 1.25},
+    {"atividade": "PRÉ PICKING MKT PLACE (DESTILADOS)", "valor": 2.00},
+    {"atividade": "PRÉ PICKING MKT PLACE (REDBULL)", "valor": 1.50},
+    {"atividade": "CÂMARA FRIA", "valor": 3.00},
+    {"atividade": "MÁQUINA LIMPEZA", "valor": 5.00},
+    {"atividade": "5S", "valor": 14.50},
+    {"atividade": "DESCARREGAMENTO DE VAN", "valor": 2.00},
+    {"atividade": "EFC", "valor": 3.85},
+    {"atividade": "EFD", "valor": 3.85},
+    {"atividade": "TMA", "valor": 7.70},
+    {"atividade": "RESSUPRIMENTO", "valor": 3.85},
+    {"atividade": "ABASTECIMENTO PICKING", "valor": 0.00},
+    {"atividade": "ABASTECIMENTO REPACK", "valor": 0.00},
+    {"atividade": "ARMAZENAR REDBULL GAIOLA", "valor": 0.00},
+    {"atividade": "CARREGAMENTO CARRETA", "valor": 0.00},
+    {"atividade": "CARREGAMENTO FRETEIRO", "valor": 0.00},
+    {"atividade": "CARREGAMENTO FROTA FIXA", "valor": 0.00},
+    {"atividade": "DESCARREGAR MARKETING PLACE", "valor": 0.00},
+    {"atividade": "DESCARREGAR FRETEIRO", "valor": 0.00},
+    {"atividade": "ESTOCAR PRODUTOS MARIA MOLE", "valor": 0.00},
+    {"atividade": "ESTOCAR PRODUTOS PUXADA", "valor": 0.00},
+    {"atividade": "ESTOCAR PRODUTOS SELO VERMELHO", "valor": 0.00},
+    {"atividade": "GUARDAR CHOPP", "valor": 0.00},
+    {"atividade": "GUARDAR PRODUTOS MARKETING PLACE", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM A", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM B", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM C", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM D", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM M", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO ARMAZÉM R", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO DE REPOSIÇÃO", "valor": 0.00},
+    {"atividade": "MOVIMENTAÇÃO POR RISCO DE QUEBRA", "valor": 0.00},
+    {"atividade": "ORGANIZAR FEFO CHOPP", "valor": 0.00},
+    {"atividade": "ORGANIZAR FEFO PA", "valor": 0.00},
+    {"atividade": "RETIRAR PRODUTOS SELO VERMELHO", "valor": 0.00}
+]
+
+
+def _num(v, padrao=0.0):
+    try: return float(v) if pd.notna(v) and str(v).strip() != "" else padrao
+    except (TypeError, ValueError): return padrao
+
+
+def _texto(v):
+    return "" if v is None or pd.isna(v) else str(v).strip().upper()
+
+
+def _tipo(atividade, unidade):
+    # As listas padrão prevalecem sobre a unidade do xlsx, como no cálculo antigo
+    # (AMARRAÇÃO está como CARRO na tabela mas sempre foi paga por execução).
+    if unidade in (FIXO, KPI, REPACK): return unidade
+    if atividade in KPIS: return KPI
+    if atividade in PADRAO_SEM_QUANTIDADE: return FIXO
+    if atividade in PADRAO_REPACK: return REPACK
+    if unidade == CARRO or atividade in PADRAO_POR_CARRO: return CARRO
+    return PALETE
+
+
+class Regras:
+    def __init__(self, df):
+        if df.empty or 'atividade' not in df.columns: df = pd.DataFrame(REGRAS_PADRAO)
+        self.parametros = dict(PADRAO_PARAMETROS)
+        self.atividades = {}
+        for r in df.to_dict('records'):
+            nome = str(r.get('atividade', '')).strip()
+            if not nome: continue
+            unidade = _texto(r.get('unidade'))
+            if unidade == PARAMETRO:
+                self.parametros[nome.upper()] = _num(r.get('valor'), self.parametros.get(nome.upper(), 0.0))
+                continue
+            exige = _texto(r.get('exige_sku'))
+            limite = r.get('limite_diario')
+            self.atividades[nome] = {
+                "valor": _num(r.get('valor')),
+                "tipo": _tipo(nome, unidade),
+                "exige_sku": exige == "S" if exige in ("S", "N") else nome not in PADRAO_SEM_SKU,
+                "limite_diario": int(_num(limite)) if _texto(limite) else PADRAO_LIMITE_DIARIO.get(nome),
+            }
+
+    def _regra(self, atividade):
+        return self.atividades.get(atividade) or {
+            "valor": 0.0, "tipo": _tipo(atividade, ""),
+            "exige_sku": atividade not in PADRAO_SEM_SKU, "limite_diario": PADRAO_LIMITE_DIARIO.get(atividade),
+        }
+
+    def lista(self, kpis=False):
+        return [a for a, r in self.atividades.items() if (r["tipo"] == KPI) == kpis]
+
+    def valor(self, atividade): return self._regra(atividade)["valor"]
+    def tipo(self, atividade): return self._regra(atividade)["tipo"]
+    def exige_sku(self, atividade): return self._regra(atividade)["exige_sku"]
+    def limite_diario(self, atividade): return self._regra(atividade)["limite_diario"]
+
+    @property
+    def teto_rv(self): return self.parametros["LIMITE RV"]
+
+    def remunera(self, atividade, papel):
+        return papel not in PAPEIS_SO_KPI or self.tipo(atividade) == KPI
+
+    def preco(self, tarefa, papel, feitas_hoje=0):
+        # Valor a pagar por uma tarefa. Na criação (sem 'valor') devolve a taxa
+        # unitária da tabela; na conclusão multiplica a taxa gravada na tarefa pela
+        # quantidade, então uma mudança de tabela não altera tarefas já abertas.
+        atividade = tarefa.get('atividade')
+        if not self.remunera(atividade, papel): return 0.0
+        limite = self.limite_diario(atividade)
+        if limite and feitas_hoje >= limite: return 0.0
+
+        tipo = self.tipo(atividade)
+        if tipo == REPACK:
+            return sum(_num(tarefa.get(campo)) * self.parametros[p] for campo, p in CAMPOS_REPACK.items())
+        unitario = _num(tarefa.get('valor'), self.valor(atividade))
+        if tipo in (PALETE, CARRO): return unitario * _num(tarefa.get('qtd_produzida'), 1.0)
+        return unitario
+
+    def a_pagar(self, tarefa, papel):
+        # Valor na aprovação: o total que a conclusão gravou com preco() (taxa da
+        # criação x quantidade, limite diário já aplicado). Repassar a tarefa por
+        # preco() multiplicaria a quantidade de novo; aqui só se volta a checar o papel.
+        if not self.remunera(tarefa.get('atividade'), papel): return 0.0
+        return _num(tarefa.get('valor'))
+
+
+_regras = None
+_versao = None
+_lock = threading.Lock()
+
+
+def get_regras():
+    global _regras, _versao
+    versao = storage.versao_tabela("rules")
+    with _lock:
+        if _regras is None or versao != _versao:
+            _regras = Regras(storage.get_table("rules"))
+            _versao = versao
+        return _regras
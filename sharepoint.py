@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+# --- CLIENTE MICROSOFT GRAPH (SHAREPOINT) ---
+# Mantido em módulo próprio: o Streamlit reexecuta o app.py a cada clique, mas os
+# módulos importados ficam vivos no processo, então token, drive e sessão HTTP
+# são partilhados por todas as sessões e reruns.
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+LOGIN_URL = "https://login.microsoftonline.com"
+MARGEM_TOKEN_S = 300  # renova o token 5 min antes de expirar
+TIMEOUT_S = 30
+CHUNK_UPLOAD = 320 * 1024 * 16  # 5 MiB; o Graph exige múltiplos de 320 KiB
+
+
+class GraphError(Exception):
+    pass
+
+
+class ConflitoVersao(GraphError):
+    pass
+
+
+class GraphClient:
+    def __init__(self, tenant_id, client_id, client_secret, site, folder):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.site = site
+        self.folder = folder
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._token_expira = 0.0
+        self._drive_id = None
+        self.metricas = {
+            "token_hits": 0, "token_misses": 0,
+            "drive_hits": 0, "drive_misses": 0,
+            "downloads": 0, "uploads": 0,
+        }
+
+    def get_token(self):
+        with self._lock:
+            if self._token and time.time() < self._token_expira:
+                self.metricas["token_hits"] += 1
+                return self._token
+
+            self.metricas["token_misses"] += 1
+            r = self.session.post(
+                f"{LOGIN_URL}/{self.tenant_id}/oauth2/v2.0/token",
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": "https://graph.microsoft.com/.default",
+                },
+                timeout=TIMEOUT_S,
+            )
+            if r.status_code != 200:
+                raise GraphError(f"Erro ao autenticar: {r.text}")
+
+            payload = r.json()
+            expira_em = int(payload.get("expires_in", 3600))
+            self._token = payload.get("access_token")
+            self._token_expira = time.time() + max(expira_em - MARGEM_TOKEN_S, 0)
+            return self._token
+
+    def invalidar_token(self):
+        with self._lock:
+            self._token = None
+            self._token_expira = 0.0
+
+    def _request(self, method, url, headers=None, **kwargs):
+        # Um 401 com token em cache (ex.: segredo rodado) força nova autenticação uma vez.
+        for tentativa in range(2):
+            h = {"Authorization": f"Bearer {self.get_token()}"}
+            if headers: h.update(headers)
+            r = self.session.request(method, url, headers=h, timeout=TIMEOUT_S, **kwargs)
+            if r.status_code == 401 and tentativa == 0:
+                self.invalidar_token()
+                continue
+            return r
+        return r
+
+    def get_drive_id(self):
+        if self._drive_id:
+            self.metricas["drive_hits"] += 1
+            return self._drive_id
+
+        self.metricas["drive_misses"] += 1
+        drives = self._request("GET", f"{GRAPH_URL}/sites/{self.site}/drives").json()
+        if "value" not in drives or not drives["value"]:
+            raise GraphError("Drive SharePoint não encontrado")
+        self._drive_id = drives["value"][0]["id"]
+        return self._drive_id
+
+    def item_url(self, filename):
+        return f"{GRAPH_URL}/drives/{self.get_drive_id()}/root:/{self.folder}/{filename}"
+
+    def get_item(self, filename, etag=None):
+        # Metadados do ficheiro; com If-None-Match o Graph responde 304 se nada mudou.
+        headers = {"If-None-Match": etag} if etag else None
+        r = self._request("GET", self.item_url(filename), headers=headers)
+        if r.status_code == 304:
+            return 304, None
+        if r.status_code == 200:
+            return 200, r.json()
+        return r.status_code, None
+
+    def download_url(self, url):
+        self.metricas["downloads"] += 1
+        r = self.session.get(url, timeout=TIMEOUT_S)
+        if r.status_code == 200:
+            return r.content
+        return None
+
+    def download(self, filename):
+        self.metricas["downloads"] += 1
+        r = self._request("GET", f"{self.item_url(filename)}:/content")
+        if r.status_code == 200:
+            return r.content
+        return None
+
+    def download_para(self, filename, destino, chunk=1024 * 1024):
+        # Vídeos: grava em disco por partes em vez de trazer o ficheiro inteiro para a memória.
+        self.metricas["downloads"] += 1
+        r = self._request("GET", f"{self.item_url(filename)}:/content", stream=True)
+        if r.status_code != 200:
+            r.close()
+            return False
+        parcial = destino + ".part"
+        with r, open(parcial, "wb") as f:
+            for bloco in r.iter_content(chunk): f.write(bloco)
+        os.replace(parcial, destino)
+        return True
+
+    def upload(self, filename, data, if_match=None):
+        self.metricas["uploads"] += 1
+        headers = {"Content-Type": "application/octet-stream"}
+        if if_match: headers["If-Match"] = if_match
+        r = self._request("PUT", f"{self.item_url(filename)}:/content", headers=headers, data=data)
+        if r.status_code == 412:
+            raise ConflitoVersao(f"{filename} foi alterado por outro utilizador")
+        if r.status_code not in (200, 201):
+            raise GraphError(f"Erro ao enviar {filename}: {r.status_code} {r.text}")
+        return r.json()
+
+    def criar_sessao_upload(self, filename):
+        r = self._request(
+            "POST", f"{self.item_url(filename)}:/createUploadSession",
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}},
+        )
+        if r.status_code != 200:
+            raise GraphError(f"Erro ao abrir sessão de upload de {filename}: {r.status_code} {r.text}")
+        return r.json()["uploadUrl"]
+
+    def _retomar_sessao(self, upload_url):
+        # Pergunta à sessão existente a partir de que byte continuar.
+        r = self.session.get(upload_url, timeout=TIMEOUT_S)
+        if r.status_code != 200: return None
+        faltam = r.json().get("nextExpectedRanges") or ["0-"]
+        return int(faltam[0].split("-")[0])
+
+    def upload_em_partes(self, filename, caminho_local, upload_url=None, ao_criar_sessao=None):
+        # Upload retomável: lê e envia CHUNK_UPLOAD bytes de cada vez, então a memória
+        # usada não depende do tamanho do vídeo.
+        tamanho = os.path.getsize(caminho_local)
+        if tamanho == 0:
+            with open(caminho_local, "rb") as f: return self.upload(filename, f)
+
+        inicio = self._retomar_sessao(upload_url) if upload_url else None
+        if inicio is None:
+            inicio = 0
+            upload_url = self.criar_sessao_upload(filename)
+            if ao_criar_sessao: ao_criar_sessao(upload_url)
+
+        self.metricas["uploads"] += 1
+        resposta = {}
+        with open(caminho_local, "rb") as f:
+            f.seek(inicio)
+            while inicio < tamanho:
+                bloco = f.read(CHUNK_UPLOAD)
+                fim = inicio + len(bloco) - 1
+                r = self.session.put(
+                    upload_url, data=bloco, timeout=TIMEOUT_S * 4,
+                    headers={"Content-Length": str(len(bloco)), "Content-Range": f"bytes {inicio}-{fim}/{tamanho}"},
+                )
+                if r.status_code not in (200, 201, 202):
+                    raise GraphError(f"Erro ao enviar parte {inicio}-{fim} de {filename}: {r.status_code} {r.text}")
+                resposta = r.json() if r.content else {}
+                inicio = fim + 1
+        return resposta
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GraphClient(
+                st.secrets["TENANT_ID"], st.secrets["CLIENT_ID"], st.secrets["CLIENT_SECRET"],
+                st.secrets["SHAREPOINT_SITE"], st.secrets["SHAREPOINT_FOLDER"],
+            )
+        return _client
+
+
+def get_metricas():
+    if _client is None: return {}
+    return dict(_client.metricas)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+
+import backends
+import storage
+
+# --- SINCRONIZAÇÃO PRIMÁRIO <-> SHAREPOINT ---
+# Os cliques só leem e gravam no primário local. Esta thread, a cada INTERVALO_S,
+# compara cada tabela com o espelho (SharePoint) e faz um merge a três por linha:
+# a base é o hash de cada linha na última sincronização bem-sucedida. Mudou só de
+# um lado -> esse lado vence; mudou dos dois -> conflito registado (fica a versão
+# local, que é a do chão de fábrica) e aparece no Diagnóstico. Todas as gravações
+# locais feitas entre dois ciclos seguem para o SharePoint num único upload.
+SYNC_DB = os.path.join(storage.DADOS_LOCAIS, "sync.db")
+INTERVALO_S = 30
+TABELAS = ["tasks", "users", "rules", "sku", "fechamentos"]
+# Colunas que identificam a linha no merge. O sku.xlsx repete o Código Promax com
+# descrições diferentes, então lá a chave são as duas primeiras colunas (código e
+# Material). Uma tabela com chave repetida não é mesclada: fica em conflito.
+CHAVES = {"tasks": ["id_task"], "users": ["id_login"], "rules": ["atividade"], "fechamentos": ["id_linha"]}
+
+metricas = {"ciclos": 0, "enviados": 0, "recebidos": 0, "conflitos": 0}
+
+_lock = threading.Lock()
+_thread = None
+_tabelas_criadas = False
+
+
+@contextmanager
+def _conn():
+    global _tabelas_criadas
+    os.makedirs(storage.DADOS_LOCAIS, exist_ok=True)
+    conn = sqlite3.connect(SYNC_DB, timeout=30)
+    try:
+        if not _tabelas_criadas:
+            conn.execute("CREATE TABLE IF NOT EXISTS estado (tabela TEXT PRIMARY KEY, etag_remoto TEXT, versao_local TEXT, sincronizado_em REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS linhas (tabela TEXT, chave TEXT, hash TEXT, PRIMARY KEY (tabela, chave))")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conflitos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, tabela TEXT, chave TEXT,
+                    local TEXT, remoto TEXT, detectado_em REAL, resolvido INTEGER DEFAULT 0
+                )
+            """)
+            _tabelas_criadas = True
+        with conn: yield conn
+    finally:
+        conn.close()
+
+
+def _texto(v):
+    # Forma canónica de um valor, para o xlsx e o SQLite darem o mesmo hash
+    # (1 vs 1.0, datetime vs texto ISO, NaN vs vazio).
+    if v is None or (not isinstance(v, (list, dict)) and pd.isna(v)): return ""
+    if isinstance(v, date): return pd.Timestamp(v).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(v, float) and v.is_integer(): return str(int(v))
+    return str(v).strip()
+
+
+class ChaveRepetida(Exception):
+    def __init__(self, nome, lado, repetidas):
+        super().__init__(f"{nome}: {len(repetidas)} chave(s) repetida(s) no {lado}, merge recusado")
+        self.lado, self.repetidas = lado, repetidas
+
+
+def _colunas_chave(nome, df):
+    return CHAVES.get(nome) or list(df.columns[:2])
+
+
+def _chave(nome, registro, cols):
+    if nome == "users": return storage.clean_id(registro[cols[0]])
+    partes = [_texto(registro[c]) for c in cols]
+    return "\x1f".join(partes) if any(partes) else ""
+
+
+def _linhas(nome, df, lado):
+    df = storage.tipar_datas(df.drop(columns=[c for c in storage.COLUNAS_DERIVADAS if c in df.columns]))
+    cols = _colunas_chave(nome, df)
+    if not cols or any(c not in df.columns for c in cols): return {}, []
+    colunas = sorted(df.columns)
+    linhas, repetidas = {}, {}
+    for registro in df.to_dict("records"):
+        k = _chave(nome, registro, cols)
+        if not k: continue
+        if k in linhas: repetidas.setdefault(k, [linhas[k]]).append(registro)
+        linhas[k] = registro
+    # Ficar só com a última linha de cada chave apagaria as outras dos dois lados.
+    if repetidas: raise ChaveRepetida(nome, lado, repetidas)
+    return linhas, colunas
+
+
+def _hash(registro, colunas):
+    return hashlib.sha1("\x1f".join(_texto(registro.get(c)) for c in colunas).encode("utf-8")).hexdigest()
+
+
+def mesclar(nome, local, remoto, base):
+    # Devolve (DataFrame mesclado, conflitos, hashes da nova base, mudou local?, mudou remoto?).
+    L, cols_l = _linhas(nome, local, "local")
+    R, cols_r = _linhas(nome, remoto, "remoto")
+    colunas = sorted(set(cols_l) | set(cols_r))
+    hl = {k: _hash(r, colunas) for k, r in L.items()}
+    hr = {k: _hash(r, colunas) for k, r in R.items()}
+    resultado, hashes, conflitos = {}, {}, []
+    for k in list(L) + [k for k in R if k not in L]:
+        a, b, o = hl.get(k), hr.get(k), base.get(k)
+        if a == b or b == o: lado = L
+        elif a == o: lado = R
+        else:
+            # Sem base (primeira sincronização) o SharePoint, que era a fonte antiga, vence.
+            lado = R if o is None and k in R else L
+            conflitos.append((k, L.get(k), R.get(k)))
+        if k in lado:
+            resultado[k] = lado[k]
+            hashes[k] = (hl if lado is L else hr)[k]
+
+    colunas_df = list(dict.fromkeys(list(local.columns) + list(remoto.columns)))
+    df = pd.DataFrame(list(resultado.values()), columns=[c for c in colunas_df if c not in storage.COLUNAS_DERIVADAS])
+    return df, conflitos, hashes, hashes != hl, hashes != hr
+
+
+def _estado(conn, nome):
+    row = conn.execute("SELECT etag_remoto, versao_local FROM estado WHERE tabela = ?", (nome,)).fetchone()
+    base = dict(conn.execute("SELECT chave, hash FROM linhas WHERE tabela = ?", (nome,)).fetchall())
+    return (row or (None, None)), base
+
+
+def _inserir_conflitos(conn, nome, conflitos, agora):
+    conn.executemany(
+        "INSERT INTO conflitos (tabela, chave, local, remoto, detectado_em) VALUES (?, ?, ?, ?, ?)",
+        [(nome, k, json.dumps(l, default=str, ensure_ascii=False), json.dumps(r, default=str, ensure_ascii=False), agora) for k, l, r in conflitos],
+    )
+
+
+def _registrar_repetidas(nome, erro):
+    # Uma entrada por chave repetida, sem duplicar as que ainda estão abertas a cada ciclo.
+    with _conn() as conn:
+        abertas = {r[0] for r in conn.execute("SELECT chave FROM conflitos WHERE tabela = ? AND resolvido = 0", (nome,))}
+        novas = [(k, l, None) if erro.lado == "local" else (k, None, l) for k, l in erro.repetidas.items() if k not in abertas]
+        _inserir_conflitos(conn, nome, novas, time.time())
+    metricas["conflitos"] += len(novas)
+
+
+def _gravar_estado(nome, etag_remoto, versao_local, hashes, conflitos=()):
+    agora = time.time()
+    with _conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO estado (tabela, etag_remoto, versao_local, sincronizado_em) VALUES (?, ?, ?, ?)",
+            (nome, etag_remoto, versao_local, agora),
+        )
+        conn.execute("DELETE FROM linhas WHERE tabela = ?", (nome,))
+        conn.executemany("INSERT INTO linhas (tabela, chave, hash) VALUES (?, ?, ?)", [(nome, k, h) for k, h in hashes.items()])
+        _inserir_conflitos(conn, nome, conflitos, agora)
+
+
+def sincronizar_tabela(nome, espelho):
+    with _conn() as conn: (etag_remoto, versao_local), base = _estado(conn, nome)
+
+    local = storage.get_table(nome, forcar=True)
+    versao_atual = local.attrs.get("etag")
+    if versao_atual is None and base:
+        # Leitura local falhou (ou a tabela sumiu do primário) depois de já ter havido
+        # sincronização: o merge veria todas as linhas da base como apagadas aqui e
+        # apagaria-as também no SharePoint. Mesma guarda do mutate_table.
+        raise backends.ErroArmazenamento(f"{nome}: leitura local falhou, sincronização adiada")
+    remoto, etag_novo = espelho.carregar(nome, etag_remoto)
+    if remoto is None:
+        # SharePoint igual à última sincronização (ou ainda sem o ficheiro): só falta
+        # enviar o que mudou no local, tudo num único upload.
+        if local.empty or (versao_atual == versao_local and etag_novo is not None): return
+        remoto = local if etag_novo is None else None
+
+    if remoto is None:
+        _, _, hashes, _, _ = mesclar(nome, local, local, base)
+        mesclado, conflitos, muda_local, muda_remoto = local, [], False, True
+    else:
+        metricas["recebidos"] += 1
+        mesclado, conflitos, hashes, muda_local, muda_remoto = mesclar(nome, local, remoto, base)
+        metricas["conflitos"] += len(conflitos)
+        if etag_novo is None: muda_remoto = True  # ficheiro ainda não existe no SharePoint
+
+    # If-Match nas duas pontas: se alguém gravou entretanto, o ciclo seguinte refaz o merge.
+    if muda_local:
+        storage.put_table(mesclado, nome, if_match=versao_atual)
+        versao_atual = storage.versao_tabela(nome)
+    if muda_remoto:
+        etag_novo = espelho.gravar(nome, mesclado.drop(columns=[c for c in storage.COLUNAS_DERIVADAS if c in mesclado.columns]), if_match=etag_novo)
+        metricas["enviados"] += 1
+    _gravar_estado(nome, etag_novo, versao_atual, hashes, conflitos)
+
+
+def sincronizar_tudo():
+    espelhos = storage.get_backends()["espelhos"]
+    for espelho in espelhos:
+        for nome in TABELAS:
+            try: sincronizar_tabela(nome, espelho)
+            except backends.ConflitoVersao: pass  # tenta de novo no próximo ciclo
+            except ChaveRepetida as e:
+                _registrar_repetidas(nome, e)
+                metricas["erro"] = f"{espelho.nome}/{str(e)}"
+            except Exception as e: metricas["erro"] = f"{espelho.nome}/{nome}: {e}"
+    metricas["ciclos"] += 1
+
+
+def _loop(intervalo):
+    while True:
+        time.sleep(intervalo)
+        sincronizar_tudo()
+
+
+def iniciar(intervalo=INTERVALO_S):
+    global _thread
+    with _lock:
+        if not storage.get_backends()["espelhos"]: return
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop, args=(intervalo,), daemon=True, name="sincronizacao")
+            _thread.start()
+
+
+def estado():
+    with _conn() as conn:
+        df = pd.read_sql_query("SELECT tabela, etag_remoto, versao_local, sincronizado_em FROM estado", conn)
+    df['sincronizado_em'] = pd.to_datetime(df['sincronizado_em'], unit='s')
+    return df
+
+
+def conflitos_abertos():
+    with _conn() as conn:
+        df = pd.read_sql_query("SELECT id, tabela, chave, local, remoto, detectado_em FROM conflitos WHERE resolvido = 0 ORDER BY id DESC", conn)
+    df['detectado_em'] = pd.to_datetime(df['detectado_em'], unit='s')
+    return df
+
+
+def resolver_conflitos(ids):
+    with _conn() as conn:
+        conn.executemany("UPDATE conflitos SET resolvido = 1 WHERE id = ?", [(int(i),) for i in ids])
@@ -0,0 +1,71 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+import storage
+
+# --- ÍNDICE DE BUSCA DE SKU ---
+# Construído uma vez por versão do catálogo (eTag do sku.xlsx). Busca por prefixo
+# de palavra, sem acentos, sobre Material e Código Promax; devolve só o top-N.
+MAX_RESULTADOS = 30
+
+
+def normalizar(texto):
+    s = unicodedata.normalize("NFKD", str(texto))
+    s = "".join(c for c in s if not unicodedata.combining(c)).upper()
+    return re.sub(r"[^A-Z0-9]+", " ", s).strip()
+
+
+class IndiceSku:
+    def __init__(self, df):
+        self.itens = []
+        postings = {}
+        if not df.empty and df.shape[1] >= 2:
+            # Mesma convenção do sku.xlsx: 1ª coluna = Código Promax, 2ª = Material.
+            for codigo, material in zip(df.iloc[:, 0].astype(str), df.iloc[:, 1].astype(str)):
+                codigo, material = re.sub(r'\.0$', '', codigo.strip()), material.strip()
+                i = len(self.itens)
+                self.itens.append((codigo, material, normalizar(material)))
+                for tok in set(normalizar(material).split()) | {codigo}:
+                    postings.setdefault(tok, set()).add(i)
+        self.vocab = sorted(postings)
+        self.postings = postings
+
+    def _por_prefixo(self, prefixo):
+        ids = set()
+        i = bisect.bisect_left(self.vocab, prefixo)
+        while i < len(self.vocab) and self.vocab[i].startswith(prefixo):
+            ids |= self.postings[self.vocab[i]]
+            i += 1
+        return ids
+
+    def buscar(self, consulta, n=MAX_RESULTADOS):
+        tokens = normalizar(consulta).split()
+        if not tokens: return []
+        ids = None
+        for tok in sorted(tokens, key=len, reverse=True):
+            achados = self._por_prefixo(tok)
+            ids = achados if ids is None else ids & achados
+            if not ids: return []
+
+        consulta_norm = " ".join(tokens)
+        def rank(i):
+            codigo, _, material_norm = self.itens[i]
+            return (codigo != consulta_norm, not material_norm.startswith(consulta_norm), len(material_norm), material_norm)
+        return [self.itens[i][:2] for i in sorted(ids, key=rank)[:n]]
+
+
+_indice = None
+_versao = None
+_lock = threading.Lock()
+
+
+def get_indice():
+    global _indice, _versao
+    versao = storage.versao_tabela("sku")
+    with _lock:
+        if _indice is None or versao != _versao:
+            _indice = IndiceSku(storage.get_table("sku"))
+            _versao = versao
+        return _indice
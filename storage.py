@@ -0,0 +1,621 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+import backends
+
+# --- CACHE DE TABELAS (PARTILHADO PELO PROCESSO) ---
+# Cada tabela fica guardada já convertida em DataFrame junto com a versão do backend
+# (o campo continua a chamar-se `etag`). Dentro do TTL devolve direto da memória;
+# depois dele revalida e só volta a ler a tabela quando a versão mudou.
+TTL_TABELAS = {"rules": 600, "sku": 3600, "users": 60, "tasks": 15}
+TTL_PADRAO = 30
+
+metricas = {
+    "hits": 0, "revalidados": 0, "recarregados": 0, "invalidacoes": 0, "compactacoes": 0,
+    "semeados": 0,
+    "occ_escritas": 0, "occ_conflitos": 0, "occ_falhas": 0,
+    "uow_commits": 0,
+}
+OCC_TENTATIVAS = 5
+OCC_BACKOFF_S = 0.2
+
+_cache = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+# --- BACKENDS ---
+# Por omissão o primário é o SQLite local (dados_locais/dados.db): leituras e escritas
+# não dependem da rede. O SharePoint, quando configurado, passa a espelho (mantido
+# pelo sincronizacao.py) e, junto com os CSVs de data/, serve de semente para as
+# tabelas que ainda não existem localmente. No secrets.toml:
+#   [ARMAZENAMENTO]
+#   primario = "sharepoint"   # volta ao comportamento antigo (xlsx como fonte)
+DADOS_LOCAIS = "dados_locais"
+BANCO_LOCAL = os.path.join(DADOS_LOCAIS, "dados.db")
+PASTA_CSV = "data"
+
+_backends = {}
+
+
+def _sharepoint_configurado():
+    try: return "TENANT_ID" in st.secrets
+    except Exception: return False
+
+
+def get_backends():
+    with _locks_guard:
+        if not _backends:
+            try: primario = st.secrets.get("ARMAZENAMENTO", {}).get("primario", "sqlite")
+            except Exception: primario = "sqlite"
+            sp = backends.SharePointBackend() if _sharepoint_configurado() else None
+            local = backends.SQLiteBackend(BANCO_LOCAL)
+            _backends["primario"] = sp if primario == "sharepoint" and sp else local
+            _backends["espelhos"] = [b for b in (sp,) if b and b is not _backends["primario"]]
+            _backends["sementes"] = [b for b in (sp, backends.CsvBackend(PASTA_CSV)) if b and b is not _backends["primario"]]
+        return _backends
+
+
+def backend_primario():
+    return get_backends()["primario"]
+
+
+class _Entrada:
+    def __init__(self, df, etag):
+        self.df = df
+        self.etag = etag
+        self.verificado_em = time.time()
+        self.indice = {}
+
+
+def clean_id(x):
+    if pd.isna(x): return ""
+    s = str(x).strip().replace('.0', '')
+    return s.lstrip('0') if s != '0' else '0'
+
+
+def clean_id_series(serie):
+    # Mesma regra do clean_id, mas com operações vetorizadas de string.
+    s = serie.astype(str).str.strip().str.replace('.0', '', regex=False)
+    s = s.where(s == '0', s.str.lstrip('0'))
+    return s.where(serie.notna(), "").astype(object)
+
+
+# --- DATAS ---
+# Esquema canônico: as colunas de data das tarefas são datetime64 (hora de Brasília,
+# sem fuso) no DataFrame e células de data no xlsx; no diário vão como texto ISO.
+# Os formatos de texto antigos continuam a ser lidos, mas não são mais gravados.
+COLUNAS_DATA = ['data_criacao', 'inicio_execucao', 'fim_execucao', 'prazo', 'data_aprovacao']
+FORMATOS_LEGADOS = ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M"]
+FORMATO_EXIBICAO = "%d/%m/%Y %H:%M"
+SEM_PRAZO = pd.Timestamp('2099-12-31 23:59:59')
+
+
+def agora_br():
+    return (datetime.utcnow() - timedelta(hours=3)).replace(microsecond=0)
+
+
+# data_criacao antiga ("%d/%m %H:%M") não tem ano.
+SEM_ANO = r"^\d{2}/\d{2} "
+
+
+def para_datetime(serie, referencia=None):
+    if pd.api.types.is_datetime64_any_dtype(serie): return serie
+    s = serie.astype(str).str.strip()
+    dt = pd.to_datetime(s, format="ISO8601", errors='coerce')
+    for fmt in FORMATOS_LEGADOS:
+        falta = dt.isna()
+        if not falta.any(): return dt
+        dt[falta] = pd.to_datetime(s[falta], format=fmt, errors='coerce')
+    # Sem ano: o mais recente que não põe a data depois da `referencia` da linha
+    # (outra data da mesma tarefa) ou, sem ela, de agora. 29/02 pode recuar até 4 anos.
+    falta = dt.isna() & s.str.match(SEM_ANO)
+    if falta.any():
+        ref = pd.Series(pd.Timestamp(agora_br()), index=s.index)
+        if referencia is not None: ref = referencia.reindex(s.index).fillna(ref)
+        for recuo in range(5):
+            if not falta.any(): break
+            ano = (ref[falta].dt.year - recuo).astype(str)
+            cand = pd.to_datetime(s[falta].str[:5] + "/" + ano + s[falta].str[5:], format="%d/%m/%Y %H:%M", errors='coerce')
+            ok = cand.notna() & (cand <= ref[falta])
+            dt[ok[ok].index] = cand[ok]
+            falta &= dt.isna()
+    return dt
+
+
+def para_timestamp(valor):
+    return para_datetime(pd.Series([valor], dtype=object)).iloc[0]
+
+
+def referencia_criacao(df):
+    # A criação nunca é posterior ao fim, ao início nem ao prazo da própria tarefa.
+    ref = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for col in ('fim_execucao', 'inicio_execucao', 'prazo'):
+        if col not in df.columns: continue
+        v = para_datetime(df[col])
+        ref = ref.fillna(v.where(v < SEM_PRAZO))
+    return ref
+
+
+def tipar_datas(df):
+    for col in COLUNAS_DATA:
+        if col in df.columns and col != 'data_criacao': df[col] = para_datetime(df[col])
+    if 'data_criacao' in df.columns: df['data_criacao'] = para_datetime(df['data_criacao'], referencia_criacao(df))
+    return df
+
+
+def formatar_data(valor, fmt=FORMATO_EXIBICAO):
+    return "-" if valor is None or pd.isna(valor) else pd.Timestamp(valor).strftime(fmt)
+
+
+# Colunas calculadas na carga; nunca são gravadas de volta no xlsx.
+COLUNAS_DERIVADAS = ['id_clean', 'colab_clean', 'conf_clean']
+
+
+def _preparar(nome, entrada):
+    df = entrada.df
+    if nome == "tasks": tipar_datas(df)
+    if nome == "users" and 'id_login' in df.columns:
+        df['id_clean'] = clean_id_series(df['id_login'])
+        primeiros = df['id_clean'][~df['id_clean'].duplicated()]
+        entrada.indice = dict(zip(primeiros, primeiros.index))
+    return entrada
+
+
+def _lock_tabela(nome):
+    with _locks_guard:
+        if nome not in _locks: _locks[nome] = threading.Lock()
+        return _locks[nome]
+
+
+def _ttl(nome):
+    # Permite sobrescrever no secrets.toml, ex.: [CACHE_TTL] users = 120
+    try: ttl_secrets = st.secrets.get("CACHE_TTL", {})
+    except Exception: ttl_secrets = {}
+    return float(ttl_secrets.get(nome, TTL_TABELAS.get(nome, TTL_PADRAO)))
+
+
+def _semear(nome):
+    # Primeira leitura de uma tabela que o primário ainda não tem: copia da primeira
+    # semente que a tem (SharePoint, depois data/*.csv) para o primário. Só passa à
+    # seguinte quando a anterior diz que a tabela não existe; uma falha interrompe,
+    # senão os CSVs de exemplo iriam para o primário e dali para o SharePoint.
+    for semente in get_backends()["sementes"]:
+        try: df, _ = semente.carregar(nome)
+        except Exception as e:
+            metricas["erro_semente"] = f"{semente.nome}/{nome}: {e}"
+            raise
+        if df is None: continue
+        metricas["semeados"] += 1
+        return df, backend_primario().gravar(nome, df)
+    return None, None
+
+
+def _get_entrada(nome, forcar=False):
+    with _lock_tabela(nome):
+        entrada = _cache.get(nome)
+        if entrada and not forcar and time.time() - entrada.verificado_em < _ttl(nome):
+            metricas["hits"] += 1
+            return entrada
+
+        try: df, versao = backend_primario().carregar(nome, entrada.etag if entrada else None)
+        except Exception as e:
+            # Sem acesso ao primário segue com a última versão em memória.
+            metricas["erro_leitura"] = f"{nome}: {e}"
+            return entrada
+        if df is None and versao is None and not (entrada and entrada.etag):
+            try: df, versao = _semear(nome)
+            except Exception: return entrada  # tenta semear de novo na próxima leitura
+            if df is None:
+                # Não existe em lado nenhum (ex.: fechamentos antes do primeiro fecho):
+                # guarda vazia para não procurar as sementes de novo antes do TTL.
+                _cache[nome] = _Entrada(pd.DataFrame(), None)
+                return _cache[nome]
+        if df is None and entrada and versao == entrada.etag:
+            metricas["revalidados"] += 1
+            entrada.verificado_em = time.time()
+            return entrada
+        if df is None:
+            return entrada
+
+        metricas["recarregados"] += 1
+        _cache[nome] = _preparar(nome, _Entrada(df, versao))
+        return _cache[nome]
+
+
+def _copia_versionada(entrada):
+    # O eTag lido segue no próprio DataFrame (attrs) para o save usar como If-Match.
+    df = entrada.df.copy()
+    df.attrs["etag"] = entrada.etag
+    return df
+
+
+def get_table(nome, forcar=False):
+    entrada = _get_entrada(nome, forcar)
+    return _copia_versionada(entrada) if entrada else pd.DataFrame()
+
+
+def versao_tabela(nome):
+    entrada = _get_entrada(nome)
+    return entrada.etag if entrada else None
+
+
+def get_user(user_id):
+    entrada = _get_entrada("users")
+    if not entrada: return None
+    idx = entrada.indice.get(clean_id(user_id))
+    return None if idx is None else entrada.df.loc[idx].to_dict()
+
+
+def put_table(df, nome, if_match=None):
+    df = df.drop(columns=[c for c in COLUNAS_DERIVADAS if c in df.columns])
+    with _lock_tabela(nome):
+        try:
+            versao = backend_primario().gravar(nome, df, if_match=if_match)
+        except Exception:
+            invalidar(nome)
+            raise
+        # A versão recém-gravada passa a ser a do cache: a próxima leitura não precisa baixar.
+        _cache[nome] = _preparar(nome, _Entrada(df.copy(), versao))
+        return versao
+
+
+def _backoff(tentativa):
+    time.sleep(OCC_BACKOFF_S * (2 ** tentativa) * (0.5 + random.random()))
+
+
+def mutate_table(nome, aplicar, tentativas=OCC_TENTATIVAS):
+    # Concorrência otimista: lê (com eTag), aplica o delta e grava com If-Match.
+    # Num 412 relê a versão nova, reaplica o mesmo delta e tenta de novo.
+    # `aplicar` recebe uma cópia e devolve o DataFrame a gravar, ou None para desistir.
+    # Devolve a versão gravada (ou False se `aplicar` desistiu).
+    for tentativa in range(tentativas):
+        entrada = _get_entrada(nome, forcar=tentativa > 0)
+        # Sem entrada a leitura falhou: aplicar o delta sobre uma tabela vazia apagaria o resto.
+        if entrada is None: raise backends.ErroArmazenamento(f"{nome}: leitura falhou, escrita cancelada")
+        df = _copia_versionada(entrada)
+        novo = aplicar(df)
+        if novo is None: return False
+
+        metricas["occ_escritas"] += 1
+        try:
+            return put_table(novo, nome, if_match=entrada.etag)
+        except backends.ConflitoVersao:
+            metricas["occ_conflitos"] += 1
+            _backoff(tentativa)
+
+    metricas["occ_falhas"] += 1
+    raise backends.ConflitoVersao(f"{nome}: desisti após {tentativas} conflitos de versão")
+
+
+def invalidar(nome=None):
+    metricas["invalidacoes"] += 1
+    if nome is None: _cache.clear()
+    else: _cache.pop(nome, None)
+
+
+# --- DIÁRIO (JOURNAL) DE TAREFAS ---
+# Criar ou alterar uma tarefa só acrescenta uma linha JSON ao diário local, sem
+# reler nem regravar a tabela inteira. A leitura junta o snapshot do primário com
+# o diário, e um compactador em segundo plano incorpora o diário no snapshot.
+COMPACTAR_A_CADA_S = 60
+
+
+class TaskJournal:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        registros = self.ler()
+        self.seq = registros[-1]["seq"] if registros else 0
+
+    def append(self, registros):
+        with self._lock:
+            linhas = []
+            for r in registros:
+                self.seq += 1
+                linhas.append(json.dumps(dict(r, seq=self.seq, ts=time.time()), default=str, ensure_ascii=False))
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(linhas) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return self.seq
+
+    def ler(self, desde_seq=0):
+        if not os.path.exists(self.path): return []
+        registros = []
+        with open(self.path, encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha: continue
+                try: r = json.loads(linha)
+                except ValueError: continue  # linha cortada por queda do processo
+                if r["seq"] > desde_seq: registros.append(r)
+        return registros
+
+    def truncar_ate(self, seq):
+        with self._lock:
+            restantes = [r for r in self.ler() if r["seq"] > seq]
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for r in restantes: f.write(json.dumps(r, default=str, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+
+def aplicar_registros(df, registros, posicoes=None):
+    # Inserções são idempotentes (viram atualização se o id_task já existe), pois o
+    # mesmo registo pode ser lido de novo entre o upload do snapshot e o truncamento.
+    if posicoes is None:
+        posicoes = {str(t): i for i, t in zip(df.index, df['id_task'])} if 'id_task' in df.columns else {}
+
+    novas = {}
+    for r in registros:
+        id_task = str(r["id_task"])
+        valores = r["dados"]
+        if id_task in novas:
+            novas[id_task].update(valores)
+        elif id_task in posicoes:
+            idx = posicoes[id_task]
+            for col, val in valores.items():
+                if col not in df.columns: df[col] = None
+                if col in COLUNAS_DATA:
+                    if not pd.api.types.is_datetime64_any_dtype(df[col]): df[col] = para_datetime(df[col])
+                    val = para_timestamp(val)
+                elif df[col].dtype != object: df[col] = df[col].astype(object)
+                df.at[idx, col] = val
+        elif r["op"] == "insert":
+            novas[id_task] = dict(valores)
+
+    if novas:
+        for col in df.columns:
+            if df[col].dtype != object and col not in COLUNAS_DATA: df[col] = df[col].astype(object)
+        novo = tipar_datas(pd.DataFrame(list(novas.values())))
+        inicio = (df.index.max() + 1) if not df.empty else 0
+        novo.index = range(inicio, inicio + len(novo))
+        df = pd.concat([df, novo]) if not df.empty else novo
+        for i, id_task in zip(novo.index, novas): posicoes[id_task] = i
+        tipar_datas(df)
+    return df
+
+
+class IndiceIds:
+    # colaborador_id / conferente_id normalizados -> conjunto de id_task
+    def __init__(self):
+        self.por_colaborador = defaultdict(set)
+        self.por_conferente = defaultdict(set)
+
+    def reconstruir(self, df):
+        self.por_colaborador = defaultdict(set)
+        self.por_conferente = defaultdict(set)
+        if df.empty or 'id_task' not in df.columns: return
+        ids = df['id_task'].astype(str)
+        for destino, col in ((self.por_colaborador, 'colab_clean'), (self.por_conferente, 'conf_clean')):
+            for chave, grupo in ids.groupby(df[col]): destino[chave] = set(grupo)
+
+    def aplicar(self, antiga, nova):
+        for destino, col in ((self.por_colaborador, 'colab_clean'), (self.por_conferente, 'conf_clean')):
+            if antiga: destino[antiga.get(col)].discard(str(antiga['id_task']))
+            if nova: destino[nova.get(col)].add(str(nova['id_task']))
+
+
+class IndiceDiario:
+    # (colaborador, atividade, dia de criação) -> {id_task: status}
+    def __init__(self):
+        self.por_dia = defaultdict(dict)
+        self._chaves = {}
+
+    def reconstruir(self, df):
+        self.por_dia = defaultdict(dict)
+        self._chaves = {}
+        if df.empty or 'data_criacao' not in df.columns: return
+        dias = para_datetime(df['data_criacao']).dt.date
+        for t, c, a, d, s in zip(df['id_task'].astype(str), df['colab_clean'], df['atividade'], dias, df['status']):
+            if pd.isna(d): continue
+            self._chaves[t] = (c, a, d)
+            self.por_dia[(c, a, d)][t] = s
+
+    def aplicar(self, antiga, nova):
+        t = str((nova or antiga)['id_task'])
+        chave = self._chaves.pop(t, None)
+        if chave: self.por_dia[chave].pop(t, None)
+        if not nova: return
+        criacao = para_timestamp(nova.get('data_criacao'))
+        if pd.isna(criacao): return
+        dia = criacao.date()
+        chave = (nova.get('colab_clean'), nova.get('atividade'), dia)
+        self._chaves[t] = chave
+        self.por_dia[chave][t] = nova.get('status')
+
+    def contar(self, colab, atividades, dia, ignorar=()):
+        return sum(1 for a in atividades for s in self.por_dia.get((colab, a, dia), {}).values() if s not in ignorar)
+
+
+class TaskStore:
+    def __init__(self, journal):
+        self.journal = journal
+        self._lock = threading.RLock()
+        self._etag_base = None
+        self._superadas = set()  # versões do snapshot que este processo já deixou para trás
+        self._seq = 0
+        self._df = None
+        self._posicoes = {}
+        self.ids = IndiceIds()
+        self.diario = IndiceDiario()
+        self._indices = [self.ids, self.diario]
+
+    def insert(self, tasks):
+        return self.journal.append([{"op": "insert", "id_task": str(t["id_task"]), "dados": t} for t in tasks])
+
+    def update(self, task_id, updates):
+        return self.journal.append([{"op": "update", "id_task": str(task_id), "dados": updates}])
+
+    def registrar_indice(self, indice):
+        # Índices derivados recebem `reconstruir(df)` a cada snapshot novo e
+        # `aplicar(antiga, nova)` para cada tarefa que mudou no diário.
+        with self._lock:
+            self._indices.append(indice)
+            if self._df is not None: indice.reconstruir(self._df)
+
+    def _linha(self, task_id):
+        pos = self._posicoes.get(task_id)
+        return None if pos is None else self._df.loc[pos].to_dict()
+
+    def _avancar(self, etag):
+        if self._etag_base is not None and self._etag_base != etag: self._superadas.add(self._etag_base)
+        self._etag_base = etag
+
+    def sincronizar(self):
+        with self._lock:
+            # O snapshot é lido sob o lock: o compactar avança a base e só depois trunca
+            # o diário, então uma versão lida antes dele nunca é juntada ao diário já
+            # truncado. Sem leitura (falha com o cache vazio) ou com uma versão mais
+            # antiga que a atual (cache de outro ponto), fica a vista que já existe.
+            entrada = _get_entrada("tasks")
+            if entrada is None and self._df is None: return pd.DataFrame()
+            etag = entrada.etag if entrada else self._etag_base
+            reconstruir = self._df is None or (etag != self._etag_base and etag not in self._superadas)
+            if reconstruir:
+                df = entrada.df.copy()
+                self._seq = 0
+                self._avancar(etag)
+                self._df = df
+                self._posicoes = {str(t): i for i, t in zip(df.index, df['id_task'])} if 'id_task' in df.columns else {}
+                for origem, destino in (('colaborador_id', 'colab_clean'), ('conferente_id', 'conf_clean')):
+                    df[destino] = clean_id_series(df[origem]) if origem in df.columns else ""
+
+            registros = self.journal.ler(self._seq)
+            alteradas = list(dict.fromkeys(str(r["id_task"]) for r in registros))
+            antigas = {} if reconstruir else {t: self._linha(t) for t in alteradas}
+            if registros:
+                self._df = aplicar_registros(self._df, registros, self._posicoes)
+                self._seq = registros[-1]["seq"]
+                for t in alteradas:
+                    pos = self._posicoes.get(t)
+                    if pos is None: continue
+                    self._df.at[pos, 'colab_clean'] = clean_id(self._df.at[pos, 'colaborador_id'])
+                    self._df.at[pos, 'conf_clean'] = clean_id(self._df.at[pos, 'conferente_id'])
+
+            if reconstruir:
+                for indice in self._indices: indice.reconstruir(self._df)
+            else:
+                for t in alteradas:
+                    nova = self._linha(t)
+                    for indice in self._indices: indice.aplicar(antigas.get(t), nova)
+            return self._df
+
+    def ler(self):
+        with self._lock:
+            return self.sincronizar().copy()
+
+    def _ler_ids(self, ids):
+        df = self.sincronizar()
+        posicoes = sorted(self._posicoes[t] for t in ids if t in self._posicoes)
+        return df.loc[posicoes].copy()
+
+    def ler_por_colaborador(self, user_id):
+        with self._lock:
+            self.sincronizar()
+            return self._ler_ids(self.ids.por_colaborador.get(clean_id(user_id), ()))
+
+    def ler_por_conferente(self, user_id):
+        with self._lock:
+            self.sincronizar()
+            return self._ler_ids(self.ids.por_conferente.get(clean_id(user_id), ()))
+
+    def feitas_no_dia(self, user_id, atividades, dia, ignorar=()):
+        with self._lock:
+            self.sincronizar()
+            return self.diario.contar(clean_id(user_id), atividades, dia, ignorar)
+
+    def compactar(self):
+        with self._lock:
+            self.sincronizar()
+            if self._df is None: raise backends.ErroArmazenamento("tasks: leitura falhou, compactação adiada")
+            etag_indices, seq = self._etag_base, self._seq
+        registros = [r for r in self.journal.ler() if r["seq"] <= seq]
+        if not registros: return 0
+        # Os registos do diário são deltas por campo, então num conflito basta
+        # reaplicá-los sobre a versão que outro processo acabou de gravar.
+        versoes = []
+
+        def aplicar(base):
+            versoes.append(base.attrs.get("etag"))
+            return aplicar_registros(base, registros)
+
+        versao = mutate_table("tasks", aplicar)
+        # Só trunca se a escrita foi condicionada a uma versão conhecida; a primeira
+        # gravação da tabela fica no diário até à próxima compactação (reaplicar é idempotente).
+        if versoes[-1] is None: return 0
+        with self._lock:
+            # Gravado sobre a mesma base dos índices: o snapshot novo é o que eles já
+            # refletem, então só avança a versão em vez de reconstruir tudo.
+            if versoes[-1] == etag_indices == self._etag_base: self._avancar(versao)
+        self.journal.truncar_ate(registros[-1]["seq"])
+        metricas["compactacoes"] += 1
+        return len(registros)
+
+
+# --- UNIDADE DE TRABALHO (APROVAÇÕES) ---
+# Aprovar é mudar o estado da tarefa para 'Executada' com o `valor` a pagar: o
+# crédito de RV é derivado desse lançamento pelo ledger, então o commit é uma só
+# escrita no diário. É idempotente por id_task: só aplica se a tarefa ainda estiver
+# no estado esperado, então um segundo clique em "Aprovar" não paga duas vezes.
+_uow_lock = threading.Lock()
+
+
+class UnidadeTrabalho:
+    def __init__(self):
+        self.tarefas = []
+
+    def atualizar_tarefa(self, task_id, updates, status_esperado=None):
+        self.tarefas.append((str(task_id), dict(updates), status_esperado))
+
+    def commit(self):
+        store = get_task_store()
+        with _uow_lock:
+            atual = store.sincronizar()
+            for task_id, _, esperado in self.tarefas:
+                pos = store._posicoes.get(task_id)
+                if pos is None: return False
+                if esperado and atual.at[pos, 'status'] != esperado: return False
+
+            store.journal.append([{"op": "update", "id_task": t, "dados": u} for t, u, _ in self.tarefas])
+            metricas["uow_commits"] += 1
+            return True
+
+
+_tasks_store = None
+_tasks_store_lock = threading.Lock()
+_compactador = None
+
+
+def get_task_store():
+    global _tasks_store
+    with _tasks_store_lock:
+        if _tasks_store is None:
+            _tasks_store = TaskStore(TaskJournal(os.path.join(DADOS_LOCAIS, "tasks_journal.jsonl")))
+        return _tasks_store
+
+
+def _loop_compactador(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try: get_task_store().compactar()
+        except Exception as e: metricas["erro_compactacao"] = str(e)
+
+
+def iniciar_compactador(intervalo=COMPACTAR_A_CADA_S):
+    global _compactador
+    with _tasks_store_lock:
+        if _compactador is None or not _compactador.is_alive():
+            _compactador = threading.Thread(target=_loop_compactador, args=(intervalo,), daemon=True, name="compactador-tasks")
+            _compactador.start()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+# Cada teste corre numa pasta vazia: o primário é um SQLite novo em dados_locais/,
+# sem SharePoint (não há secrets) e sem os CSVs de data/ como semente.
+@pytest.fixture(autouse=True)
+def ambiente(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "OCC_BACKOFF_S", 0)
+    monkeypatch.setattr(storage, "_ttl", lambda nome: 0)
+    storage._cache.clear()
+    storage._backends.clear()
+    storage._tasks_store = None
+    yield
+    storage._cache.clear()
+    storage._backends.clear()
+    storage._tasks_store = None
+
+
+def tarefa(id_task, **campos):
+    base = {
+        'id_task': id_task, 'colaborador_id': '10', 'conferente_id': '20', 'atividade': 'REFUGO',
+        'status': 'Pendente', 'valor': 1.0, 'data_criacao': pd.Timestamp('2026-09-10 08:00'),
+        'inicio_execucao': None, 'fim_execucao': None, 'prazo': storage.SEM_PRAZO, 'qtd_produzida': 0,
+    }
+    base.update(campos)
+    return base
@@ -0,0 +1,21 @@
+import pandas as pd
+
+import analitica
+from conftest import tarefa
+
+
+def _producao(*linhas):
+    df = pd.DataFrame(list(linhas))
+    return analitica.contribuicoes(df.assign(conf_clean=df['conferente_id']))["producao"].set_index("atividade")
+
+
+def test_repack_conta_os_itens_das_embalagens():
+    fim = pd.Timestamp("2026-09-10 10:00")
+    p = _producao(
+        tarefa("r", atividade="REPACK", status="Executada", fim_execucao=fim, qtd_produzida=1.0, qtd_lata=12, qtd_pet=6, qtd_oneway=0, qtd_longneck=2),
+        tarefa("c", atividade="PALETIZAÇÃO", status="Executada", fim_execucao=fim, qtd_produzida=3.0, qtd_lata=0, qtd_pet=0, qtd_oneway=0, qtd_longneck=0),
+        tarefa("f", atividade="REFUGO", status="Executada", fim_execucao=fim, qtd_produzida=0, qtd_lata=0, qtd_pet=0, qtd_oneway=0, qtd_longneck=0),
+    )
+    assert p.loc["REPACK", "unidades"] == 20.0
+    assert p.loc["PALETIZAÇÃO", "unidades"] == 3.0
+    assert p.loc["REFUGO", "unidades"] == 1.0
@@ -0,0 +1,58 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import ledger
+import regras
+import storage
+from conftest import tarefa
+
+
+@pytest.fixture(autouse=True)
+def ledger_novo(monkeypatch):
+    monkeypatch.setattr(ledger, "_ledger", None)
+
+
+def _aguardando():
+    storage.put_table(pd.DataFrame([tarefa("t1", status="Aguardando Aprovação", valor=12.5)]), "tasks")
+    storage._cache.clear()
+    return storage.get_task_store()
+
+
+def _aprovar():
+    uow = storage.UnidadeTrabalho()
+    uow.atualizar_tarefa("t1", {"status": "Executada", "valor": 12.5, "data_aprovacao": pd.Timestamp("2026-09-11 09:00")}, "Aguardando Aprovação")
+    return uow.commit()
+
+
+def _transicoes(store):
+    return [r for r in store.journal.ler() if r["dados"].get("status") == "Executada"]
+
+
+def test_aprovar_duas_vezes_paga_uma():
+    store = _aguardando()
+    assert _aprovar() is True
+    assert _aprovar() is False  # segunda sessão com a tela desatualizada
+
+    conta = ledger.get_ledger(regras.KPIS).conta("10")
+    assert (conta["saldo"], conta["executadas"]) == (12.5, 1)
+    assert len(_transicoes(store)) == 1
+
+
+def test_aprovacoes_simultaneas_pagam_uma():
+    store = _aguardando()
+    partida = threading.Barrier(2)
+    resultados = []
+
+    def sessao():
+        partida.wait()
+        resultados.append(_aprovar())
+
+    sessoes = [threading.Thread(target=sessao) for _ in range(2)]
+    for s in sessoes: s.start()
+    for s in sessoes: s.join()
+
+    assert sorted(resultados) == [False, True]
+    assert ledger.get_ledger(regras.KPIS).conta("10")["saldo"] == 12.5
+    assert len(_transicoes(store)) == 1
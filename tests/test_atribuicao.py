@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+import atribuicao
+import storage
+from conftest import tarefa
+
+AGORA = pd.Timestamp("2026-09-10 12:00")
+
+
+@pytest.fixture(autouse=True)
+def indice_novo(monkeypatch):
+    monkeypatch.setattr(atribuicao, "_indice", None)
+
+
+def _carga(conferente, abertas, aprovadas_na_semana):
+    linhas = [tarefa(f"{conferente}-a{i}", conferente_id=conferente) for i in range(abertas)]
+    linhas += [tarefa(f"{conferente}-x{i}", conferente_id=conferente, status="Executada",
+                      data_aprovacao=AGORA - timedelta(hours=i + 1)) for i in range(aprovadas_na_semana)]
+    return linhas
+
+
+def _indice(*cargas):
+    storage.put_table(pd.DataFrame([t for c in cargas for t in c]), "tasks")
+    storage._cache.clear()
+    return atribuicao.get_indice()
+
+
+def test_escolhe_a_menor_fila_relativa_a_vazao():
+    # 21: 2 abertas / 1 por dia; 22: 4 abertas / 28 por semana (4 por dia) -> 22.
+    indice = _indice(_carga("20", 3, 0), _carga("21", 2, 0), _carga("22", 4, 28))
+    assert indice.escolher(["20", "21", "22"], agora=AGORA, sortear=False) == "22"
+    assert indice.escolher(["20", "21"], agora=AGORA, sortear=False) == "21"
+    assert indice.escolher([], agora=AGORA) == atribuicao.SEM_CONFERENTE
+
+
+def test_ids_com_zeros_a_esquerda_sao_o_mesmo_conferente():
+    indice = _indice(_carga("020", 5, 0), _carga("21", 1, 0))
+    assert indice.carga("20", AGORA - timedelta(days=7)) == (5, atribuicao.VAZAO_MINIMA)
+    assert indice.escolher(["20", "021"], agora=AGORA, sortear=False) == "021"
+    assert indice.escolher(["020", "21", "20"], agora=AGORA, sortear=False) == "21"
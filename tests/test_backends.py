@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+import backends
+import storage
+
+
+class _SementeFalsa:
+    nome = "sharepoint"
+
+    def __init__(self, df=None, erro=None):
+        self.df, self.erro = df, erro
+
+    def carregar(self, tabela, versao_atual=None):
+        if self.erro: raise self.erro
+        return self.df, "v1" if self.df is not None else None
+
+
+@pytest.fixture
+def sementes(monkeypatch):
+    os.makedirs("data")
+    pd.DataFrame({"id_login": ["1"], "nome": ["Demo"]}).to_csv("data/users.csv", sep=";", index=False, encoding="utf-8-sig")
+
+    def configurar(sharepoint):
+        storage._backends.update(primario=backends.SQLiteBackend(storage.BANCO_LOCAL), espelhos=[],
+                                 sementes=[sharepoint, backends.CsvBackend("data")])
+        return storage._backends["primario"]
+    return configurar
+
+
+def test_falha_do_sharepoint_nao_semeia_com_os_csvs(sementes):
+    sharepoint = _SementeFalsa(erro=OSError("timeout"))
+    primario = sementes(sharepoint)
+    assert storage.get_table("users").empty
+    assert primario.carregar("users") == (None, None)
+    assert "timeout" in storage.metricas["erro_semente"]
+    with pytest.raises(backends.ErroArmazenamento):
+        storage.mutate_table("users", lambda df: df)
+
+    # Quando o SharePoint volta, a semente é a dele.
+    sharepoint.erro, sharepoint.df = None, pd.DataFrame({"id_login": ["7"], "nome": ["Real"]})
+    assert list(storage.get_table("users")["nome"]) == ["Real"]
+
+
+def test_tabela_ausente_no_sharepoint_cai_para_os_csvs(sementes):
+    sementes(_SementeFalsa())
+    assert list(storage.get_table("users")["nome"]) == ["Demo"]
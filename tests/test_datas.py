@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import os
+
+import pandas as pd
+
+import backends
+import migrar_datas
+import storage
+
+
+def _hoje(monkeypatch, quando):
+    monkeypatch.setattr(storage, "agora_br", lambda: datetime.fromisoformat(quando))
+
+
+def test_data_sem_ano_nunca_fica_no_futuro(monkeypatch):
+    _hoje(monkeypatch, "2026-01-05 10:00")
+    dt = storage.para_datetime(pd.Series(["31/12 23:00", "04/01 08:00"]))
+    assert list(dt) == [pd.Timestamp("2025-12-31 23:00"), pd.Timestamp("2026-01-04 08:00")]
+
+
+def test_data_sem_ano_usa_o_ano_das_outras_datas_da_tarefa(monkeypatch):
+    _hoje(monkeypatch, "2026-10-18 10:00")
+    df = storage.tipar_datas(pd.DataFrame({
+        'data_criacao': ["31/12 22:00", "10/03 08:00", "01/02 09:00"],
+        'fim_execucao': [None, "2024-03-10 11:00:00", None],
+        'prazo': ["01/01/2025 06:00", None, storage.SEM_PRAZO],
+    }))
+    assert list(df['data_criacao']) == [pd.Timestamp("2024-12-31 22:00"), pd.Timestamp("2024-03-10 08:00"), pd.Timestamp("2026-02-01 09:00")]
+
+
+def test_migracao_assinala_linhas_sem_ano_nem_referencia(monkeypatch, capsys):
+    _hoje(monkeypatch, "2026-10-18 10:00")
+    bruto = pd.DataFrame({'id_task': ["a", "b"], 'data_criacao': ["05/05 10:00", "05/05 10:00"],
+                          'prazo': [None, "06/05/2023 10:00"]})
+    migrar_datas.relatorio(bruto, storage.tipar_datas(bruto.copy()))
+    saida = capsys.readouterr().out
+    assert "1 sem ano nem data de referência" in saida
+    assert "~ a: 05/05 10:00 -> 2026-05-05 10:00:00" in saida
+
+
+class _EspelhoConcorrido(backends.SQLiteBackend):
+    # Na primeira gravação da migração outro processo grava antes dela.
+    def __init__(self, path):
+        super().__init__(path)
+        self.concorrente = None
+
+    def gravar(self, tabela, df, if_match=None):
+        if self.concorrente is not None:
+            novo, self.concorrente = self.concorrente, None
+            super().gravar(tabela, novo)
+        return super().gravar(tabela, df, if_match)
+
+
+def test_migracao_do_espelho_nao_sobrescreve_escrita_concorrente():
+    espelho = _EspelhoConcorrido(os.path.join("espelho", "sharepoint.db"))
+    espelho.gravar("tasks", pd.DataFrame({"id_task": ["a"], "data_criacao": ["10/09/2026 08:00"]}))
+    espelho.concorrente = pd.DataFrame({"id_task": ["a", "b"], "data_criacao": ["10/09/2026 08:00", "11/09/2026 09:30"]})
+
+    assert migrar_datas.regravar_espelho(espelho)
+    df, _ = espelho.carregar("tasks")
+    assert list(df["id_task"]) == ["a", "b"]
+    assert list(df["data_criacao"]) == ["2026-09-10 08:00:00", "2026-09-11 09:30:00"]
@@ -0,0 +1,176 @@
+import pandas as pd
+import pytest
+
+import backends
+import storage
+from conftest import tarefa
+
+
+def _snapshot(n):
+    storage.put_table(pd.DataFrame([tarefa(f"t{i}") for i in range(n)]), "tasks")
+    storage._cache.clear()
+
+
+def test_leitura_junta_snapshot_e_diario():
+    _snapshot(2)
+    store = storage.get_task_store()
+    store.insert([tarefa("novo")])
+    store.update("t0", {"status": "Executada"})
+    df = store.ler().set_index("id_task")
+    assert len(df) == 3
+    assert df.loc["t0", "status"] == "Executada"
+
+
+def test_compactar_incorpora_diario_e_trunca():
+    _snapshot(2)
+    store = storage.get_task_store()
+    store.insert([tarefa("novo")])
+    store.update("t1", {"status": "Executada", "fim_execucao": "2026-09-11T10:00:00"})
+    assert store.compactar() == 2
+    assert store.journal.ler() == []
+
+    storage._cache.clear()
+    df = storage.get_table("tasks").set_index("id_task")
+    assert len(df) == 3
+    assert df.loc["t1", "status"] == "Executada"
+    assert df.loc["t1", "fim_execucao"] == pd.Timestamp("2026-09-11 10:00")
+
+
+def test_compactar_sem_snapshot_nao_trunca_ate_haver_versao():
+    store = storage.get_task_store()
+    store.insert([tarefa("a")])
+    assert store.compactar() == 0
+    assert len(store.journal.ler()) == 1
+    assert store.compactar() == 1
+    assert store.journal.ler() == []
+    assert list(storage.get_table("tasks", forcar=True)["id_task"]) == ["a"]
+
+
+def test_falha_de_leitura_na_compactacao_preserva_snapshot(monkeypatch):
+    _snapshot(5)
+    store = storage.get_task_store()
+    store.insert([tarefa("novo")])
+
+    primario = storage.backend_primario()
+    original = primario.carregar
+
+    def falha(*args, **kwargs): raise OSError("disco indisponível")
+
+    monkeypatch.setattr(primario, "carregar", falha)
+    with pytest.raises(backends.ErroArmazenamento):
+        store.compactar()
+    monkeypatch.setattr(primario, "carregar", original)
+
+    assert len(store.journal.ler()) == 1
+    df = storage.get_table("tasks", forcar=True)
+    assert sorted(df["id_task"]) == [f"t{i}" for i in range(5)]
+    assert store.compactar() == 1
+    assert len(storage.get_table("tasks", forcar=True)) == 6
+
+
+class _Contador:
+    def __init__(self):
+        self.reconstrucoes, self.eventos = 0, 0
+
+    def reconstruir(self, df): self.reconstrucoes += 1
+    def aplicar(self, antiga, nova): self.eventos += 1
+
+
+def test_compactacao_nao_reconstroi_indices():
+    _snapshot(3)
+    store = storage.get_task_store()
+    contador = _Contador()
+    store.registrar_indice(contador)
+    store.sincronizar()
+    store.update("t0", {"status": "Executada"})
+    store.sincronizar()
+    assert (contador.reconstrucoes, contador.eventos) == (1, 1)
+
+    assert store.compactar() == 1
+    store.update("t1", {"status": "Executada"})
+    df = store.ler().set_index("id_task")
+    assert (contador.reconstrucoes, contador.eventos) == (1, 2)
+    assert list(df["status"]) == ["Executada", "Executada", "Pendente"]
+    assert store.ids.por_colaborador["10"] == {"t0", "t1", "t2"}
+
+
+def test_compactacao_sobre_versao_alheia_reconstroi():
+    _snapshot(2)
+    store = storage.get_task_store()
+    contador = _Contador()
+    store.registrar_indice(contador)
+    store.update("t0", {"status": "Executada"})
+    store.sincronizar()
+    # Outro processo grava a tabela depois da nossa última leitura.
+    storage.backend_primario().gravar("tasks", pd.DataFrame([tarefa("t0"), tarefa("t1"), tarefa("x")]))
+    storage._cache.clear()
+
+    assert store.compactar() == 1
+    df = store.ler().set_index("id_task")
+    assert contador.reconstrucoes == 2
+    assert sorted(df.index) == ["t0", "t1", "x"]
+    assert df.loc["t0", "status"] == "Executada"
+
+
+def test_versao_antiga_do_snapshot_nao_substitui_a_vista(monkeypatch):
+    _snapshot(2)
+    store = storage.get_task_store()
+    store.insert([tarefa("pago", status="Executada")])
+    store.sincronizar()
+    antiga = storage._cache["tasks"]
+
+    assert store.compactar() == 1
+    # Uma leitura feita antes do compactar devolve a versão que ele já substituiu.
+    monkeypatch.setattr(storage, "_get_entrada", lambda nome, forcar=False: antiga)
+    assert "pago" in set(store.ler()["id_task"])
+
+
+def test_falha_de_leitura_com_cache_vazio_mantem_a_vista(monkeypatch):
+    _snapshot(3)
+    store = storage.get_task_store()
+    contador = _Contador()
+    store.registrar_indice(contador)
+    store.sincronizar()
+
+    primario = storage.backend_primario()
+    original = primario.carregar
+
+    def falha(*args, **kwargs): raise OSError("disco indisponível")
+
+    monkeypatch.setattr(primario, "carregar", falha)
+    storage._cache.clear()
+    store.update("t0", {"status": "Executada"})
+    df = store.ler().set_index("id_task")
+    assert sorted(df.index) == ["t0", "t1", "t2"] and df.loc["t0", "status"] == "Executada"
+    assert contador.reconstrucoes == 1
+
+    # Sem vista nenhuma ainda, devolve vazio e monta quando a leitura voltar.
+    storage._tasks_store = None
+    assert storage.get_task_store().ler().empty
+    monkeypatch.setattr(primario, "carregar", original)
+    assert len(storage.get_task_store().ler()) == 3
+
+
+def test_feitas_no_dia_conta_o_dia_certo_e_ignora_status():
+    dia = pd.Timestamp("2026-09-10").date()
+    storage.put_table(pd.DataFrame([
+        tarefa("a", data_criacao=pd.Timestamp("2026-09-10 07:00")),
+        tarefa("b", data_criacao=pd.Timestamp("2026-09-10 22:30"), status="Rejeitada"),
+        tarefa("ano", data_criacao=pd.Timestamp("2025-09-10 09:00")),
+        tarefa("outro", data_criacao=pd.Timestamp("2026-09-10 09:00"), colaborador_id="11"),
+        tarefa("ontem", data_criacao=pd.Timestamp("2026-09-09 23:59")),
+    ]), "tasks")
+    storage._cache.clear()
+    store = storage.get_task_store()
+
+    assert store.feitas_no_dia("010", ["REFUGO"], dia) == 2
+    assert store.feitas_no_dia("10", ["REFUGO"], dia, ignorar=("Rejeitada",)) == 1
+    assert store.feitas_no_dia("10", ["REFUGO", "AMARRAÇÃO"], dia, ignorar=("Rejeitada",)) == 1
+    # Mesmo dia do calendário noutro ano não conta.
+    assert store.feitas_no_dia("10", ["REFUGO"], pd.Timestamp("2025-09-10").date()) == 1
+
+    # Eventos do diário atualizam a contagem sem reler o snapshot.
+    store.insert([tarefa("c", data_criacao=pd.Timestamp("2026-09-10 12:00"))])
+    store.update("a", {"status": "Rejeitada"})
+    assert store.feitas_no_dia("10", ["REFUGO"], dia, ignorar=("Rejeitada",)) == 1
+    assert store.feitas_no_dia("10", ["REFUGO"], dia) == 3
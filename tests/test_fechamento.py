@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pytest
+
+import fechamento
+import ledger
+import regras
+import storage
+from conftest import tarefa
+
+
+@pytest.fixture(autouse=True)
+def ledger_novo(monkeypatch):
+    monkeypatch.setattr(ledger, "_ledger", None)
+
+
+def _motor(teto=100.0):
+    return regras.Regras(pd.DataFrame({"atividade": ["REFUGO", "LIMITE RV"], "valor": [1.0, teto], "unidade": ["PALETE", "PARAMETRO"]}))
+
+
+def _executada(id_task, valor, dia, **campos):
+    return tarefa(id_task, status="Executada", valor=valor, fim_execucao=pd.Timestamp(dia), data_aprovacao=pd.Timestamp(dia), **campos)
+
+
+def _tarefas(*linhas):
+    storage.put_table(pd.DataFrame(list(linhas)), "tasks")
+    storage._cache.clear()
+    return storage.get_task_store()
+
+
+def _por_colaborador(folha):
+    return folha.set_index("colaborador_id")
+
+
+def test_fechar_aplica_o_teto_exporta_e_corta_o_ledger():
+    _tarefas(
+        _executada("a", 60.0, "2026-09-05 10:00"),
+        _executada("b", 150.0, "2026-09-20 10:00", colaborador_id="11"),
+        _executada("c", 7.0, "2026-10-01 10:00"),
+    )
+    folha, caminho = fechamento.fechar("2026-09-01", "2026-09-30", "99", _motor())
+    f = _por_colaborador(folha)
+    assert f.loc["10", "a_pagar"] == 60.0 and f.loc["10", "retido"] == 0.0
+    assert f.loc["11", "a_pagar"] == 100.0 and f.loc["11", "retido"] == 50.0
+    assert os.path.exists(caminho)
+    assert len(fechamento.historico()) == 2
+
+    # O saldo em aberto só conta o que veio depois do dia fechado.
+    assert ledger.ultimo_corte() == pd.Timestamp("2026-09-30").date()
+    assert ledger.get_ledger(regras.KPIS).conta("10")["saldo"] == 7.0
+
+
+def test_periodo_sobreposto_e_recusado():
+    _tarefas(_executada("a", 1.0, "2026-09-05 10:00"))
+    fechamento.fechar("2026-09-01", "2026-09-30", "99", _motor())
+    with pytest.raises(fechamento.PeriodoInvalido):
+        fechamento.fechar("2026-09-15", "2026-10-15", "99", _motor())
+    assert fechamento.historico()["id_fechamento"].nunique() == 1
+
+
+def test_aprovacao_tardia_entra_no_periodo_aberto():
+    store = _tarefas(
+        _executada("a", 60.0, "2026-09-05 10:00"),
+        tarefa("tarde", status="Aguardando Aprovação", valor=5.0, fim_execucao=pd.Timestamp("2026-09-30 17:00")),
+    )
+    fechamento.fechar("2026-09-01", "2026-09-30", "99", _motor())
+    store.update("tarde", {"status": "Executada", "data_aprovacao": pd.Timestamp("2026-10-02 09:00")})
+
+    assert ledger.get_ledger(regras.KPIS).conta("10")["saldo"] == 5.0
+    outubro = fechamento.calcular(store.ler(), storage.get_table("users"), "2026-10-01", "2026-10-31", _motor())
+    assert _por_colaborador(outubro).loc["10", "a_pagar"] == 5.0
+
+
+def test_bruto_negativo_passa_para_o_periodo_seguinte():
+    store = _tarefas(
+        _executada("p", 10.0, "2026-09-05 10:00"),
+        _executada("aj", -30.0, "2026-09-06 10:00", atividade=fechamento.ATIVIDADE_AJUSTE),
+        _executada("aj11", -5.0, "2026-09-06 10:00", colaborador_id="11", atividade=fechamento.ATIVIDADE_AJUSTE),
+    )
+    setembro = _por_colaborador(fechamento.fechar("2026-09-01", "2026-09-30", "99", _motor())[0])
+    assert setembro.loc["10", "bruto"] == -20.0 and setembro.loc["10", "a_pagar"] == 0.0
+    assert setembro.loc["10", "a_transportar"] == -20.0 and setembro.loc["10", "retido"] == 0.0
+
+    store.insert([_executada("out", 25.0, "2026-10-03 10:00")])
+    assert ledger.get_ledger(regras.KPIS).conta("10")["saldo"] == 5.0
+    assert ledger.get_ledger(regras.KPIS).saldos()["11"] == -5.0
+
+    outubro = _por_colaborador(fechamento.fechar("2026-10-01", "2026-10-31", "99", _motor())[0])
+    assert outubro.loc["10", "saldo_anterior"] == -20.0 and outubro.loc["10", "a_pagar"] == 5.0
+    assert outubro.loc["10", "a_transportar"] == 0.0
+    # Sem lançamentos no período, o débito continua a ser transportado.
+    assert outubro.loc["11", "tarefas"] == 0 and outubro.loc["11", "a_transportar"] == -5.0
@@ -0,0 +1,89 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("github")
+import media  # noqa: E402
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, conteudo, name):
+        super().__init__(conteudo)
+        self.name = name
+
+
+@pytest.fixture(autouse=True)
+def fila_local(monkeypatch):
+    monkeypatch.setattr(media, "_tabela_criada", False)
+
+
+def test_evidencia_grava_caminho_do_blob_e_alias_para_auditoria():
+    caminho = media.salvar_evidencia(_Upload(b"video-1", "a.mp4"), "JOAO_REFUGO", "images", "10", "t1")
+    assert caminho.startswith("images/cas/") and caminho.endswith(".mp4")
+    assert os.path.exists(caminho)
+    assert media.resolver(caminho) == caminho
+    assert media.resolver("images/JOAO_REFUGO.mp4") == caminho
+
+    # A mesma evidência noutra tarefa reutiliza o blob.
+    assert media.salvar_evidencia(_Upload(b"video-1", "b.mp4"), "ANA_REFUGO", "images", "11", "t2") == caminho
+    assert len(media.relatorio_duplicados()) == 2
+
+
+def test_envio_com_erro_nao_bloqueia_aprovacao_e_pode_ser_reenfileirado():
+    caminho = media.salvar_evidencia(_Upload(b"video-2", "a.mp4"), "JOAO_REFUGO", "images")
+    assert media.em_envio(caminho)
+    for tentativa in range(media.MAX_TENTATIVAS): media._reagendar(caminho, tentativa, "timeout")
+    assert media.status(caminho) == 'erro'
+    assert not media.em_envio(caminho)
+    assert media.envio_falhou(caminho)
+
+    assert media.reenfileirar_erros() == 1
+    assert media.status(caminho) == 'pendente' and media.em_envio(caminho)
+
+
+class _ClienteFalso:
+    def __init__(self): self.baixados = []
+
+    def download_para(self, nome, destino):
+        self.baixados.append(nome)
+        with open(destino, "wb") as f: f.write(b"x" * 100)
+        return True
+
+
+def test_videos_do_sharepoint_vao_para_cache_em_disco(monkeypatch):
+    cliente = _ClienteFalso()
+    monkeypatch.setattr(media.sharepoint, "get_client", lambda: cliente)
+    monkeypatch.setattr(media, "CACHE_DISCO_MAX_BYTES", 250)
+
+    caminho = media.carregar("images/cas/aaa.mp4")
+    assert caminho == os.path.join(media.PASTA_CACHE_DISCO, "images/cas/aaa.mp4") and os.path.exists(caminho)
+    assert media.carregar("images/cas/aaa.mp4") == caminho
+    assert cliente.baixados == ["images/cas/aaa.mp4"]
+    assert media.cache_media.get("images/cas/aaa.mp4") is None
+
+    os.utime(caminho, (1, 1))  # o mais antigo é despejado quando passa do limite
+    media.carregar("images/cas/bbb.mp4")
+    media.carregar("images/cas/ccc.mp4")
+    assert not os.path.exists(caminho)
+    assert media.resumo_cache_disco()["bytes"] <= 250
+
+
+def test_video_antigo_sem_registo_vem_do_github(monkeypatch):
+    cliente = _ClienteFalso()
+    monkeypatch.setattr(media.sharepoint, "get_client", lambda: cliente)
+    monkeypatch.setattr(media, "_baixar", lambda blob: b"video-antigo")
+
+    assert media.origem("images/JOAO_REFUGO_20250101.mp4") == 'github'
+    assert media.carregar("images/JOAO_REFUGO_20250101.mp4") == b"video-antigo"
+    assert cliente.baixados == []
+
+
+def test_destino_registado_na_fila_prevalece(monkeypatch):
+    caminho = media.salvar_evidencia(_Upload(b"foto", "a.bin"), "JOAO_REFUGO", "images")
+    with media._conn() as conn: conn.execute("UPDATE fila SET destino = 'sharepoint' WHERE caminho = ?", (caminho,))
+    assert media.origem(caminho) == 'sharepoint'
+    os.remove(caminho)
+    cliente = _ClienteFalso()
+    monkeypatch.setattr(media.sharepoint, "get_client", lambda: cliente)
+    assert media.carregar(caminho) == os.path.join(media.PASTA_CACHE_DISCO, caminho)
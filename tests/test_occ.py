@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import backends
+import storage
+
+
+def _usuarios(*nomes):
+    return pd.DataFrame({"id_login": [str(i) for i in range(len(nomes))], "nome": list(nomes)})
+
+
+def test_conflito_rele_e_reaplica_o_delta():
+    storage.put_table(_usuarios("Ana"), "users")
+    chamadas = []
+
+    def aplicar(df):
+        chamadas.append(len(df))
+        if len(chamadas) == 1:
+            # Outro processo grava entre a nossa leitura e a nossa escrita.
+            storage.backend_primario().gravar("users", _usuarios("Ana", "Bia"))
+        return pd.concat([df, pd.DataFrame({"id_login": ["9"], "nome": ["Caio"]})], ignore_index=True)
+
+    conflitos = storage.metricas["occ_conflitos"]
+    assert storage.mutate_table("users", aplicar)
+    assert chamadas == [1, 2]
+    assert storage.metricas["occ_conflitos"] == conflitos + 1
+    assert sorted(storage.get_table("users", forcar=True)["nome"]) == ["Ana", "Bia", "Caio"]
+
+
+def test_desiste_apos_conflitos_seguidos():
+    storage.put_table(_usuarios("Ana"), "users")
+
+    def aplicar(df):
+        storage.backend_primario().gravar("users", _usuarios("Ana", "Outro"))
+        return df
+
+    with pytest.raises(backends.ConflitoVersao):
+        storage.mutate_table("users", aplicar, tentativas=3)
+    assert list(storage.get_table("users", forcar=True)["nome"]) == ["Ana", "Outro"]
+
+
+def test_aplicar_none_nao_grava():
+    storage.put_table(_usuarios("Ana"), "users")
+    versao = storage.versao_tabela("users")
+    assert storage.mutate_table("users", lambda df: None) is False
+    assert storage.versao_tabela("users") == versao
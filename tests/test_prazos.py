@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+import prazos
+import storage
+from conftest import tarefa
+
+
+@pytest.fixture(autouse=True)
+def indice_novo(monkeypatch):
+    monkeypatch.setattr(prazos, "_indice", None)
+
+
+def _ids(df):
+    return list(df["id_task"])
+
+
+def test_tarefa_passa_da_fila_de_execucao_para_a_de_aprovacao():
+    storage.put_table(pd.DataFrame([
+        tarefa("t1", prazo=pd.Timestamp("2026-09-10 12:00")),
+        tarefa("t2", prazo=pd.Timestamp("2026-09-12 12:00")),
+        tarefa("t3", status="Aguardando Aprovação", fim_execucao=pd.Timestamp("2026-09-10 06:00")),
+        tarefa("sem", prazo=storage.SEM_PRAZO),
+    ]), "tasks")
+    storage._cache.clear()
+    store = storage.get_task_store()
+
+    indice = prazos.get_indice()
+    assert indice.totais() == {"execucao": 2, "aprovacao": 1}
+    assert _ids(indice.vencendo(pd.Timestamp("2026-09-10 13:00"))) == ["t1"]
+    assert _ids(indice.aguardando_desde(pd.Timestamp("2026-09-10 07:00"))) == ["t3"]
+
+    store.update("t1", {"status": "Aguardando Aprovação", "fim_execucao": pd.Timestamp("2026-09-10 09:00")})
+    indice = prazos.get_indice()
+    assert indice.totais() == {"execucao": 1, "aprovacao": 2}
+    assert _ids(indice.vencendo(pd.Timestamp("2026-09-12 12:00"))) == ["t2"]
+    fila = indice.aguardando_desde(pd.Timestamp("2026-09-11"))
+    assert _ids(fila) == ["t3", "t1"] and list(fila["status"]) == ["Aguardando Aprovação"] * 2
+
+    # Rejeitada volta a contar pelo prazo; aprovada sai das duas listas.
+    store.update("t1", {"status": "Rejeitada"})
+    store.update("t3", {"status": "Executada"})
+    indice = prazos.get_indice()
+    assert indice.totais() == {"execucao": 2, "aprovacao": 0}
+    assert _ids(indice.vencendo(pd.Timestamp("2026-09-30"))) == ["t1", "t2"]
@@ -0,0 +1,28 @@
+import pandas as pd
+
+import regras
+
+
+def _motor(valor):
+    return regras.Regras(pd.DataFrame({"atividade": ["PALETIZAÇÃO", "EFC"], "valor": [valor, 5.0], "unidade": ["PALETE", "KPI"]}))
+
+
+def test_aprovacao_paga_o_total_da_conclusao_sem_remultiplicar():
+    criada = {"atividade": "PALETIZAÇÃO", "valor": _motor(2.0).preco({"atividade": "PALETIZAÇÃO"}, "Colaborador")}
+    concluida = dict(criada, qtd_produzida=3, valor=_motor(2.0).preco(dict(criada, qtd_produzida=3), "Colaborador"))
+    assert concluida["valor"] == 6.0
+    # Uma mudança de tabela entre a conclusão e a aprovação não altera o que se paga.
+    assert _motor(9.0).a_pagar(concluida, "Colaborador") == 6.0
+
+
+def test_aprovacao_nao_paga_producao_a_operador():
+    motor = _motor(2.0)
+    assert motor.a_pagar({"atividade": "PALETIZAÇÃO", "valor": 6.0}, "Operador") == 0.0
+    assert motor.a_pagar({"atividade": "EFC", "valor": 5.0}, "Operador") == 5.0
+
+
+def test_limite_diario_aplicado_na_criacao_chega_a_aprovacao():
+    motor = regras.Regras(pd.DataFrame({"atividade": ["CHECKLIST"], "valor": [1.0], "unidade": ["FIXO"], "limite_diario": [1]}))
+    criada = {"atividade": "CHECKLIST", "valor": motor.preco({"atividade": "CHECKLIST"}, "Colaborador", feitas_hoje=1)}
+    concluida = dict(criada, valor=motor.preco(criada, "Colaborador"))
+    assert motor.a_pagar(concluida, "Colaborador") == 0.0
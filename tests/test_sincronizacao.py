@@ -0,0 +1,132 @@
+import os
+
+import pandas as pd
+import pytest
+
+import backends
+import sincronizacao
+import storage
+
+
+@pytest.fixture(autouse=True)
+def sync_db(monkeypatch):
+    monkeypatch.setattr(sincronizacao, "_tabelas_criadas", False)
+    monkeypatch.setattr(sincronizacao, "metricas", {"ciclos": 0, "enviados": 0, "recebidos": 0, "conflitos": 0})
+
+
+def _usuarios(**nomes):
+    return pd.DataFrame({"id_login": list(nomes), "nome": list(nomes.values())})
+
+
+def _base(df):
+    return sincronizacao.mesclar("users", df, df, {})[2]
+
+
+def _nomes(df):
+    return dict(zip(df["id_login"].astype(str), df["nome"]))
+
+
+def test_mudanca_de_um_lado_so_vence():
+    base = _usuarios(**{"1": "Ana", "2": "Bia"})
+    local = _usuarios(**{"1": "Ana Paula", "2": "Bia"})
+    remoto = _usuarios(**{"1": "Ana", "2": "Beatriz", "3": "Caio"})
+    df, conflitos, _, muda_local, muda_remoto = sincronizacao.mesclar("users", local, remoto, _base(base))
+    assert conflitos == []
+    assert _nomes(df) == {"1": "Ana Paula", "2": "Beatriz", "3": "Caio"}
+    assert muda_local and muda_remoto
+
+
+def test_remocao_de_um_lado_so_propaga():
+    base = _usuarios(**{"1": "Ana", "2": "Bia"})
+    df, conflitos, hashes, muda_local, muda_remoto = sincronizacao.mesclar("users", _usuarios(**{"1": "Ana"}), base, _base(base))
+    assert conflitos == [] and _nomes(df) == {"1": "Ana"} and set(hashes) == {"1"}
+    assert not muda_local and muda_remoto
+
+
+def test_mudanca_dos_dois_lados_e_conflito_e_fica_a_local():
+    base = _usuarios(**{"1": "Ana"})
+    df, conflitos, _, muda_local, muda_remoto = sincronizacao.mesclar(
+        "users", _usuarios(**{"1": "Ana Local"}), _usuarios(**{"1": "Ana Remota"}), _base(base))
+    assert _nomes(df) == {"1": "Ana Local"}
+    assert [(k, l["nome"], r["nome"]) for k, l, r in conflitos] == [("1", "Ana Local", "Ana Remota")]
+    assert not muda_local and muda_remoto
+
+
+def test_sem_base_o_sharepoint_vence():
+    df, conflitos, _, muda_local, _ = sincronizacao.mesclar(
+        "users", _usuarios(**{"1": "Ana Local", "2": "Bia"}), _usuarios(**{"1": "Ana Remota"}), {})
+    assert _nomes(df) == {"1": "Ana Remota", "2": "Bia"}
+    assert [k for k, _, _ in conflitos] == ["1"]
+    assert muda_local
+
+
+def test_mesmo_valor_em_tipos_diferentes_nao_e_mudanca():
+    # O xlsx devolve 1.0 e datas como texto; o SQLite devolve 1 e Timestamp.
+    local = pd.DataFrame({"id_task": ["t1"], "valor": [1], "data_criacao": [pd.Timestamp("2026-09-10 08:00")]})
+    remoto = pd.DataFrame({"id_task": ["t1"], "valor": [1.0], "data_criacao": ["2026-09-10 08:00:00"]})
+    _, conflitos, _, muda_local, muda_remoto = sincronizacao.mesclar("tasks", local, remoto, {})
+    assert conflitos == [] and not muda_local and not muda_remoto
+
+
+def test_ciclo_envia_e_recebe_com_a_base_gravada():
+    espelho = backends.SQLiteBackend(os.path.join("espelho", "sharepoint.db"))
+    storage._backends.update(primario=backends.SQLiteBackend(storage.BANCO_LOCAL), espelhos=[espelho], sementes=[])
+    storage.put_table(_usuarios(**{"1": "Ana", "2": "Bia"}), "users")
+
+    sincronizacao.sincronizar_tabela("users", espelho)  # primeira vez: o espelho ainda não tem a tabela
+    assert _nomes(espelho.carregar("users")[0]) == {"1": "Ana", "2": "Bia"}
+
+    storage.mutate_table("users", lambda df: df.assign(nome=df["nome"].replace("Ana", "Ana Paula")))
+    espelho.gravar("users", _usuarios(**{"1": "Ana", "2": "Beatriz"}))
+    sincronizacao.sincronizar_tabela("users", espelho)
+
+    esperado = {"1": "Ana Paula", "2": "Beatriz"}
+    assert _nomes(storage.get_table("users", forcar=True)) == esperado
+    assert _nomes(espelho.carregar("users")[0]) == esperado
+    assert sincronizacao.conflitos_abertos().empty
+
+
+def test_falha_na_leitura_local_nao_apaga_nada(monkeypatch):
+    espelho = backends.SQLiteBackend(os.path.join("espelho", "sharepoint.db"))
+    storage._backends.update(primario=backends.SQLiteBackend(storage.BANCO_LOCAL), espelhos=[espelho], sementes=[])
+    storage.put_table(_usuarios(**{"1": "Ana", "2": "Bia"}), "users")
+    sincronizacao.sincronizar_tabela("users", espelho)
+
+    espelho.gravar("users", _usuarios(**{"1": "Ana", "2": "Bia", "3": "Caio"}))
+    primario = storage.backend_primario()
+    original = primario.carregar
+
+    def falha(*args, **kwargs): raise OSError("disco indisponível")
+
+    monkeypatch.setattr(primario, "carregar", falha)
+    storage._cache.clear()
+    sincronizacao.sincronizar_tudo()
+    assert "leitura local falhou" in sincronizacao.metricas["erro"]
+    assert _nomes(espelho.carregar("users")[0]) == {"1": "Ana", "2": "Bia", "3": "Caio"}
+
+    monkeypatch.setattr(primario, "carregar", original)
+    sincronizacao.sincronizar_tabela("users", espelho)
+    assert _nomes(storage.get_table("users", forcar=True)) == {"1": "Ana", "2": "Bia", "3": "Caio"}
+
+
+def test_sku_com_codigo_repetido_mantem_todas_as_linhas():
+    sku = pd.DataFrame({"Código Promax": ["35108", "25546", "35108"], "Material": ["SPATEN 600ML C/3", "GARRAFEIRA PRETA", "\tSPATEN 1 UN CX3"]})
+    df, conflitos, hashes, _, _ = sincronizacao.mesclar("sku", sku, sku.iloc[:2], {})
+    assert len(df) == 3 and len(hashes) == 3 and conflitos == []
+
+
+def test_chave_repetida_recusa_o_merge_e_fica_em_conflito():
+    espelho = backends.SQLiteBackend(os.path.join("espelho", "sharepoint.db"))
+    storage._backends.update(primario=backends.SQLiteBackend(storage.BANCO_LOCAL), espelhos=[espelho], sementes=[])
+    storage.put_table(_usuarios(**{"1": "Ana"}), "users")
+    espelho.gravar("users", pd.DataFrame({"id_login": ["1", "2", "02"], "nome": ["Ana", "Bia", "Beatriz"]}))
+
+    with pytest.raises(sincronizacao.ChaveRepetida):
+        sincronizacao.mesclar("users", storage.get_table("users"), espelho.carregar("users")[0], {})
+    sincronizacao.sincronizar_tudo()
+    sincronizacao.sincronizar_tudo()
+
+    assert _nomes(storage.get_table("users", forcar=True)) == {"1": "Ana"}
+    assert len(espelho.carregar("users")[0]) == 3
+    abertos = sincronizacao.conflitos_abertos()
+    assert list(abertos["chave"]) == ["2"] and abertos["local"].iloc[0] == "null"